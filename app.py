@@ -1,11 +1,40 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Request, Response, g, render_template, request, jsonify, session, url_for
 from werkzeug.utils import secure_filename
-from quiz_generator import QuizGenerator
+from quiz_generator import QuizGenerator, QUESTION_BUILDERS, quiz_from_dict, quiz_to_dict
+from quiz_export import EXPORT_FORMATS, ExportCache, export_key, iter_export
+from quiz_cache import QuizCache
+from question_bank import QuestionBank
+from scheduler import RequestScheduler, current_tenant
+from hedging import RequestPolicy, apply_policy
+from http_responses import FastJSONProvider, ResponseCompressor, StaticFingerprints, add_conditional_etag
+from text_cache import HashingStream, TextCache
+from quiz_jobs import JobManager
+from batch import generate_batch
+from session_store import create_session_store
+from metrics import metrics, format_server_timing
+import asyncio
+import contextvars
 import json
+import tempfile
+import queue
+import threading
+import time
+from functools import partial
 import uuid
 import os
 
+# Uploads up to this size are kept in memory; larger ones are spooled to a temporary file
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv('QUIZ_UPLOAD_SPOOL_THRESHOLD', str(8 * 1024 * 1024)))
+
+class QuizRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Hash uploads as they arrive so the text cache can be checked without rereading them
+        return HashingStream(tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD, mode='rb+'))
+
 app = Flask(__name__)
+app.request_class = QuizRequest
+# orjson, when installed, serializes large question lists several times faster
+app.json = FastJSONProvider(app)
 app.secret_key = 'quiz_generator_secret_key_2024'
 
 # File upload configuration
@@ -18,8 +47,180 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-# Store quiz sessions in memory (in production, use a database)
-quiz_sessions = {}
+# Persistent cache of generated quizzes keyed by extracted text and model settings
+QUIZ_CACHE_PATH = os.getenv('QUIZ_CACHE_PATH', os.path.join('cache', 'quiz_cache.sqlite3'))
+quiz_cache = QuizCache(
+    QUIZ_CACHE_PATH,
+    max_entries=int(os.getenv('QUIZ_CACHE_MAX_ENTRIES', '1000')),
+    ttl_seconds=float(os.getenv('QUIZ_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+)
+
+# Compressed extracted text keyed by a hash of the uploaded bytes, so re-uploads skip parsing
+text_cache = TextCache(
+    os.getenv('QUIZ_TEXT_CACHE_DIR', os.path.join('cache', 'text')),
+    max_bytes=int(os.getenv('QUIZ_TEXT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+)
+
+# Rendered quiz exports keyed by quiz content and format, so repeated downloads skip rendering
+export_cache = ExportCache(max_bytes=int(os.getenv('QUIZ_EXPORT_CACHE_MAX_BYTES', str(32 * 1024 * 1024))))
+
+# Pools of generated questions; repeat uploads of a document get a fresh draw instead of a new GPT call
+QUESTION_BANK_MAX_DOCUMENTS = int(os.getenv('QUIZ_BANK_MAX_DOCUMENTS', '1000'))
+question_bank = QuestionBank(
+    max_documents=QUESTION_BANK_MAX_DOCUMENTS,
+    low_water=int(os.getenv('QUIZ_BANK_LOW_WATER', '1'))
+) if QUESTION_BANK_MAX_DOCUMENTS else None
+
+# OpenAI requests are admitted within these per-minute budgets (0 disables scheduling) and
+# queued fairly across tenants, identified by the client address (see request_tenant)
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv('QUIZ_OPENAI_RPM', '3500'))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv('QUIZ_OPENAI_TPM', '90000'))
+openai_scheduler = RequestScheduler(
+    requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+    max_retries=int(os.getenv('QUIZ_OPENAI_MAX_RETRIES', '5'))
+) if OPENAI_REQUESTS_PER_MINUTE and OPENAI_TOKENS_PER_MINUTE else None
+# Addresses of reverse proxies whose X-Quiz-Tenant and X-Forwarded-For headers are believed
+TRUSTED_PROXIES = {address.strip() for address in os.getenv('QUIZ_TRUSTED_PROXIES', '').split(',') if address.strip()}
+
+# OpenAI calls made for each endpoint are abandoned this many seconds after the request started (0: no deadline).
+# Endpoints listed in QUIZ_HEDGE_ENDPOINTS send a second attempt, on QUIZ_HEDGE_MODEL if set, when the
+# first is slower than the recent p95 (QUIZ_HEDGE_DELAY seconds until enough requests have been seen)
+HEDGE_ENDPOINTS = {name.strip() for name in os.getenv('QUIZ_HEDGE_ENDPOINTS', '').split(',') if name.strip()}
+
+def endpoint_policy(endpoint, default_deadline):
+    return RequestPolicy(
+        deadline=float(os.getenv(f'QUIZ_{endpoint.upper()}_DEADLINE', default_deadline)) or None,
+        hedge=endpoint in HEDGE_ENDPOINTS,
+        hedge_model=os.getenv('QUIZ_HEDGE_MODEL') or None,
+        hedge_delay=float(os.getenv('QUIZ_HEDGE_DELAY', '5'))
+    )
+
+REQUEST_POLICIES = {
+    'upload_file': endpoint_policy('upload_file', '60'),
+    'upload_file_stream': endpoint_policy('upload_file_stream', '90'),
+    'upload_file_async': endpoint_policy('upload_file_async', '300'),
+    'batch_upload': endpoint_policy('batch_upload', '0')
+}
+
+# Long documents are split into chunks that are sent to GPT concurrently
+CHUNK_CONCURRENCY = int(os.getenv('QUIZ_CHUNK_CONCURRENCY', '4'))
+MAX_CHUNKS = int(os.getenv('QUIZ_MAX_CHUNKS', '24')) or None
+
+# Maximum concurrent GPT requests for a /batch_upload request
+BATCH_CONCURRENCY = int(os.getenv('QUIZ_BATCH_CONCURRENCY', '4'))
+
+# Text extraction stops once this many characters have been collected; off by default so
+# long documents are covered in full by the chunked map-reduce, which samples at most MAX_CHUNKS
+MAX_TEXT_CHARS = int(os.getenv('QUIZ_MAX_TEXT_CHARS', '0')) or None
+
+# PDFs with at least this many pages are extracted by a pool of worker processes
+PDF_WORKERS = int(os.getenv('QUIZ_PDF_WORKERS', '0')) or None
+PARALLEL_PDF_THRESHOLD = int(os.getenv('QUIZ_PARALLEL_PDF_THRESHOLD', '50'))
+
+# Shared generator, built lazily on first use (see get_generator)
+_generator = None
+_generator_lock = threading.Lock()
+
+# Background event loop running async upload jobs
+quiz_jobs = JobManager()
+
+# Quiz sessions live in a bounded store; use sqlite:///path to share them between worker processes
+quiz_sessions = create_session_store(
+    os.getenv('QUIZ_SESSION_STORE', 'memory'),
+    max_sessions=int(os.getenv('QUIZ_SESSION_MAX', '10000')),
+    ttl_seconds=float(os.getenv('QUIZ_SESSION_TTL_SECONDS', str(24 * 3600))),
+    max_bytes=int(os.getenv('QUIZ_SESSION_MAX_BYTES', str(64 * 1024 * 1024)))
+)
+
+# Per-stage latency and token metrics, served at /metrics in Prometheus text format
+metrics.enabled = os.getenv('QUIZ_METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Adds a Server-Timing header with the stage timings of each request
+TIMING_HEADER_ENABLED = os.getenv('QUIZ_TIMING_HEADER', '').lower() in ('1', 'true', 'yes')
+
+# Responses smaller than this are not worth compressing; 0 turns compression off
+COMPRESS_MIN_BYTES = int(os.getenv('QUIZ_COMPRESS_MIN_BYTES', '1024'))
+response_compressor = ResponseCompressor(min_bytes=COMPRESS_MIN_BYTES) if COMPRESS_MIN_BYTES > 0 else None
+# Static URLs carry a content hash so browsers can cache them for a year
+static_fingerprints = StaticFingerprints(app.static_folder)
+
+metrics.register_gauge('quiz_cache_hits', 'Quiz cache hits in this process.', lambda: quiz_cache.hits)
+metrics.register_gauge('quiz_cache_misses', 'Quiz cache misses in this process.', lambda: quiz_cache.misses)
+metrics.register_gauge('text_cache_hits', 'Extracted text cache hits in this process.', lambda: text_cache.hits)
+metrics.register_gauge('text_cache_misses', 'Extracted text cache misses in this process.', lambda: text_cache.misses)
+metrics.register_gauge('quiz_sessions', 'Quiz sessions currently stored.', lambda: len(quiz_sessions))
+if question_bank is not None:
+    metrics.register_gauge('question_bank_documents', 'Documents with banked questions.', lambda: len(question_bank))
+metrics.register_gauge('quiz_generations_in_flight', 'Distinct quiz generations currently running.',
+                        lambda: len(_generator.in_flight) if _generator else 0)
+metrics.register_gauge('quiz_coalesced_requests', 'Requests that shared an identical in-flight generation.',
+                        lambda: _generator.in_flight.coalesced if _generator else 0)
+if openai_scheduler is not None:
+    metrics.register_gauge('openai_scheduler_queue_depth', 'OpenAI requests waiting for rate limit budget.',
+                            openai_scheduler.queue_depth)
+metrics.register_gauge('quiz_jobs_pending', 'Upload jobs waiting or running.', lambda: quiz_jobs.pending_count())
+
+@app.before_request
+def start_request_timing():
+    if TIMING_HEADER_ENABLED:
+        metrics.start_request()
+    if metrics.enabled or TIMING_HEADER_ENABLED:
+        g.request_started = time.perf_counter()
+
+def request_tenant():
+    """The tenant the current request's OpenAI calls queue under.
+
+    Clients could pick any header value to get extra round-robin turns, so
+    X-Quiz-Tenant is only believed from a trusted proxy. Otherwise the
+    tenant is the client address, taken from X-Forwarded-For behind one.
+    """
+    address = request.remote_addr
+    if address in TRUSTED_PROXIES:
+        tenant = request.headers.get('X-Quiz-Tenant')
+        if tenant:
+            return f'tenant:{tenant}'
+        # The last address not added by a trusted proxy itself is the client
+        forwarded_for = request.headers.get('X-Forwarded-For', '')
+        for forwarded in reversed([hop.strip() for hop in forwarded_for.split(',') if hop.strip()]):
+            address = forwarded
+            if forwarded not in TRUSTED_PROXIES:
+                break
+    return address or 'default'
+
+@app.before_request
+def set_request_context():
+    # OpenAI requests made for this request queue under its tenant and follow its endpoint's policy
+    current_tenant.set(request_tenant())
+    apply_policy(REQUEST_POLICIES.get(request.endpoint, RequestPolicy()))
+
+@app.after_request
+def add_timing_header(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe(f'request_{request.endpoint}', time.perf_counter() - started)
+    timings = metrics.request_timings() if TIMING_HEADER_ENABLED else None
+    counts = metrics.request_counts() if TIMING_HEADER_ENABLED else None
+    if timings or counts:
+        response.headers['Server-Timing'] = format_server_timing(timings or {}, counts)
+    return response
+
+@app.url_defaults
+def add_static_fingerprint(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        fingerprint = static_fingerprints.get(values.get('filename', ''))
+        if fingerprint:
+            values['v'] = fingerprint
+
+@app.after_request
+def add_cache_headers(response):
+    # Registered last so it runs first, before the timing header is added
+    if request.endpoint == 'static':
+        response = static_fingerprints.cache_control(request, response)
+    else:
+        response = add_conditional_etag(request, response)
+    if response_compressor is not None:
+        response = response_compressor(request, response)
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -28,144 +229,398 @@ def allowed_file(filename):
 def index():
     return render_template('index.html')
 
+def get_generator():
+    """Return the process-wide QuizGenerator, or None when no API key is configured.
+
+    The generator (and its connection-pooled OpenAI clients) is built once and
+    shared by every request instead of being constructed per upload.
+    """
+    global _generator
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return None
+    
+    with _generator_lock:
+        if _generator is None:
+            _generator = QuizGenerator(
+                api_key=api_key,
+                cache=quiz_cache,
+                chunk_concurrency=CHUNK_CONCURRENCY,
+                max_chunks=MAX_CHUNKS,
+                max_text_chars=MAX_TEXT_CHARS,
+                pdf_workers=PDF_WORKERS,
+                parallel_pdf_threshold=PARALLEL_PDF_THRESHOLD,
+                text_cache=text_cache,
+                question_bank=question_bank,
+                scheduler=openai_scheduler
+            )
+        return _generator
+
+def new_session(mcq_questions, tf_questions, open_ended_questions=None, key_concepts=None):
+    """Build session data with an answer key indexed by question id and zeroed score counters."""
+    session_data = {
+        'mcq_questions': [],
+        'tf_questions': [],
+        # Not part of the interactive quiz, but kept so the whole quiz can be exported
+        'open_ended_questions': open_ended_questions or [],
+        'key_concepts': key_concepts or [],
+        'answer_key': {},
+        'user_answers': {},
+        'total_questions': 0,
+        'answered_count': 0,
+        'correct_count': 0,
+        'difficulty_stats': {},
+        'score': 0,
+        'completed': False
+    }
+    for question in mcq_questions + tf_questions:
+        add_session_question(session_data, question)
+    return session_data
+
+def add_session_question(session_data, question):
+    """Add an interactive question to a session, indexing it in the answer key."""
+    session_data['mcq_questions' if question['type'] == 'mcq' else 'tf_questions'].append(question)
+    session_data['answer_key'][question['id']] = {
+        'type': question['type'],
+        'correct_answer': question['correct_answer'],
+        'difficulty': question['difficulty']
+    }
+    session_data['total_questions'] += 1
+    stats = session_data['difficulty_stats'].setdefault(
+        question['difficulty'], {'total': 0, 'answered': 0, 'correct': 0}
+    )
+    stats['total'] += 1
+
+def mcq_for_session(mcq, question_id):
+    """Convert an MCQQuestion into the interactive format."""
+    return {
+        'id': question_id,
+        'question': mcq.question,
+        'options': mcq.options,
+        'correct_answer': mcq.correct_answer,
+        'difficulty': mcq.difficulty.value,
+        'type': 'mcq'
+    }
+
+def tf_for_session(tf, question_id):
+    """Convert a TrueFalseQuestion into the interactive format."""
+    return {
+        'id': question_id,
+        'statement': tf.statement,
+        'correct_answer': tf.correct_answer,
+        'difficulty': tf.difficulty.value,
+        'type': 'true_false'
+    }
+
+def create_demo_quiz(filename):
+    """Create a simple demo quiz session for testing without an API key."""
+    session_id = str(uuid.uuid4())
+    demo_mcq = [{
+        'id': 'demo_mcq_1',
+        'question': 'What is the main topic of this document?',
+        'options': ['Topic A', 'Topic B', 'Topic C', 'Topic D'],
+        'correct_answer': 0,
+        'difficulty': 'Easy',
+        'type': 'mcq'
+    }]
+    
+    demo_tf = [{
+        'id': 'demo_tf_1',
+        'statement': 'This is a test document for demonstration purposes.',
+        'correct_answer': True,
+        'difficulty': 'Easy',
+        'type': 'true_false'
+    }]
+    
+    quiz_sessions.save(session_id, new_session(demo_mcq, demo_tf))
+    
+    return {
+        'session_id': session_id,
+        'mcq_questions': demo_mcq,
+        'tf_questions': demo_tf,
+        'total_questions': len(demo_mcq) + len(demo_tf),
+        'filename': filename,
+        'analysis_method': 'Demo Mode (No API Key)',
+        'warning': 'Running in demo mode. Set OPENAI_API_KEY for full functionality.'
+    }
+
+def create_quiz_session(quiz_data, filename):
+    """Store a generated quiz as an interactive session and return the client payload."""
+    # Create a unique session ID for the quiz
+    session_id = str(uuid.uuid4())
+    
+    # Prepare quiz questions for interactive session
+    mcq_questions = [mcq_for_session(mcq, f'mcq_{i}') for i, mcq in enumerate(quiz_data['mcq_questions'])]
+    tf_questions = [tf_for_session(tf, f'tf_{i}') for i, tf in enumerate(quiz_data['true_false_questions'])]
+    
+    # Store quiz session; the source text is not needed to run the quiz
+    plain = quiz_to_dict(quiz_data)
+    quiz_sessions.save(session_id, new_session(
+        mcq_questions, tf_questions, plain['open_ended_questions'], plain['key_concepts']
+    ))
+    
+    return {
+        'session_id': session_id,
+        'mcq_questions': mcq_questions,
+        'tf_questions': tf_questions,
+        'total_questions': len(mcq_questions) + len(tf_questions),
+        'filename': filename,
+        'analysis_method': 'GPT'
+    }
+
+def validate_upload():
+    """Return the uploaded file, or an error response tuple if the upload is invalid."""
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No file provided'}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({'error': 'No file selected'}), 400)
+    
+    if not allowed_file(file.filename):
+        return None, (jsonify({'error': 'File type not supported. Please upload PDF, DOCX, or TXT files.'}), 400)
+    
+    return file, None
+
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
     try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
+        file, error_response = validate_upload()
+        if error_response:
+            return error_response
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        filename = secure_filename(file.filename)
         
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Get API key from environment variable
-            api_key = os.getenv('OPENAI_API_KEY')
+        try:
+            generator = get_generator()
+        except Exception as e:
+            return jsonify({'error': f'Error initializing OpenAI client: {str(e)}'}), 400
+        
+        if generator is None:
+            # Fallback mode for testing without API key
+            return jsonify(create_demo_quiz(filename))
+        
+        try:
+            # Extract text straight from the upload stream, which is only on disk above the spool threshold
+            text = generator.read_file(file.stream, filename=filename)
             
-            if not api_key:
-                # Fallback mode for testing without API key
-                # Clean up uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                
-                # Create a simple demo quiz for testing
-                session_id = str(uuid.uuid4())
-                demo_mcq = [{
-                    'id': 'demo_mcq_1',
-                    'question': 'What is the main topic of this document?',
-                    'options': ['Topic A', 'Topic B', 'Topic C', 'Topic D'],
-                    'correct_answer': 0,
-                    'difficulty': 'Easy',
-                    'type': 'mcq'
-                }]
-                
-                demo_tf = [{
-                    'id': 'demo_tf_1',
-                    'statement': 'This is a test document for demonstration purposes.',
-                    'correct_answer': True,
-                    'difficulty': 'Easy',
-                    'type': 'true_false'
-                }]
-                
-                quiz_sessions[session_id] = {
-                    'text': 'Demo text for testing purposes',
-                    'mcq_questions': demo_mcq,
-                    'tf_questions': demo_tf,
-                    'user_answers': {},
-                    'score': 0,
-                    'completed': False
-                }
-                
-                return jsonify({
-                    'session_id': session_id,
-                    'mcq_questions': demo_mcq,
-                    'tf_questions': demo_tf,
-                    'total_questions': len(demo_mcq) + len(demo_tf),
-                    'filename': filename,
-                    'analysis_method': 'Demo Mode (No API Key)',
-                    'warning': 'Running in demo mode. Set OPENAI_API_KEY for full functionality.'
-                })
+            # Draw from the question bank, generating with GPT only for new documents
+            quiz_data = generator.draw_quiz(text)
+            refill_question_bank(generator, text)
             
-            # Initialize quiz generator with GPT only
-            try:
-                generator = QuizGenerator(api_key=api_key)
-            except Exception as e:
-                # Clean up uploaded file
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return jsonify({'error': f'Error initializing OpenAI client: {str(e)}'}), 400
+            return jsonify(create_quiz_session(quiz_data, filename))
             
-            try:
-                # Extract text from file
-                text = generator.read_file(filepath)
-                
-                # Generate quiz using GPT analysis
-                quiz_data = generator.generate_complete_quiz_with_gpt(text)
-                
-                # Create a unique session ID for the quiz
-                session_id = str(uuid.uuid4())
-                
-                # Prepare quiz questions for interactive session
-                mcq_questions = []
-                for i, mcq in enumerate(quiz_data['mcq_questions']):
-                    correct_option_text = mcq.correct_answer.split(') ', 1)[1]
-                    correct_index = mcq.options.index(correct_option_text)
-                    mcq_questions.append({
-                        'id': f'mcq_{i}',
-                        'question': mcq.question,
-                        'options': mcq.options,
-                        'correct_answer': correct_index,
-                        'difficulty': mcq.difficulty.value,
-                        'type': 'mcq'
-                    })
-                
-                tf_questions = []
-                for i, tf in enumerate(quiz_data['true_false_questions']):
-                    tf_questions.append({
-                        'id': f'tf_{i}',
-                        'statement': tf.statement,
-                        'correct_answer': tf.correct_answer,
-                        'difficulty': tf.difficulty.value,
-                        'type': 'true_false'
-                    })
-                
-                # Store quiz session
-                quiz_sessions[session_id] = {
-                    'text': text,
-                    'mcq_questions': mcq_questions,
-                    'tf_questions': tf_questions,
-                    'user_answers': {},
-                    'score': 0,
-                    'completed': False
-                }
-                
-                # Clean up uploaded file
-                os.remove(filepath)
-                
-                return jsonify({
-                    'session_id': session_id,
-                    'mcq_questions': mcq_questions,
-                    'tf_questions': tf_questions,
-                    'total_questions': len(mcq_questions) + len(tf_questions),
-                    'filename': filename,
-                    'analysis_method': 'GPT'
-                })
-                
-            except Exception as e:
-                # Clean up uploaded file on error
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return jsonify({'error': f'Error processing file: {str(e)}'}), 400
-        else:
-            return jsonify({'error': 'File type not supported. Please upload PDF, DOCX, or TXT files.'}), 400
+        except Exception as e:
+            return jsonify({'error': f'Error processing file: {str(e)}'}), 400
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def refill_question_bank(generator, text):
+    """Top up the question bank for ``text`` on the job loop without delaying the response."""
+    if generator.question_bank is not None:
+        # Run in a fresh context: the refill is background work, not bound by this request's deadline
+        contextvars.Context().run(
+            asyncio.run_coroutine_threadsafe, generator.arefill_question_bank(text), quiz_jobs.loop
+        )
+
+def spool_upload(file):
+    """Keep an upload that must outlive its request: as bytes, or as a saved file above the spool threshold."""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    if size <= UPLOAD_SPOOL_THRESHOLD:
+        return stream.read()
+    
+    # Unique name so concurrent uploads of the same file don't clobber each other
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{secure_filename(file.filename)}')
+    with metrics.span('file_save'):
+        file.save(filepath)
+    return filepath
+
+def discard_spooled_upload(source):
+    if isinstance(source, str) and os.path.exists(source):
+        os.remove(source)
+
+async def process_upload_job(generator, source, filename):
+    """Extract text and generate a quiz for an uploaded file on the job loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        # Extraction is CPU bound, so keep it off the event loop
+        text = await loop.run_in_executor(None, partial(generator.read_file, source, filename=filename))
+        quiz_data = await generator.adraw_quiz(text)
+        refill_question_bank(generator, text)
+        return create_quiz_session(quiz_data, filename)
+    except Exception as e:
+        raise Exception(f'Error processing file: {str(e)}')
+    finally:
+        discard_spooled_upload(source)
+
+@app.route('/upload_file_async', methods=['POST'])
+def upload_file_async():
+    """Accept an upload and return a job id immediately; poll /job_status for the quiz."""
+    try:
+        file, error_response = validate_upload()
+        if error_response:
+            return error_response
+        
+        filename = secure_filename(file.filename)
+        
+        try:
+            generator = get_generator()
+        except Exception as e:
+            return jsonify({'error': f'Error initializing OpenAI client: {str(e)}'}), 400
+        
+        if generator is None:
+            # Demo quizzes are instant, so there is nothing to wait for
+            return jsonify(create_demo_quiz(filename))
+        
+        # The request's file stream is closed once we respond, so keep the contents for the job
+        job_id = quiz_jobs.submit(process_upload_job(generator, spool_upload(file), filename))
+        return jsonify({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(event, data):
+    """Format one server-sent event."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+def stream_quiz_events(generator, text, filename):
+    """Yield server-sent events for a quiz session whose questions arrive as the model writes them."""
+    session_id = str(uuid.uuid4())
+    quiz_sessions.save(session_id, new_session([], []))
+    yield sse_event('session', {'session_id': session_id, 'filename': filename, 'analysis_method': 'GPT'})
+    
+    # The user answers questions while later ones stream in, so each change is applied to the stored session
+    counts = {'mcq_questions': 0, 'true_false_questions': 0}
+    total_questions = 0
+    try:
+        for section, item in generator.stream_quiz_with_gpt(text):
+            if section == 'done':
+                plain = quiz_to_dict(item)
+                quiz_sessions.update(session_id, lambda session_data: session_data.update(
+                    open_ended_questions=plain['open_ended_questions'], key_concepts=plain['key_concepts']
+                ))
+                continue
+            if section not in counts:
+                # Open-ended questions are not part of the interactive quiz
+                continue
+            if section == 'mcq_questions':
+                question = mcq_for_session(item, f'mcq_{counts[section]}')
+            else:
+                question = tf_for_session(item, f'tf_{counts[section]}')
+            counts[section] += 1
+            quiz_sessions.update(session_id, partial(add_session_question, question=question))
+            total_questions += 1
+            yield sse_event('question', question)
+    except Exception as e:
+        yield sse_event('error', {'error': f'Error processing file: {str(e)}'})
+        return
+    
+    refill_question_bank(generator, text)
+    yield sse_event('done', {'session_id': session_id, 'total_questions': total_questions})
+
+@app.route('/upload_file_stream', methods=['POST'])
+def upload_file_stream():
+    """Upload a file and stream quiz questions back as server-sent events while they are generated."""
+    try:
+        file, error_response = validate_upload()
+        if error_response:
+            return error_response
+        
+        filename = secure_filename(file.filename)
+        
+        try:
+            generator = get_generator()
+        except Exception as e:
+            return jsonify({'error': f'Error initializing OpenAI client: {str(e)}'}), 400
+        
+        if generator is None:
+            demo = create_demo_quiz(filename)
+            events = [sse_event('session', {key: demo[key] for key in ('session_id', 'filename', 'analysis_method', 'warning')})]
+            events += [sse_event('question', question) for question in demo['mcq_questions'] + demo['tf_questions']]
+            events.append(sse_event('done', {'session_id': demo['session_id'], 'total_questions': demo['total_questions']}))
+            return Response(events, mimetype='text/event-stream')
+        
+        try:
+            # Extract before streaming starts, while the upload stream is still open
+            text = generator.read_file(file.stream, filename=filename)
+        except Exception as e:
+            return jsonify({'error': f'Error processing file: {str(e)}'}), 400
+        
+        return Response(
+            stream_quiz_events(generator, text, filename),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/batch_upload', methods=['POST'])
+def batch_upload():
+    """Generate quizzes for several uploaded files, streaming one JSON line per finished file."""
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    unsupported = [file.filename for file in files if not allowed_file(file.filename)]
+    if unsupported:
+        return jsonify({'error': f'File type not supported: {", ".join(unsupported)}'}), 400
+    
+    try:
+        generator = get_generator()
+    except Exception as e:
+        return jsonify({'error': f'Error initializing OpenAI client: {str(e)}'}), 400
+    if generator is None:
+        return jsonify({'error': 'Batch generation requires OPENAI_API_KEY'}), 400
+    
+    # Keep every upload before streaming, as the request body is gone once the response starts
+    documents = [(secure_filename(file.filename), spool_upload(file)) for file in files]
+    
+    results = queue.Queue()
+    
+    def finish_batch(_):
+        for _, source in documents:
+            discard_spooled_upload(source)
+        results.put(None)
+    
+    batch = asyncio.run_coroutine_threadsafe(
+        # The scheduler already retries rate-limited requests
+        generate_batch(generator, documents, results.put, concurrency=BATCH_CONCURRENCY,
+                       max_retries=0 if openai_scheduler else 5),
+        quiz_jobs.loop
+    )
+    batch.add_done_callback(finish_batch)
+    
+    def stream_results():
+        while True:
+            record = results.get()
+            if record is None:
+                break
+            yield json.dumps(record) + '\n'
+    
+    return Response(stream_results(), mimetype='application/x-ndjson')
+
+@app.route('/job_status/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = quiz_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    response = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'completed':
+        response['result'] = job['result']
+    elif job['status'] == 'failed':
+        response['error'] = job['error']
+    return jsonify(response)
+
 @app.route('/start_quiz', methods=['POST'])
 def start_quiz():
     return jsonify({'error': 'Quiz generation is now handled during file upload. Please upload a file to generate a quiz.'}), 400
@@ -178,34 +633,46 @@ def submit_answer():
         question_id = data.get('question_id')
         user_answer = data.get('answer')
         
-        if session_id not in quiz_sessions:
-            return jsonify({'error': 'Invalid session'}), 400
-        
-        session_data = quiz_sessions[session_id]
-        
-        # Find the question and check answer
-        is_correct = False
-        correct_answer = None
-        
-        # Check MCQ questions
-        for mcq in session_data['mcq_questions']:
-            if mcq['id'] == question_id:
-                correct_answer = mcq['correct_answer']
+        def record_answer(session_data):
+            # Look up the question in the answer key built at session creation
+            question = session_data['answer_key'].get(question_id)
+            if question is None:
+                return None
+            
+            correct_answer = question['correct_answer']
+            if question['type'] == 'mcq':
                 is_correct = int(user_answer) == correct_answer
-                break
-        
-        # Check True/False questions
-        for tf in session_data['tf_questions']:
-            if tf['id'] == question_id:
-                correct_answer = tf['correct_answer']
+            else:
                 is_correct = (user_answer.lower() == 'true') == correct_answer
-                break
+            
+            # Update running counters, undoing a previous answer to the same question
+            stats = session_data['difficulty_stats'][question['difficulty']]
+            previous = session_data['user_answers'].get(question_id)
+            if previous is None:
+                session_data['answered_count'] += 1
+                stats['answered'] += 1
+            elif previous['is_correct']:
+                session_data['correct_count'] -= 1
+                stats['correct'] -= 1
+            if is_correct:
+                session_data['correct_count'] += 1
+                stats['correct'] += 1
+            
+            # Store user answer
+            session_data['user_answers'][question_id] = {
+                'answer': user_answer,
+                'is_correct': is_correct
+            }
+            return is_correct, correct_answer
         
-        # Store user answer
-        session_data['user_answers'][question_id] = {
-            'answer': user_answer,
-            'is_correct': is_correct
-        }
+        # Applied under the store's lock, so concurrent answers and streamed questions are not lost
+        try:
+            result = quiz_sessions.update(session_id, record_answer)
+        except KeyError:
+            return jsonify({'error': 'Invalid session'}), 400
+        if result is None:
+            return jsonify({'error': 'Invalid question'}), 400
+        is_correct, correct_answer = result
         
         return jsonify({
             'is_correct': is_correct,
@@ -215,35 +682,107 @@ def submit_answer():
     except Exception as e:
         return jsonify({'error': f'Error submitting answer: {str(e)}'}), 500
 
-@app.route('/get_results', methods=['POST'])
+@app.route('/get_results', methods=['GET', 'POST'])
 def get_results():
     try:
-        data = request.get_json()
+        # POST completes the quiz; GET only reads the results, so they can be revalidated with an ETag
+        data = request.args if request.method == 'GET' else request.get_json()
         session_id = data.get('session_id')
         
-        if session_id not in quiz_sessions:
-            return jsonify({'error': 'Invalid session'}), 400
-        
-        session_data = quiz_sessions[session_id]
+        def complete(session_data):
+            session_data['score'] = session_score(session_data)
+            session_data['completed'] = True
+            return session_data
         
-        # Calculate score
-        total_questions = len(session_data['mcq_questions']) + len(session_data['tf_questions'])
-        correct_answers = sum(1 for answer in session_data['user_answers'].values() if answer['is_correct'])
-        score_percentage = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+        if request.method == 'GET':
+            session_data = quiz_sessions.get(session_id)
+            if session_data is None:
+                return jsonify({'error': 'Invalid session'}), 400
+        else:
+            try:
+                session_data = quiz_sessions.update(session_id, complete)
+            except KeyError:
+                return jsonify({'error': 'Invalid session'}), 400
         
-        session_data['score'] = score_percentage
-        session_data['completed'] = True
+        total_questions = session_data['total_questions']
+        correct_answers = session_data['correct_count']
+        difficulty_breakdown = {
+            difficulty: dict(stats, score_percentage=round(stats['correct'] / stats['total'] * 100, 1))
+            for difficulty, stats in session_data['difficulty_stats'].items()
+        }
         
         return jsonify({
             'total_questions': total_questions,
             'correct_answers': correct_answers,
-            'score_percentage': round(score_percentage, 1),
+            'answered_questions': session_data['answered_count'],
+            'score_percentage': round(session_score(session_data), 1),
+            'completed': session_data['completed'],
+            'difficulty_breakdown': difficulty_breakdown,
             'user_answers': session_data['user_answers']
         })
         
     except Exception as e:
         return jsonify({'error': f'Error getting results: {str(e)}'}), 500
 
+def session_score(session_data):
+    """Percentage score from the running counters maintained by submit_answer."""
+    total_questions = session_data['total_questions']
+    return (session_data['correct_count'] / total_questions * 100) if total_questions > 0 else 0
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    stats = dict(quiz_cache.stats(), text_cache=text_cache.stats())
+    if question_bank is not None:
+        stats['question_bank'] = question_bank.stats()
+    if openai_scheduler is not None:
+        stats['openai_scheduler'] = openai_scheduler.stats()
+    stats['export_cache'] = export_cache.stats()
+    return jsonify(stats)
+
+def session_quiz(session_data):
+    """Plain quiz data of a session, in the shape ``quiz_from_dict`` reads."""
+    return {
+        'mcq_questions': session_data['mcq_questions'],
+        'true_false_questions': session_data['tf_questions'],
+        'open_ended_questions': session_data.get('open_ended_questions', []),
+        'key_concepts': session_data.get('key_concepts', [])
+    }
+
+@app.route('/export_quiz/<session_id>', methods=['GET'])
+def export_quiz(session_id):
+    """Download a session's quiz as text, markdown, csv, gift or qti."""
+    export_format = request.args.get('format', 'text')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format; choose one of {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    session_data = quiz_sessions.get(session_id)
+    if not session_data:
+        return jsonify({'error': 'Invalid session'}), 400
+    
+    quiz = session_quiz(session_data)
+    key = export_key(quiz, export_format)
+    details = EXPORT_FORMATS[export_format]
+    headers = {
+        'Content-Disposition': f'attachment; filename=quiz.{details["extension"]}',
+        # Clients revalidate every time, which costs a hash and a 304 when nothing changed
+        'Cache-Control': 'private, no-cache'
+    }
+    # Compressed downloads carry the weak form of the tag
+    if request.if_none_match.contains_weak(key):
+        response = Response(status=304, headers=headers)
+    else:
+        body = export_cache.get(key)
+        if body is None:
+            # Stream the rendering, keeping the result for the next download
+            body = export_cache.stream(key, iter_export(quiz_from_dict(quiz), export_format))
+        response = Response(body, mimetype=details['mimetype'], headers=headers)
+    response.set_etag(key)
+    return response
+
 @app.route('/generate_quiz', methods=['POST'])
 def generate_quiz():
     try:
@@ -253,35 +792,14 @@ def generate_quiz():
         if not text.strip():
             return jsonify({'error': 'Please provide text to analyze'}), 400
         
-        generator = QuizGenerator()
-        quiz_data = generator.generate_complete_quiz(text)
+        generator = get_generator()
+        if generator is None:
+            return jsonify({'error': 'OpenAI API key is required. Set OPENAI_API_KEY environment variable.'}), 400
+        quiz_data = generator.generate_complete_quiz_with_gpt(text)
         
         # Convert dataclass objects to dictionaries for JSON serialization
-        serialized_quiz = {
-            'key_concepts': quiz_data['key_concepts'],
-            'mcq_questions': [
-                {
-                    'question': mcq.question,
-                    'options': mcq.options,
-                    'correct_answer': mcq.correct_answer,
-                    'difficulty': mcq.difficulty.value
-                } for mcq in quiz_data['mcq_questions']
-            ],
-            'true_false_questions': [
-                {
-                    'statement': tf.statement,
-                    'correct_answer': tf.correct_answer,
-                    'difficulty': tf.difficulty.value
-                } for tf in quiz_data['true_false_questions']
-            ],
-            'open_ended_questions': [
-                {
-                    'question': oe.question,
-                    'difficulty': oe.difficulty.value
-                } for oe in quiz_data['open_ended_questions']
-            ],
-            'total_questions': quiz_data['total_questions']
-        }
+        serialized_quiz = quiz_to_dict(quiz_data)
+        serialized_quiz['total_questions'] = sum(len(serialized_quiz[section]) for section in QUESTION_BUILDERS)
         
         return jsonify(serialized_quiz)
         
@@ -293,15 +811,20 @@ def format_quiz():
     try:
         data = request.get_json()
         text = data.get('text', '')
+        export_format = data.get('format', 'text')
         
         if not text.strip():
             return jsonify({'error': 'Please provide text to analyze'}), 400
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format; choose one of {", ".join(EXPORT_FORMATS)}'}), 400
         
-        generator = QuizGenerator()
-        quiz_data = generator.generate_complete_quiz(text)
-        formatted_output = generator.format_quiz_output(quiz_data)
+        generator = get_generator()
+        if generator is None:
+            return jsonify({'error': 'OpenAI API key is required. Set OPENAI_API_KEY environment variable.'}), 400
+        quiz_data = generator.generate_complete_quiz_with_gpt(text)
+        formatted_output = "".join(iter_export(quiz_data, export_format))
         
-        return jsonify({'formatted_quiz': formatted_output})
+        return jsonify({'formatted_quiz': formatted_output, 'format': export_format})
         
     except Exception as e:
         return jsonify({'error': f'Error formatting quiz: {str(e)}'}), 500
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Union
+
+from quiz_generator import FileSource, QuizGenerator, RateLimitedError, merge_quizzes, quiz_to_dict
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.txt'}
+
+
+def find_documents(directory: str, recursive: bool = False) -> List[str]:
+    """Return the supported documents in ``directory``, sorted by path."""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+        if not recursive:
+            break
+    return sorted(paths)
+
+
+async def _with_backoff(make_call: Callable, max_retries: int, base_delay: float):
+    """Await ``make_call()``, retrying with jittered exponential backoff when rate limited."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await make_call()
+        except RateLimitedError as e:
+            if attempt == max_retries:
+                raise
+            delay = e.retry_after or base_delay * (2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(1.0, 1.5))
+
+
+async def generate_batch(generator: QuizGenerator, documents: List[Union[str, Tuple[str, FileSource]]],
+                         on_result: Callable[[Dict[str, Any]], None],
+                         concurrency: int = 4, extract_workers: int = 4,
+                         max_retries: int = 5, base_delay: float = 1.0) -> None:
+    """Generate a quiz for every document, reporting each result as soon as it completes.
+
+    ``documents`` are paths or ``(filename, source)`` pairs where the source
+    is anything ``QuizGenerator.read_file`` accepts. Text is extracted by
+    ``extract_workers`` threads while at most ``concurrency`` GPT requests
+    are in flight across all documents.
+    """
+    loop = asyncio.get_running_loop()
+    request_slots = asyncio.Semaphore(concurrency)
+
+    async def request(make_call: Callable[[], Awaitable[Any]]) -> Any:
+        async with request_slots:
+            return await _with_backoff(make_call, max_retries, base_delay)
+
+    async def process(document: Union[str, Tuple[str, FileSource]], extract_pool: ThreadPoolExecutor) -> None:
+        started = time.time()
+        filename, source = (document, document) if isinstance(document, str) else document
+        record = {'file': filename}
+        try:
+            text = await loop.run_in_executor(
+                extract_pool, partial(generator.read_file, source, filename=filename)
+            )
+            chunks = generator.select_chunks(text)
+            if len(chunks) <= 1:
+                quiz = await request(lambda: generator.agenerate_complete_quiz_with_gpt(text))
+            else:
+                results = await asyncio.gather(
+                    *(request(partial(generator.agenerate_chunk_quiz_with_gpt, chunk)) for chunk in chunks),
+                    return_exceptions=True
+                )
+                quizzes = [result for result in results if not isinstance(result, BaseException)]
+                if not quizzes:
+                    raise results[0]
+                # Sections still short after merging are re-requested once, for the whole document
+                merged = merge_quizzes(quizzes)
+                quiz = await request(lambda: generator.acomplete_sections(text, merged))
+            record.update({'status': 'ok', 'quiz': quiz_to_dict(quiz)})
+        except Exception as e:
+            record.update({'status': 'error', 'error': str(e)})
+        record['elapsed_seconds'] = round(time.time() - started, 3)
+        on_result(record)
+
+    with ThreadPoolExecutor(max_workers=extract_workers) as extract_pool:
+        await asyncio.gather(*(process(document, extract_pool) for document in documents))
+
+
+def main(argv: List[str] = None) -> None:
+    """Command line entry point: generate quizzes for every document in a folder as JSONL."""
+    parser = argparse.ArgumentParser(
+        prog='python -m quiz_generator',
+        description='Generate quizzes for every PDF, DOCX and TXT file in a directory.'
+    )
+    parser.add_argument('directory', help='folder containing the documents')
+    parser.add_argument('-o', '--output', default='-', help='JSONL output file (default: stdout)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='include subdirectories')
+    parser.add_argument('--concurrency', type=int, default=4, help='maximum concurrent GPT requests')
+    parser.add_argument('--workers', type=int, default=4, help='text extraction threads')
+    parser.add_argument('--max-retries', type=int, default=5, help='retries per request when rate limited')
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        parser.error('OPENAI_API_KEY environment variable is not set')
+
+    paths = find_documents(args.directory, recursive=args.recursive)
+    if not paths:
+        parser.error(f'no PDF, DOCX or TXT files found in {args.directory}')
+
+    generator = QuizGenerator(api_key=api_key)
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+    failures = 0
+
+    def write_record(record: Dict[str, Any]) -> None:
+        nonlocal failures
+        failures += record['status'] != 'ok'
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+
+    try:
+        asyncio.run(generate_batch(
+            generator, paths, write_record,
+            concurrency=args.concurrency,
+            extract_workers=args.workers,
+            max_retries=args.max_retries
+        ))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f'{len(paths) - failures}/{len(paths)} documents processed successfully', file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1 @@
+"""Benchmarks for the quiz generation pipeline; run with ``python -m benchmarks.run``."""
@@ -0,0 +1,94 @@
+"""Measure app cold start and fail if it exceeds a budget.
+
+Each run starts a fresh interpreter, imports ``app`` and serves one request
+to ``/`` with Flask's test client, the way a new container handles its first
+request. Heavy dependencies must not be loaded by then::
+
+    python -m benchmarks.cold_start --runs 10 --budget-ms 400
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once a request needs them
+LAZY_MODULES = ['openai', 'httpx', 'PyPDF2', 'docx', 'numpy', 'tiktoken']
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/')
+responded = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (responded - imported) * 1000,
+    'status': response.status_code,
+    'loaded': [name for name in %r if name in sys.modules]
+}))
+''' % (LAZY_MODULES,)
+
+
+def measure_once(workdir: str) -> Dict[str, Any]:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    env.pop('OPENAI_API_KEY', None)
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE], cwd=workdir, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.cold_start', description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to start')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('QUIZ_COLD_START_BUDGET_MS', '400')),
+                        help='maximum median time from interpreter start to the first response')
+    parser.add_argument('--json', dest='json_path', help='also write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # One untimed run so the timed ones start from compiled bytecode and a warm disk cache
+        measure_once(workdir)
+        runs = [measure_once(workdir) for _ in range(args.runs)]
+
+    totals = [run['import_ms'] + run['first_request_ms'] for run in runs]
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    result = {
+        'runs': len(runs),
+        'import_ms_p50': statistics.median(run['import_ms'] for run in runs),
+        'first_request_ms_p50': statistics.median(run['first_request_ms'] for run in runs),
+        'cold_start_ms_p50': statistics.median(totals),
+        'cold_start_ms_max': max(totals),
+        'budget_ms': args.budget_ms,
+        'eagerly_loaded': loaded
+    }
+    print(f"import {result['import_ms_p50']:.1f} ms, first request {result['first_request_ms_p50']:.1f} ms, "
+          f"cold start p50 {result['cold_start_ms_p50']:.1f} ms (max {result['cold_start_ms_max']:.1f}, "
+          f"budget {args.budget_ms:.0f})")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+    failed = False
+    if loaded:
+        print(f"FAIL: loaded at startup: {', '.join(loaded)}")
+        failed = True
+    if any(run['status'] != 200 for run in runs):
+        print('FAIL: / did not return 200')
+        failed = True
+    if result['cold_start_ms_p50'] > args.budget_ms:
+        print(f"FAIL: cold start exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
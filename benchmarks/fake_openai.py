@@ -0,0 +1,205 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+# Distinct subjects so the canned questions are not near duplicates of each other
+TOPICS = [
+    ("photosynthesis", "chlorophyll", "sunlight", "glucose", "oxygen"),
+    ("plate tectonics", "subduction", "magma", "earthquakes", "continents"),
+    ("supply and demand", "prices", "scarcity", "markets", "equilibrium"),
+    ("the French Revolution", "monarchy", "Bastille", "republic", "Jacobins"),
+    ("binary search", "sorted arrays", "midpoints", "logarithms", "comparisons"),
+    ("the water cycle", "evaporation", "condensation", "precipitation", "runoff")
+]
+
+# Quiz returned by the stand-in server unless another one is supplied
+CANNED_QUIZ = {
+    "mcq_questions": [
+        {
+            "question": f"According to the text, what role does {topic[1]} play in {topic[0]}?",
+            "options": list(topic[1:]),
+            "correct_answer": f"B) {topic[2]}",
+            "difficulty": ["Easy", "Medium", "Hard"][i % 3]
+        } for i, topic in enumerate(TOPICS)
+    ],
+    "true_false_questions": [
+        {
+            "statement": f"The document states that {topic[3]} is unrelated to {topic[0]}.",
+            "correct_answer": i % 2 == 0,
+            "difficulty": ["Easy", "Medium", "Hard"][i % 3]
+        } for i, topic in enumerate(TOPICS[:4])
+    ],
+    "open_ended_questions": [
+        {
+            "question": f"Explain how {topic[4]} supports the main argument about {topic[0]}.",
+            "difficulty": "Hard"
+        } for topic in TOPICS[:2]
+    ],
+    "key_concepts": [topic[0] for topic in TOPICS[:5]]
+}
+
+
+# Characters of content per streamed chunk when a request sets stream=true
+STREAM_CHUNK_CHARS = 16
+
+
+class FakeOpenAIServer:
+    """Local OpenAI-compatible server answering chat completions with a canned quiz.
+
+    Each request waits ``latency`` seconds before responding, which stands in
+    for model time; a random ``slow_fraction`` of requests waits
+    ``slow_latency`` seconds instead, to reproduce a tail of hung calls.
+    Point the app at it with ``OPENAI_BASE_URL=<server.base_url>``.
+    """
+
+    def __init__(self, latency: float = 0.5, quiz: Optional[Dict[str, Any]] = None,
+                 host: str = '127.0.0.1', port: int = 0,
+                 slow_fraction: float = 0.0, slow_latency: float = 30.0):
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.quiz = quiz or CANNED_QUIZ
+        self.request_count = 0
+        # Requests received per model name
+        self.model_counts = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'FakeOpenAIServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeOpenAIServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def usage(self, request: Dict[str, Any], content: str) -> Dict[str, int]:
+        prompt_chars = sum(len(message.get('content', '')) for message in request.get('messages', []))
+        return {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (prompt_chars + len(content)) // 4
+        }
+
+    def completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        content = json.dumps(self.quiz)
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': self.usage(request, content)
+        }
+
+    def request_latency(self) -> float:
+        return self.slow_latency if random.random() < self.slow_fraction else self.latency
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if not self.path.endswith('/chat/completions'):
+                    self.send_error(404)
+                    return
+                request = json.loads(body)
+                with server._lock:
+                    server.request_count += 1
+                    server.model_counts[request.get('model')] += 1
+                try:
+                    if request.get('stream'):
+                        self._send_stream(request)
+                        return
+                    time.sleep(server.request_latency())
+                    self._send_json(server.completion(request))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up, e.g. a hedged or deadline-bounded request
+                    pass
+
+            def _send_stream(self, request: Dict[str, Any]) -> None:
+                # Spread the latency over the chunks, as a model generating tokens would
+                content = json.dumps(server.quiz, indent=2)
+                pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+                completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+                latency = server.request_latency()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                for piece in pieces + [None]:
+                    time.sleep(latency / (len(pieces) + 1))
+                    chunk = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'gpt-3.5-turbo'),
+                        'choices': [{
+                            'index': 0,
+                            'delta': {'content': piece} if piece is not None else {},
+                            'finish_reason': None if piece is not None else 'stop'
+                        }]
+                    }
+                    self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                    self.wfile.flush()
+                if (request.get('stream_options') or {}).get('include_usage'):
+                    # Like the API, usage comes in a last chunk without choices
+                    chunk = dict(chunk, choices=[], usage=server.usage(request, content))
+                    self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.write(b'data: [DONE]\n\n')
+                self.wfile.flush()
+
+            def _send_json(self, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a stand-in OpenAI chat completions server.')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds to wait per request')
+    parser.add_argument('--slow-fraction', type=float, default=0.0, help='fraction of requests that are slow')
+    parser.add_argument('--slow-latency', type=float, default=30.0, help='seconds to wait per slow request')
+    args = parser.parse_args()
+
+    fake = FakeOpenAIServer(latency=args.latency, port=args.port,
+                            slow_fraction=args.slow_fraction, slow_latency=args.slow_latency)
+    print(f'Serving fake OpenAI API at {fake.base_url}')
+    try:
+        fake._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
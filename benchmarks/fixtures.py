@@ -0,0 +1,88 @@
+import os
+import random
+from typing import Dict, List
+
+from docx import Document
+
+# name -> number of pages (about 40 lines of text per page)
+SIZES = {'small': 2, 'medium': 20, 'large': 200}
+LINES_PER_PAGE = 40
+
+_WORDS = (
+    "history science energy cell protein market economy river empire theory "
+    "experiment evidence climate policy equation variable molecule culture "
+    "language structure function process system network analysis model data"
+).split()
+
+
+def make_pages(page_count: int, seed: int = 0) -> List[List[str]]:
+    """Return deterministic pseudo-prose as a list of pages of lines."""
+    rng = random.Random(seed)
+    return [
+        [" ".join(rng.choice(_WORDS) for _ in range(12)).capitalize() + "." for _ in range(LINES_PER_PAGE)]
+        for _ in range(page_count)
+    ]
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """Write a minimal text PDF with one content stream per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    for i, lines in enumerate(pages):
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        stream = "BT /F1 10 Tf 14 TL 40 760 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref_offset = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    for offset in offsets:
+        data += f"{offset:010d} 00000 n \n".encode('latin-1')
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1')
+
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+def write_docx(path: str, pages: List[List[str]]) -> None:
+    document = Document()
+    for lines in pages:
+        for line in lines:
+            document.add_paragraph(line)
+    document.save(path)
+
+
+def write_txt(path: str, pages: List[List[str]]) -> None:
+    with open(path, 'w', encoding='utf-8') as file:
+        for lines in pages:
+            file.write("\n".join(lines) + "\n\n")
+
+
+def build_fixtures(directory: str) -> Dict[str, str]:
+    """Create PDF, DOCX and TXT fixtures of every size; returns ``{'large.pdf': path, ...}``."""
+    os.makedirs(directory, exist_ok=True)
+    writers = {'pdf': write_pdf, 'docx': write_docx, 'txt': write_txt}
+    fixtures = {}
+    for size, page_count in SIZES.items():
+        pages = make_pages(page_count, seed=page_count)
+        for extension, write in writers.items():
+            path = os.path.join(directory, f'{size}.{extension}')
+            if not os.path.exists(path):
+                write(path, pages)
+            fixtures[f'{size}.{extension}'] = path
+    return fixtures
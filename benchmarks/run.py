@@ -0,0 +1,203 @@
+"""Benchmark extraction, prompt building, parsing and end-to-end uploads.
+
+Each stage runs in a fresh process so its peak RSS is measured in isolation.
+End-to-end stages serve the real Flask app on a local port and point it at a
+stand-in OpenAI server, so no API key or network access is needed::
+
+    python -m benchmarks.run --iterations 20 --concurrency 8 --latency 0.5
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List
+
+from benchmarks.fake_openai import CANNED_QUIZ, FakeOpenAIServer
+from benchmarks.fixtures import build_fixtures
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _measure(operation: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+    return {'latencies': latencies, 'elapsed': elapsed}
+
+
+def _multipart_upload(url: str, path: str) -> Dict[str, Any]:
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as file:
+        content = file.read()
+    filename = os.path.basename(path)
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    request = urllib.request.Request(
+        url, data=body, method='POST',
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        # HTTPError holds an open socket and cannot be sent back from the worker process
+        raise RuntimeError(f'{url} returned {e.code}: {e.read().decode("utf-8", "replace")}') from None
+
+
+def _serve_app():
+    """Import the Flask app (with caching, the question bank and rate limiting disabled) and serve it on a free local port."""
+    from werkzeug.serving import make_server
+    import app as quiz_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    generator = quiz_app.get_generator()
+    generator.cache = None
+    generator.text_cache = None
+    generator.question_bank = None
+    generator.scheduler = None
+    server = make_server('127.0.0.1', 0, quiz_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def _run_stage(stage: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark stage; executed in a fresh worker process."""
+    from quiz_generator import QuizGenerator
+
+    iterations = options['iterations']
+    fixtures = options['fixtures']
+    generator = QuizGenerator(api_key='benchmark', pdf_workers=options['pdf_workers'])
+    kind, _, target = stage.partition(':')
+
+    if kind == 'extract':
+        result = _measure(lambda: generator.read_file(fixtures[target]), iterations)
+    elif kind == 'prompt':
+        text = generator.read_file(fixtures['medium.txt'])
+        result = _measure(lambda: generator._build_messages(text), iterations * 100)
+    elif kind == 'parse':
+        content = json.dumps(CANNED_QUIZ, indent=2)
+        result = _measure(lambda: generator._parse_quiz_response(content), iterations * 100)
+    elif kind == 'upload':
+        server, base_url = _serve_app()
+        try:
+            result = _measure(lambda: _multipart_upload(f'{base_url}/upload_file', fixtures[target]), iterations)
+        finally:
+            server.shutdown()
+    elif kind == 'concurrent':
+        server, base_url = _serve_app()
+        path = fixtures[target]
+        latencies = []
+
+        def timed_upload():
+            op_started = time.perf_counter()
+            _multipart_upload(f'{base_url}/upload_file', path)
+            latencies.append(time.perf_counter() - op_started)
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as clients:
+                for future in [clients.submit(timed_upload) for _ in range(iterations * options['concurrency'])]:
+                    future.result()
+            result = {'latencies': latencies, 'elapsed': time.perf_counter() - started}
+        finally:
+            server.shutdown()
+    else:
+        raise ValueError(f'Unknown stage: {stage}')
+
+    latencies = result['latencies']
+    return {
+        'stage': stage,
+        'operations': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'throughput_per_s': len(latencies) / result['elapsed'] if result['elapsed'] else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def default_stages(fixtures: Dict[str, str]) -> List[str]:
+    stages = [f'extract:{name}' for name in sorted(fixtures)]
+    stages += ['prompt', 'parse', 'upload:small.txt', 'upload:medium.pdf', 'upload:large.pdf', 'concurrent:small.pdf']
+    return stages
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'stage':<24}{'ops':>7}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'ops/s':>14}{'peak RSS MB':>13}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(
+            f"{row['stage']:<24}{row['operations']:>7}{row['p50_ms']:>12.3f}{row['p95_ms']:>12.3f}{row['p99_ms']:>12.3f}"
+            f"{row['throughput_per_s']:>14.1f}{row['peak_rss_mb']:>13.1f}"
+        )
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=10, help='operations per stage (x100 for micro stages)')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous clients for concurrent stages')
+    parser.add_argument('--latency', type=float, default=0.5, help='stand-in model latency in seconds')
+    parser.add_argument('--slow-fraction', type=float, default=0.0, help='fraction of stand-in requests that are slow')
+    parser.add_argument('--slow-latency', type=float, default=30.0, help='stand-in latency of slow requests in seconds')
+    parser.add_argument('--pdf-workers', type=int, default=None, help='PDF extraction processes')
+    parser.add_argument('--fixtures-dir', default=os.path.join(tempfile.gettempdir(), 'quiz_benchmark_fixtures'))
+    parser.add_argument('--stage', action='append', dest='stages', help='run only these stages (repeatable)')
+    parser.add_argument('--json', dest='json_path', help='also write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    fixtures = build_fixtures(args.fixtures_dir)
+    options = {
+        'iterations': args.iterations,
+        'concurrency': args.concurrency,
+        'pdf_workers': args.pdf_workers,
+        'fixtures': fixtures
+    }
+
+    results = []
+    with FakeOpenAIServer(latency=args.latency, slow_fraction=args.slow_fraction,
+                          slow_latency=args.slow_latency) as fake_openai:
+        os.environ['OPENAI_API_KEY'] = 'benchmark'
+        os.environ['OPENAI_BASE_URL'] = fake_openai.base_url
+        os.environ.setdefault('QUIZ_CACHE_PATH', os.path.join(args.fixtures_dir, 'quiz_cache.sqlite3'))
+
+        for stage in args.stages or default_stages(fixtures):
+            # A fresh process per stage keeps peak RSS measurements independent
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as worker:
+                results.append(worker.submit(_run_stage, stage, options).result())
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import re
+import zlib
+from typing import Any, Dict, List, Sequence
+
+# Questions are compared as sets of overlapping character shingles of this length
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+# Estimated Jaccard similarity at or above which two questions count as duplicates
+DUPLICATE_THRESHOLD = 0.75
+# Questions hashed per batch, bounding the (shingles x permutations) working array
+SIGNATURE_BATCH = 256
+_PRIME = (1 << 31) - 1
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'which', 'who', 'why', 'with'
+}
+
+_permutations = None
+# NumPy, imported on first use since it is slow to load; False if it is not installed
+_numpy_module = None
+
+
+def _numpy():
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = False
+    return _numpy_module or None
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+
+def question_text(question: Any) -> str:
+    """Text a question is compared on: its question or statement plus any answer options."""
+    text = getattr(question, 'statement', None) or question.question
+    return ' '.join([text] + list(getattr(question, 'options', [])))
+
+
+def _hash_permutations():
+    global _permutations
+    if _permutations is None:
+        np = _numpy()
+        rng = np.random.default_rng(0)
+        _permutations = (
+            rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64),
+            rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+        )
+    return _permutations
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    normalized = _normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return [zlib.crc32(normalized.encode('utf-8'))]
+    return list({
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    })
+
+
+def minhash_signatures(texts: Sequence[str]):
+    """Return a ``(len(texts), NUM_PERMUTATIONS)`` array of MinHash signatures.
+
+    The fraction of positions where two signatures agree estimates the
+    Jaccard similarity of the texts' shingle sets.
+    """
+    np = _numpy()
+    multipliers, offsets = _hash_permutations()
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(texts), SIGNATURE_BATCH):
+        hashes = [np.array(_shingle_hashes(text), dtype=np.uint64) for text in texts[start:start + SIGNATURE_BATCH]]
+        boundaries = np.cumsum([0] + [len(h) for h in hashes[:-1]])
+        # Apply every hash permutation to every shingle at once, then take each text's minimum
+        permuted = (np.concatenate(hashes)[:, None] * multipliers + offsets) % _PRIME
+        signatures[start:start + len(hashes)] = np.minimum.reduceat(permuted, boundaries, axis=0)
+    return signatures
+
+
+class DuplicateIndex:
+    """Signatures of accepted questions, checked all at once for near duplicates of new ones.
+
+    Without NumPy, only questions whose normalized text is identical are
+    treated as duplicates.
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self._signatures = None
+        self._count = 0
+        self._seen = set()
+
+    def __len__(self) -> int:
+        return self._count if _numpy() is not None else len(self._seen)
+
+    def add_all(self, texts: Sequence[str]) -> List[bool]:
+        """Add texts in order, returning False for each that duplicates one accepted before it."""
+        if _numpy() is None:
+            accepted = []
+            for text in texts:
+                normalized = _normalize(text)
+                accepted.append(normalized not in self._seen)
+                self._seen.add(normalized)
+            return accepted
+
+        accepted = []
+        for signature in minhash_signatures(texts) if texts else []:
+            if self._count:
+                similarity = (self._signatures[:self._count] == signature).mean(axis=1)
+                if similarity.max() >= self.threshold:
+                    accepted.append(False)
+                    continue
+            self._append(signature)
+            accepted.append(True)
+        return accepted
+
+    def _append(self, signature) -> None:
+        np = _numpy()
+        if self._signatures is None:
+            self._signatures = np.empty((16, NUM_PERMUTATIONS), dtype=np.uint64)
+        elif self._count == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+        self._signatures[self._count] = signature
+        self._count += 1
+
+
+def _tokens(text: str) -> List[str]:
+    return [word for word in _normalize(text).split() if word not in STOPWORDS]
+
+
+def concept_scores(texts: Sequence[str], key_concepts: Sequence[str]):
+    """Score each text by how much of each key concept's wording it contains.
+
+    Every concept contributes the fraction of its words found in the text,
+    so a question mentioning two concepts in full scores 2.0.
+    """
+    np = _numpy()
+    concept_tokens = [set(_tokens(concept)) for concept in key_concepts]
+    vocabulary = {word: i for i, word in enumerate(sorted(set().union(*concept_tokens)))}
+    if not texts or not vocabulary:
+        return np.zeros(len(texts))
+
+    concepts = np.zeros((len(concept_tokens), len(vocabulary)))
+    for row, words in enumerate(concept_tokens):
+        concepts[row, [vocabulary[word] for word in words]] = 1
+    present = np.zeros((len(texts), len(vocabulary)))
+    for row, text in enumerate(texts):
+        columns = [vocabulary[word] for word in set(_tokens(text)) if word in vocabulary]
+        present[row, columns] = 1
+
+    sizes = np.maximum(concepts.sum(axis=1), 1)
+    return (present @ concepts.T / sizes).sum(axis=1)
+
+
+def rank_and_deduplicate(questions: List[Any], key_concepts: Sequence[str]) -> List[Any]:
+    """Order questions by relevance to the key concepts and drop near duplicates.
+
+    When questions are near duplicates of each other, the most relevant one is
+    kept. Without NumPy, the original order is kept and only exact duplicates
+    are dropped.
+    """
+    texts = [question_text(question) for question in questions]
+    np = _numpy()
+    if np is not None and key_concepts:
+        # Stable sort on the negated score keeps the model's order among equals
+        order = np.argsort(-concept_scores(texts, key_concepts), kind='stable').tolist()
+        questions = [questions[i] for i in order]
+        texts = [texts[i] for i in order]
+    accepted = DuplicateIndex().add_all(texts)
+    return [question for question, keep in zip(questions, accepted) if keep]
+
+
+def rank_quiz(quiz_data: Dict[str, Any], sections: Sequence[str]) -> Dict[str, Any]:
+    """Apply ``rank_and_deduplicate`` to each question section of a quiz."""
+    ranked = dict(quiz_data)
+    key_concepts = quiz_data.get('key_concepts', [])
+    for section in sections:
+        ranked[section] = rank_and_deduplicate(quiz_data.get(section, []), key_concepts)
+    return ranked
@@ -0,0 +1,175 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from metrics import metrics
+
+# Recent request latencies kept for the hedge delay percentile
+LATENCY_WINDOW = 200
+# Latencies needed before the percentile replaces the configured hedge delay
+MIN_LATENCY_SAMPLES = 20
+HEDGE_PERCENTILE = 0.95
+
+
+@dataclass(frozen=True)
+class RequestPolicy:
+    """How long one endpoint's OpenAI calls may take and whether they are hedged."""
+    # Seconds from the start of the web request until its OpenAI calls are abandoned
+    deadline: Optional[float] = None
+    # Send a second attempt when the first is slower than the recent p95
+    hedge: bool = False
+    # Model for the second attempt; the primary model when unset
+    hedge_model: Optional[str] = None
+    # Hedge delay used until enough latencies have been recorded
+    hedge_delay: float = 5.0
+
+
+current_policy: contextvars.ContextVar = contextvars.ContextVar('quiz_request_policy', default=RequestPolicy())
+# Absolute time.monotonic() deadline of the current web request, if any
+current_deadline: contextvars.ContextVar = contextvars.ContextVar('quiz_request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an OpenAI call does not finish before the request's deadline."""
+
+
+def apply_policy(policy: RequestPolicy) -> None:
+    """Apply ``policy`` to the OpenAI calls made from the current context from now on."""
+    current_policy.set(policy)
+    current_deadline.set(time.monotonic() + policy.deadline if policy.deadline else None)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("The request's deadline for OpenAI calls has passed")
+    return remaining
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self, default: float) -> float:
+        """The recent p95 latency, or ``default`` until enough requests have been seen."""
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return default
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE))]
+
+
+def deadline_error() -> DeadlineExceeded:
+    """Count an OpenAI call abandoned at its deadline and return the error to raise."""
+    metrics.inc('openai_deadline_exceeded_total', help_text='OpenAI calls abandoned at their deadline.')
+    return DeadlineExceeded("No response from the OpenAI API before the deadline")
+
+
+def hedged_call(make_call: Callable[[str], Any], model: str, tracker: LatencyTracker) -> Any:
+    """Run ``make_call(model)`` within the current deadline, hedging it if the policy says so.
+
+    ``make_call`` should pass ``remaining_time()`` as its request timeout.
+    The hedge is started once the first attempt has run for the tracker's
+    p95 latency, and whichever attempt succeeds first wins. A sync call
+    cannot be interrupted, so the losing attempt is left to finish within
+    its timeout and its result is discarded.
+    """
+    policy = current_policy.get()
+    timeout = remaining_time()
+    if not policy.hedge:
+        started = time.monotonic()
+        result = make_call(model)
+        tracker.record(time.monotonic() - started)
+        return result
+
+    def attempt(attempt_model: str):
+        started = time.monotonic()
+        result = make_call(attempt_model)
+        if attempt_model == model:
+            tracker.record(time.monotonic() - started)
+        return result
+
+    deadline = current_deadline.get()
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='openai-hedge')
+    try:
+        pending = {pool.submit(contextvars.copy_context().run, attempt, model)}
+        delay = tracker.hedge_delay(policy.hedge_delay)
+        done, _ = wait(pending, timeout=delay if timeout is None else min(delay, timeout))
+        if not done and (deadline is None or time.monotonic() < deadline):
+            metrics.inc('openai_hedged_requests_total', help_text='OpenAI calls that were hedged with a second attempt.')
+            pending.add(pool.submit(contextvars.copy_context().run, attempt, policy.hedge_model or model))
+
+        error = None
+        while pending:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                raise deadline_error()
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                return succeeded[0].result()
+            error = error or next(iter(done)).exception()
+        raise error
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def ahedged_call(make_call: Callable[[str], Awaitable[Any]], model: str,
+                       tracker: LatencyTracker) -> Any:
+    """Async counterpart of ``hedged_call``; the losing attempt is cancelled."""
+    policy = current_policy.get()
+    timeout = remaining_time()
+
+    async def attempt(attempt_model: str):
+        started = time.monotonic()
+        result = await make_call(attempt_model)
+        if attempt_model == model:
+            tracker.record(time.monotonic() - started)
+        return result
+
+    if not policy.hedge:
+        try:
+            return await asyncio.wait_for(attempt(model), timeout)
+        except asyncio.TimeoutError:
+            raise deadline_error()
+
+    deadline = current_deadline.get()
+    pending = {asyncio.ensure_future(attempt(model))}
+    try:
+        delay = tracker.hedge_delay(policy.hedge_delay)
+        done, _ = await asyncio.wait(pending, timeout=delay if timeout is None else min(delay, timeout))
+        if not done and (deadline is None or time.monotonic() < deadline):
+            metrics.inc('openai_hedged_requests_total', help_text='OpenAI calls that were hedged with a second attempt.')
+            pending.add(asyncio.ensure_future(attempt(policy.hedge_model or model)))
+
+        error = None
+        while pending:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise deadline_error()
+            # Checking every finished task's exception also marks it as retrieved
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                return succeeded[0].result()
+            error = error or next(iter(done)).exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,181 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+# Content types worth compressing; images, PDFs and archives are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'application/x-ndjson',
+    'image/svg+xml', 'text/css', 'text/csv', 'text/html', 'text/javascript', 'text/markdown', 'text/plain'
+}
+GZIP_LEVEL = 6
+# Brotli quality 5 compresses better than gzip -6 at a similar speed
+BROTLI_QUALITY = 5
+# Fingerprinted static assets never change under the same URL
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# brotli and orjson are optional and imported on first use; False if not installed
+_optional_modules: Dict[str, Any] = {}
+
+
+def _optional(name: str):
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = __import__(name)
+        except ImportError:
+            _optional_modules[name] = False
+    return _optional_modules[name] or None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return _optional('brotli').compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+class ResponseCompressor:
+    """Compresses response bodies with brotli or gzip, as the client accepts.
+
+    Bodies smaller than ``min_bytes``, streamed responses (server-sent events,
+    NDJSON, exports) and content types that don't compress are sent as is.
+    Compressed static files are kept in a small LRU cache, keyed by path,
+    ETag and encoding, so each asset is only compressed once.
+    """
+
+    def __init__(self, min_bytes: int = 1024, static_cache_entries: int = 64):
+        self.min_bytes = min_bytes
+        self.static_cache_entries = static_cache_entries
+        self._static_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def choose_encoding(self, request) -> Optional[str]:
+        offered = ['br', 'gzip'] if _optional('brotli') else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def __call__(self, request, response):
+        if (response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES or request.method == 'HEAD'):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.direct_passthrough:
+            # A static file sent by send_file
+            etag, _ = response.get_etag()
+            if not etag:
+                return response
+            key = (request.path, etag, encoding)
+            with self._lock:
+                body = self._static_cache.get(key)
+                if body is not None:
+                    self._static_cache.move_to_end(key)
+            response.direct_passthrough = False
+            if body is None:
+                data = response.get_data()
+                if len(data) < self.min_bytes:
+                    return response
+                body = compress(data, encoding)
+                with self._lock:
+                    self._static_cache[key] = body
+                    while len(self._static_cache) > self.static_cache_entries:
+                        self._static_cache.popitem(last=False)
+            else:
+                response.close()
+        elif response.is_streamed:
+            return response
+        else:
+            data = response.get_data()
+            if len(data) < self.min_bytes:
+                return response
+            body = compress(data, encoding)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # Byte ranges would refer to the uncompressed file
+        response.headers.pop('Accept-Ranges', None)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed bytes differ from the ones the strong ETag was computed for
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def add_conditional_etag(request, response):
+    """Give a GET JSON response an ETag and turn it into a 304 when the client already has it."""
+    if (request.method in ('GET', 'HEAD') and response.status_code == 200 and response.mimetype == 'application/json'
+            and not response.is_streamed and not response.get_etag()[0]):
+        response.add_etag()
+        # The client may reuse the body, but only after revalidating it
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+        response.make_conditional(request)
+    return response
+
+
+class StaticFingerprints:
+    """Content hashes of static files, used to version their URLs."""
+
+    def __init__(self, static_folder: str):
+        self.static_folder = static_folder
+        self._hashes: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename: str) -> Optional[str]:
+        """Short content hash of ``filename``, recomputed when the file changes; None if it is missing."""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            modified = os.stat(path).st_mtime
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._hashes.get(filename)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+        with open(path, 'rb') as file:
+            fingerprint = hashlib.sha256(file.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (modified, fingerprint)
+        return fingerprint
+
+    def cache_control(self, request, response):
+        """Let browsers keep a static file for a year when it was requested under its current fingerprint."""
+        filename = (request.view_args or {}).get('filename')
+        if response.status_code in (200, 304) and filename and request.args.get('v') == self.get(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson when it is installed.
+
+    Output matches the default provider's (sorted keys, compact), apart from
+    non-ASCII characters being written as UTF-8 instead of escapes. Pretty
+    printing and types orjson can't handle fall back to the default provider.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        orjson = _optional('orjson')
+        if orjson is None or kwargs.get('indent') or kwargs.get('cls'):
+            return super().dumps(obj, **kwargs)
+        # Dates go through the default provider's HTTP date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        orjson = _optional('orjson')
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
@@ -0,0 +1,128 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings (seconds) and counter increments of the request currently being handled
+_request_timings: contextvars.ContextVar = contextvars.ContextVar('request_timings', default=None)
+_request_counts: contextvars.ContextVar = contextvars.ContextVar('request_counts', default=None)
+
+
+class Metrics:
+    """Process-wide stage latency histograms, counters and gauges in Prometheus text format.
+
+    While disabled, ``span`` returns a shared no-op context manager and
+    ``inc`` returns immediately, so instrumentation costs next to nothing.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, List] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._help: Dict[str, str] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def span(self, stage: str):
+        """Context manager timing one occurrence of a pipeline stage."""
+        if not self.enabled and _request_timings.get() is None:
+            return nullcontext()
+        return self._span(stage)
+
+    @contextmanager
+    def _span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                # [bucket counts..., sum, count]
+                histogram = self._histograms[stage] = [0] * len(DURATION_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def inc(self, name: str, value: float = 1, help_text: str = '', label: str = '') -> None:
+        """Increase counter ``name`` (optionally for one ``label`` value) by ``value``."""
+        counts = _request_counts.get()
+        if counts is not None:
+            counts[name] = counts.get(name, 0) + value
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + value
+            if help_text:
+                self._help[name] = help_text
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        """Expose a value that is read at scrape time, e.g. a cache size or queue depth."""
+        self._gauges[name] = (help_text, read)
+
+    def start_request(self) -> None:
+        """Begin collecting stage timings and counts for the current request."""
+        _request_timings.set({})
+        _request_counts.set({})
+
+    def request_timings(self) -> Optional[Dict[str, float]]:
+        return _request_timings.get()
+
+    def request_counts(self) -> Optional[Dict[str, float]]:
+        return _request_counts.get()
+
+    def render_prometheus(self) -> str:
+        lines = [
+            '# HELP quiz_stage_duration_seconds Time spent in each quiz generation pipeline stage.',
+            '# TYPE quiz_stage_duration_seconds histogram'
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f'quiz_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'quiz_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram[-1]}')
+                lines.append(f'quiz_stage_duration_seconds_sum{{stage="{stage}"}} {histogram[-2]:.6f}')
+                lines.append(f'quiz_stage_duration_seconds_count{{stage="{stage}"}} {histogram[-1]}')
+
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                lines.append(f'# HELP {name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {name} counter')
+                for (counter, label), value in sorted(self._counters.items()):
+                    if counter == name:
+                        labels = f'{{model="{label}"}}' if label else ''
+                        lines.append(f'{name}{labels} {value}')
+
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {read()}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_server_timing(timings: Dict[str, float], counts: Optional[Dict[str, float]] = None) -> str:
+    """Format request timings (durations in ms) and counts (as descriptions) as a ``Server-Timing`` header value."""
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items()]
+    for name, value in (counts or {}).items():
+        if name.endswith('_total'):
+            name = name[:-len('_total')]
+        parts.append(f'{name};desc="{value:g}"')
+    return ', '.join(parts)
+
+
+# Shared registry used by the generator and the web app
+metrics = Metrics()
@@ -0,0 +1,19 @@
+"""PDF page extraction run by the worker processes of ``quiz_generator``'s PDF pool.
+
+Kept apart from ``quiz_generator`` so the pool's forkserver only has to
+preload this module and PyPDF2, not the OpenAI client or the web app.
+"""
+from typing import List
+
+# The PdfReader of the last extraction this worker process took part in, as (extraction id, reader)
+_worker_pdf = None
+
+
+def extract_pdf_page_range(path: str, extraction_id: str, start: int, end: int) -> List[str]:
+    """Extract the text of pages ``start``..``end - 1``; runs in a worker process."""
+    global _worker_pdf
+    if _worker_pdf is None or _worker_pdf[0] != extraction_id:
+        from PyPDF2 import PdfReader
+        _worker_pdf = (extraction_id, PdfReader(path))
+    reader = _worker_pdf[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
@@ -0,0 +1,80 @@
+import math
+import re
+import textwrap
+from collections import Counter
+from typing import List
+
+# Token estimate used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+# Encoding of the chat models the quiz is generated with
+TOKENIZER_ENCODING = "cl100k_base"
+# fit_text stops looking for sentences once less than this much budget is left
+MIN_SENTENCE_TOKENS = 8
+
+# tiktoken encoding, loaded on first use; False once loading has failed
+# (tiktoken is not installed or the encoding file can't be downloaded)
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens of ``text`` with tiktoken, or estimate them from its length."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_whitespace(text: str) -> str:
+    """Remove indentation and trailing spaces, collapse runs of spaces and keep at most one blank line."""
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in textwrap.dedent(text).splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _words(sentence: str) -> List[str]:
+    return [word for word in re.findall(r'[a-z0-9]+', sentence.lower()) if len(word) > 3]
+
+
+def fit_text(text: str, budget: int) -> str:
+    """Return ``text`` if it fits in ``budget`` tokens, otherwise its most informative sentences.
+
+    Sentences are scored by how frequent their words are across the whole
+    text. The best ones are kept in their original order until the budget
+    is used up.
+    """
+    text = compact_whitespace(text)
+    if count_tokens(text) <= budget:
+        return text
+
+    sentences = [sentence for sentence in re.split(r'(?<=[.!?])\s+|\n+', text) if sentence.strip()]
+    frequencies = Counter(word for sentence in sentences for word in _words(sentence))
+
+    def score(sentence: str) -> float:
+        words = _words(sentence)
+        return sum(frequencies[word] for word in set(words)) / math.sqrt(len(words)) if words else 0.0
+
+    ranked = sorted(range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True)
+    kept = set()
+    used = 0
+    for i in ranked:
+        # One extra token for the separating space
+        tokens = count_tokens(sentences[i]) + 1
+        if used + tokens <= budget:
+            kept.add(i)
+            used += tokens
+            if budget - used < MIN_SENTENCE_TOKENS:
+                break
+    if not kept:
+        # Not even one sentence fits; fall back to the start of the text
+        return text[:budget * CHARS_PER_TOKEN]
+    return ' '.join(sentences[i] for i in sorted(kept))
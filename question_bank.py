@@ -0,0 +1,196 @@
+import hashlib
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from dedup import DuplicateIndex, question_text
+from quiz_generator import MAX_KEY_CONCEPTS, QUESTION_TARGETS, Difficulty
+
+
+@dataclass
+class BankEntry:
+    question: Any
+    # Key concepts of the document that the question mentions
+    concepts: List[str]
+    # Number of sessions the question has been served to
+    served: int = 0
+
+
+@dataclass
+class _Pool:
+    """All questions banked for one document, indexed by section and difficulty."""
+    entries: Dict[str, Dict[Difficulty, List[BankEntry]]] = field(default_factory=lambda: {
+        section: {difficulty: [] for difficulty in Difficulty} for section in QUESTION_TARGETS
+    })
+    key_concepts: List[str] = field(default_factory=list)
+    # Near-duplicate index over every question banked for the document
+    duplicates: DuplicateIndex = field(default_factory=DuplicateIndex)
+    # Sessions served from the pool, including the one whose generation created it
+    draws: int = 0
+    refilling: bool = False
+    # Set once a refill produced nothing new, so the model is not asked again
+    exhausted: bool = False
+
+    def count(self, section: str) -> int:
+        return sum(len(entries) for entries in self.entries[section].values())
+
+    def unserved(self, section: str) -> int:
+        return sum(1 for entries in self.entries[section].values() for entry in entries if not entry.served)
+
+
+def _take(candidates: List[BankEntry], covered: set) -> BankEntry:
+    """Pop the least served candidate, preferring one that mentions a concept not yet covered."""
+    least_served = candidates[0].served
+    for i, entry in enumerate(candidates):
+        if entry.served > least_served:
+            break
+        if not covered.issuperset(entry.concepts):
+            return candidates.pop(i)
+    return candidates.pop(0)
+
+
+class QuestionBank:
+    """In-memory pools of generated questions, one per document.
+
+    Every session for a document gets its own randomized draw from the pool,
+    balanced across difficulty levels and spread over the document's key
+    concepts, with the least served questions first. Refills follow demand:
+    once a document has been drawn again, its pool asks for a refill while
+    any section holds fewer than ``low_water`` quizzes' worth of questions
+    no session has seen yet. Pools of the least recently used documents are
+    dropped beyond ``max_documents``.
+    """
+
+    def __init__(self, max_documents: int = 1000, low_water: int = 1, rng: Optional[random.Random] = None):
+        self.max_documents = max_documents
+        self.low_water = low_water
+        self.draws = 0
+        self.refills = 0
+        self._rng = rng or random.Random()
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str) -> str:
+        """Build the pool key for a document's text and the generation settings."""
+        digest = hashlib.sha256()
+        for part in (model, prompt_version, text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def add(self, key: str, quiz_data: Dict[str, Any], served: bool = False) -> int:
+        """Bank the questions of a generated quiz and return how many were new.
+
+        ``served`` records that the quiz has already been sent to a session
+        as it is, without a ``draw``.
+        """
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _Pool()
+                while len(self._pools) > self.max_documents:
+                    self._pools.popitem(last=False)
+            self._pools.move_to_end(key)
+
+            for concept in quiz_data.get('key_concepts', []):
+                concept = concept.strip()
+                if concept and concept not in pool.key_concepts and len(pool.key_concepts) < MAX_KEY_CONCEPTS:
+                    pool.key_concepts.append(concept)
+
+            added = 0
+            for section in QUESTION_TARGETS:
+                questions = quiz_data.get(section, [])
+                texts = [question_text(question) for question in questions]
+                for question, text, keep in zip(questions, texts, pool.duplicates.add_all(texts)):
+                    if not keep:
+                        continue
+                    searchable = text.lower()
+                    concepts = [concept for concept in pool.key_concepts if concept.lower() in searchable]
+                    pool.entries[section][question.difficulty].append(BankEntry(question, concepts, served=int(served)))
+                    added += 1
+
+            if served:
+                pool.draws += 1
+            return added
+
+    def draw(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh quiz drawn from the pool for ``key``, or None if nothing is banked."""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                return None
+            self._pools.move_to_end(key)
+
+            quiz = {}
+            covered = set()
+            for section, (minimum, maximum) in QUESTION_TARGETS.items():
+                buckets = []
+                for entries in pool.entries[section].values():
+                    if entries:
+                        # Shuffle, then stable-sort so less served questions come first
+                        candidates = self._rng.sample(entries, len(entries))
+                        candidates.sort(key=lambda entry: entry.served)
+                        buckets.append(candidates)
+                self._rng.shuffle(buckets)
+
+                wanted = min(pool.count(section), self._rng.randint(minimum, maximum))
+                selected = []
+                while len(selected) < wanted:
+                    # Round-robin over difficulty levels keeps the draw balanced
+                    for candidates in buckets:
+                        if candidates and len(selected) < wanted:
+                            entry = _take(candidates, covered)
+                            entry.served += 1
+                            covered.update(entry.concepts)
+                            selected.append(entry.question)
+                quiz[section] = selected
+
+            if not any(quiz[section] for section in QUESTION_TARGETS):
+                return None
+            quiz['key_concepts'] = list(pool.key_concepts)
+            pool.draws += 1
+            self.draws += 1
+            return quiz
+
+    def begin_refill(self, key: str) -> bool:
+        """Claim the refill of a pool that is running low; False if it needs none or one is running."""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None or pool.refilling or pool.exhausted:
+                return False
+            # A document seen once may never come back, so its first quiz is not followed by a refill
+            if pool.draws < 2:
+                return False
+            if all(pool.unserved(section) >= self.low_water * maximum
+                   for section, (_, maximum) in QUESTION_TARGETS.items()):
+                return False
+            pool.refilling = True
+            self.refills += 1
+            return True
+
+    def end_refill(self, key: str, added: Optional[int] = None) -> None:
+        """Release the refill claimed by ``begin_refill``; ``added`` is how many new questions it banked, None if it failed."""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                pool.refilling = False
+                # Coalesced requests re-adding the same quiz don't count; only a refill that found nothing new does
+                if added == 0:
+                    pool.exhausted = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pools)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'documents': len(self._pools),
+                'questions': sum(pool.count(section) for pool in self._pools.values() for section in QUESTION_TARGETS),
+                'draws': self.draws,
+                'refills': self.refills,
+                'max_documents': self.max_documents
+            }
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class QuizCache:
+    """Persistent, content-addressed cache of generated quizzes backed by SQLite.
+
+    Entries are keyed by a hash of the extracted text together with the
+    generation settings, expire after ``ttl_seconds`` and are evicted least
+    recently used first once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared with forked worker processes
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS quiz_cache ('
+                    'key TEXT PRIMARY KEY, '
+                    'payload TEXT NOT NULL, '
+                    'created_at REAL NOT NULL, '
+                    'accessed_at REAL NOT NULL)'
+                )
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS quiz_cache_accessed_at ON quiz_cache (accessed_at)'
+                )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(text: str, model: str, prompt_version: str, temperature: float) -> str:
+        """Build the cache key for a piece of text and the generation settings."""
+        digest = hashlib.sha256()
+        for part in (model, prompt_version, repr(float(temperature)), text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached quiz for ``key``, or None on a miss."""
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                'SELECT payload, created_at FROM quiz_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute('DELETE FROM quiz_cache WHERE key = ?', (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute('UPDATE quiz_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, quiz: Dict[str, Any]) -> None:
+        """Store a quiz and evict expired and least recently used entries."""
+        now = time.time()
+        payload = json.dumps(quiz)
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO quiz_cache (key, payload, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?)',
+                (key, payload, now, now)
+            )
+            if self.ttl_seconds:
+                conn.execute(
+                    'DELETE FROM quiz_cache WHERE created_at < ?', (now - self.ttl_seconds,)
+                )
+            conn.execute(
+                'DELETE FROM quiz_cache WHERE key IN ('
+                'SELECT key FROM quiz_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def clear(self) -> None:
+        """Remove every cached quiz."""
+        with self._lock, self._connection() as conn:
+            conn.execute('DELETE FROM quiz_cache')
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process and the current entry count."""
+        with self._lock:
+            entries = self._connection().execute('SELECT COUNT(*) FROM quiz_cache').fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds
+            }
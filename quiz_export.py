@@ -0,0 +1,263 @@
+import csv
+import hashlib
+import io
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+# Bump when the output of any format changes, so cached exports and ETags are invalidated
+EXPORT_VERSION = "1"
+
+# Characters with a meaning in Moodle GIFT syntax, escaped with a backslash in question text
+_GIFT_SPECIAL = re.compile(r'([~=#{}:\\])')
+# Spreadsheet apps treat cells starting with these as formulas
+_CSV_FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+def _letter(index: int) -> str:
+    return chr(65 + index)
+
+
+def iter_text(quiz_data: Dict[str, Any]) -> Iterator[str]:
+    """Plain-text layout of ``QuizGenerator.format_quiz_output``, one question at a time."""
+    yield "\n".join([
+        "=" * 60,
+        "AI-GENERATED QUIZ",
+        "=" * 60,
+        f"\nKey Concepts: {', '.join(quiz_data['key_concepts'][:5])}",
+        "\n" + "=" * 40,
+        "MULTIPLE CHOICE QUESTIONS",
+        "=" * 40
+    ])
+    for i, mcq in enumerate(quiz_data['mcq_questions'], 1):
+        lines = [f"\n{i}. {mcq.question} ({mcq.difficulty.value})"]
+        lines += [f"   {_letter(j)}) {option}" for j, option in enumerate(mcq.options)]
+        lines.append(f"   Correct Answer: {_letter(mcq.correct_answer)}) {mcq.options[mcq.correct_answer]}")
+        yield "\n" + "\n".join(lines)
+
+    yield "\n" + "\n".join(["\n\n" + "=" * 40, "TRUE/FALSE QUESTIONS", "=" * 40])
+    for i, tf in enumerate(quiz_data['true_false_questions'], 1):
+        yield "\n" + "\n".join([f"\n{i}. {tf.statement} ({tf.difficulty.value})", f"   Correct Answer: {tf.correct_answer}"])
+
+    yield "\n" + "\n".join(["\n\n" + "=" * 40, "OPEN-ENDED QUESTIONS", "=" * 40])
+    for i, open_q in enumerate(quiz_data['open_ended_questions'], 1):
+        yield f"\n\n{i}. {open_q.question} ({open_q.difficulty.value})"
+
+
+def iter_markdown(quiz_data: Dict[str, Any]) -> Iterator[str]:
+    yield "# Quiz\n"
+    if quiz_data['key_concepts']:
+        yield f"\n**Key concepts:** {', '.join(quiz_data['key_concepts'])}\n"
+
+    yield "\n## Multiple Choice Questions\n"
+    for i, mcq in enumerate(quiz_data['mcq_questions'], 1):
+        lines = [f"\n{i}. {mcq.question} *({mcq.difficulty.value})*"]
+        lines += [f"   - {_letter(j)}) {option}" for j, option in enumerate(mcq.options)]
+        lines.append(f"\n   **Answer:** {_letter(mcq.correct_answer)}) {mcq.options[mcq.correct_answer]}")
+        yield "\n".join(lines) + "\n"
+
+    yield "\n## True/False Questions\n"
+    for i, tf in enumerate(quiz_data['true_false_questions'], 1):
+        yield f"\n{i}. {tf.statement} *({tf.difficulty.value})*\n\n   **Answer:** {tf.correct_answer}\n"
+
+    yield "\n## Open-Ended Questions\n"
+    for i, open_q in enumerate(quiz_data['open_ended_questions'], 1):
+        yield f"\n{i}. {open_q.question} *({open_q.difficulty.value})*\n"
+
+
+def _csv_cell(value: str) -> str:
+    return "'" + value if value.startswith(_CSV_FORMULA_PREFIXES) else value
+
+
+def iter_csv(quiz_data: Dict[str, Any]) -> Iterator[str]:
+    """One row per question, with a column per answer option."""
+    option_count = max([len(mcq.options) for mcq in quiz_data['mcq_questions']] + [2])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(values: List[str]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([_csv_cell(value) for value in values])
+        return buffer.getvalue()
+
+    yield row(['type', 'difficulty', 'question'] + [f'option_{_letter(j).lower()}' for j in range(option_count)] + ['answer'])
+    for mcq in quiz_data['mcq_questions']:
+        options = mcq.options + [''] * (option_count - len(mcq.options))
+        yield row(['multiple_choice', mcq.difficulty.value, mcq.question] + options + [_letter(mcq.correct_answer)])
+    for tf in quiz_data['true_false_questions']:
+        yield row(['true_false', tf.difficulty.value, tf.statement, 'True', 'False']
+                  + [''] * (option_count - 2) + [str(tf.correct_answer)])
+    for open_q in quiz_data['open_ended_questions']:
+        yield row(['open_ended', open_q.difficulty.value, open_q.question] + [''] * option_count + [''])
+
+
+def _gift(text: str) -> str:
+    return _GIFT_SPECIAL.sub(r'\\\1', ' '.join(text.split()))
+
+
+def iter_gift(quiz_data: Dict[str, Any]) -> Iterator[str]:
+    """Moodle GIFT import format; the difficulty is kept in each question's title."""
+    if quiz_data['key_concepts']:
+        yield f"// Key concepts: {', '.join(quiz_data['key_concepts'])}\n\n"
+    for i, mcq in enumerate(quiz_data['mcq_questions'], 1):
+        answers = [f"\t{'=' if j == mcq.correct_answer else '~'}{_gift(option)}" for j, option in enumerate(mcq.options)]
+        yield f"::MCQ {i} ({mcq.difficulty.value})::{_gift(mcq.question)} {{\n" + "\n".join(answers) + "\n}\n\n"
+    for i, tf in enumerate(quiz_data['true_false_questions'], 1):
+        yield f"::TF {i} ({tf.difficulty.value})::{_gift(tf.statement)} {{{'TRUE' if tf.correct_answer else 'FALSE'}}}\n\n"
+    for i, open_q in enumerate(quiz_data['open_ended_questions'], 1):
+        # An empty answer block makes an essay question
+        yield f"::Open {i} ({open_q.difficulty.value})::{_gift(open_q.question)} {{}}\n\n"
+
+
+def _qti_item(ident: str, title: str, question_type: str, text: str, response: str, processing: str = "") -> str:
+    return (
+        f'      <item ident={quoteattr(ident)} title={quoteattr(title)}>\n'
+        f'        <itemmetadata><qtimetadata><qtimetadatafield>'
+        f'<fieldlabel>question_type</fieldlabel><fieldentry>{question_type}</fieldentry>'
+        f'</qtimetadatafield></qtimetadata></itemmetadata>\n'
+        f'        <presentation>\n'
+        f'          <material><mattext texttype="text/plain">{escape(text)}</mattext></material>\n'
+        f'{response}'
+        f'        </presentation>\n'
+        f'{processing}'
+        f'      </item>\n'
+    )
+
+
+def _qti_choice(ident: str, labels: List[str], correct: str) -> Dict[str, str]:
+    choices = "".join(
+        f'              <response_label ident="{_letter(j)}"><material>'
+        f'<mattext texttype="text/plain">{escape(label)}</mattext></material></response_label>\n'
+        for j, label in enumerate(labels)
+    )
+    return {
+        'response': (
+            f'          <response_lid ident="{ident}_response" rcardinality="Single">\n'
+            f'            <render_choice>\n{choices}            </render_choice>\n'
+            f'          </response_lid>\n'
+        ),
+        'processing': (
+            f'        <resprocessing>\n'
+            f'          <outcomes><decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/></outcomes>\n'
+            f'          <respcondition continue="No"><conditionvar>'
+            f'<varequal respident="{ident}_response">{correct}</varequal></conditionvar>'
+            f'<setvar action="Set" varname="SCORE">100</setvar></respcondition>\n'
+            f'        </resprocessing>\n'
+        )
+    }
+
+
+def iter_qti(quiz_data: Dict[str, Any]) -> Iterator[str]:
+    """IMS QTI 1.2 XML, importable by most learning management systems."""
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+        '  <assessment ident="quiz" title="AI-Generated Quiz">\n'
+        '    <section ident="root_section">\n'
+    )
+    for i, mcq in enumerate(quiz_data['mcq_questions'], 1):
+        ident = f'mcq_{i}'
+        yield _qti_item(ident, f'MCQ {i} ({mcq.difficulty.value})', 'multiple_choice_question', mcq.question,
+                        **_qti_choice(ident, mcq.options, _letter(mcq.correct_answer)))
+    for i, tf in enumerate(quiz_data['true_false_questions'], 1):
+        ident = f'tf_{i}'
+        yield _qti_item(ident, f'TF {i} ({tf.difficulty.value})', 'true_false_question', tf.statement,
+                        **_qti_choice(ident, ['True', 'False'], 'A' if tf.correct_answer else 'B'))
+    for i, open_q in enumerate(quiz_data['open_ended_questions'], 1):
+        ident = f'open_{i}'
+        response = (
+            f'          <response_str ident="{ident}_response" rcardinality="Single">'
+            f'<render_fib><response_label ident="answer"/></render_fib></response_str>\n'
+        )
+        yield _qti_item(ident, f'Open {i} ({open_q.difficulty.value})', 'essay_question', open_q.question, response)
+    yield '    </section>\n  </assessment>\n</questestinterop>\n'
+
+
+# Renderer, content type and file extension of each export format
+EXPORT_FORMATS: Dict[str, Dict[str, Any]] = {
+    'text': {'render': iter_text, 'mimetype': 'text/plain', 'extension': 'txt'},
+    'markdown': {'render': iter_markdown, 'mimetype': 'text/markdown', 'extension': 'md'},
+    'csv': {'render': iter_csv, 'mimetype': 'text/csv', 'extension': 'csv'},
+    'gift': {'render': iter_gift, 'mimetype': 'text/plain', 'extension': 'gift'},
+    'qti': {'render': iter_qti, 'mimetype': 'application/xml', 'extension': 'xml'}
+}
+
+
+def iter_export(quiz_data: Dict[str, Any], export_format: str) -> Iterator[str]:
+    """Render a quiz of dataclass questions in ``export_format``, piece by piece."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    render: Callable[[Dict[str, Any]], Iterator[str]] = EXPORT_FORMATS[export_format]['render']
+    return render(quiz_data)
+
+
+def export_key(quiz_dict: Dict[str, Any], export_format: str) -> str:
+    """Cache key and ETag of a quiz's export: a hash of its plain-data form and the format."""
+    digest = hashlib.sha256()
+    for part in (EXPORT_VERSION, export_format, json.dumps(quiz_dict, sort_keys=True)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ExportCache:
+    """In-memory LRU cache of rendered exports, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stream(self, key: str, pieces: Iterator[str]) -> Iterator[bytes]:
+        """Encode and yield rendered pieces, caching the whole export once it completes."""
+        parts = []
+        size = 0
+        for piece in pieces:
+            data = piece.encode('utf-8')
+            size += len(data)
+            # Exports too large to cache are still streamed, just not kept
+            if size <= self.max_bytes:
+                parts.append(data)
+            yield data
+        if size <= self.max_bytes:
+            self.put(key, b''.join(parts))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'max_bytes': self.max_bytes
+            }
@@ -1,20 +1,177 @@
+import asyncio
+import atexit
+import codecs
+import hashlib
+import importlib
+import contextvars
+import io
 import json
-from typing import List, Dict, Any
+import math
+import re
+from collections import Counter
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import List, Dict, Any, BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 from dataclasses import dataclass
 from enum import Enum
 import os
+import random
+import tempfile
+import threading
+import time
+import uuid
 
-try:
-    import PyPDF2
-except ImportError:
-    PyPDF2 = None
+from dedup import DuplicateIndex, question_text, rank_quiz
+from hedging import DeadlineExceeded, LatencyTracker, ahedged_call, hedged_call, remaining_time
+from metrics import metrics
+from pdf_pages import extract_pdf_page_range
+from prompt_builder import CHARS_PER_TOKEN, compact_whitespace, count_tokens, fit_text
+from quiz_export import iter_text
+from quiz_stream import IncrementalQuizParser
+from scheduler import RateLimitedError
+from singleflight import SingleFlight
+from text_cache import hash_source
 
-try:
-    from docx import Document
-except ImportError:
-    Document = None
+# Model settings; together with PROMPT_VERSION they form part of the quiz cache key
+MODEL_NAME = "gpt-3.5-turbo"
+TEMPERATURE = 0.3
+# Bump whenever the quiz prompt changes so cached quizzes are not reused
+PROMPT_VERSION = "2"
 
-import openai
+# A path, raw bytes or a binary file-like object (e.g. an upload stream)
+FileSource = Union[str, bytes, BinaryIO]
+# Block size for incrementally decoding text files
+TXT_READ_SIZE = 64 * 1024
+
+# Text is sent to the model in chunks of roughly this many tokens
+CHUNK_TOKENS = 1000
+
+# (minimum, maximum) number of questions of each type in a finished quiz
+QUESTION_TARGETS = {
+    'mcq_questions': (5, 8),
+    'true_false_questions': (3, 5),
+    'open_ended_questions': (2, 3)
+}
+MAX_KEY_CONCEPTS = 10
+
+# Ask the model for a JSON object (JSON mode) instead of free text
+RESPONSE_FORMAT = {"type": "json_object"}
+# Follow-up requests for sections that came back short or invalid
+MAX_SECTION_RETRIES = 1
+
+# Example item for each section, used in prompts
+SECTION_EXAMPLES = {
+    'mcq_questions': {
+        "question": "Clear, specific question text?",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "correct_answer": "A) Option A",
+        "difficulty": "Easy"
+    },
+    'true_false_questions': {
+        "statement": "Specific, testable statement",
+        "correct_answer": True,
+        "difficulty": "Medium"
+    },
+    'open_ended_questions': {
+        "question": "Thought-provoking analytical question?",
+        "difficulty": "Hard"
+    }
+}
+SECTION_NAMES = {
+    'mcq_questions': "multiple choice",
+    'true_false_questions': "true/false",
+    'open_ended_questions': "open-ended"
+}
+
+# Total prompt tokens (system message, instructions and source text) per request
+PROMPT_TOKEN_BUDGET = 1800
+# Expected completion tokens per generated question, plus key concepts and JSON structure
+COMPLETION_TOKENS_PER_QUESTION = {
+    'mcq_questions': 100,
+    'true_false_questions': 40,
+    'open_ended_questions': 35
+}
+COMPLETION_OVERHEAD_TOKENS = 60
+# A full quiz asks for the maximum of every section
+FULL_QUIZ_COUNTS = {section: maximum for section, (_, maximum) in QUESTION_TARGETS.items()}
+# Headroom on max_tokens for wordier than expected questions
+COMPLETION_MARGIN = 1.3
+# max_tokens every request reserved before it was sized to the questions asked for; savings are measured against it
+UNFITTED_MAX_TOKENS = 3000
+
+# Response format shown to the model
+QUIZ_EXAMPLE = json.dumps(dict(
+    {section: [example] for section, example in SECTION_EXAMPLES.items()},
+    key_concepts=["concept1", "concept2", "concept3", "concept4", "concept5"]
+))
+
+# Instructions of the quiz request; indentation is stripped by compact_whitespace before sending
+QUIZ_PROMPT = """
+    You are an expert educational assessment designer. Analyze the following text and create a comprehensive, high-quality quiz that tests deep understanding of the content.
+
+    TEXT TO ANALYZE:
+    {text}
+
+    INSTRUCTIONS:
+    Create a quiz that demonstrates mastery of the material through varied question types and cognitive levels.
+
+    MULTIPLE CHOICE QUESTIONS (5-8 questions):
+    - Focus on key facts, concepts, relationships, and applications
+    - Create plausible distractors that test common misconceptions
+    - Use clear, unambiguous language
+    - Avoid "all of the above" or "none of the above" options
+    - Test different cognitive levels: recall, comprehension, application, analysis
+
+    TRUE/FALSE QUESTIONS (3-5 questions):
+    - Focus on specific factual claims from the text
+    - Avoid absolute terms unless they appear in the source
+    - Test important details and relationships
+    - Make false statements plausible but clearly incorrect
+
+    OPEN-ENDED QUESTIONS (2-3 questions):
+    - Require synthesis, analysis, or evaluation
+    - Ask for explanations, comparisons, or applications
+    - Encourage critical thinking about the content
+    - Should not have simple yes/no answers
+
+    DIFFICULTY LEVELS:
+    - Easy: Direct recall of explicitly stated information
+    - Medium: Understanding relationships and making connections
+    - Hard: Analysis, synthesis, or application of concepts
+
+    QUALITY STANDARDS:
+    - Questions must be answerable from the provided text
+    - Avoid trivial details unless they're central to understanding
+    - Ensure cultural neutrality and accessibility
+    - Use precise, professional language
+    - Test the most educationally significant content
+
+    Respond ONLY with valid JSON in this exact format:
+    {example}
+"""
+
+# Instructions of a follow-up request for sections that came back short
+RETRY_PROMPT = """
+    Write {wanted} question(s) that test understanding of the following text. Questions must be answerable from the text; difficulty is Easy, Medium or Hard.
+
+    TEXT TO ANALYZE:
+    {text}
+
+    Respond ONLY with valid JSON in this exact format:
+    {example}
+"""
+
+SYSTEM_PROMPT = "You are an expert educational assessment designer with 20+ years of experience creating high-quality, pedagogically sound quizzes. You excel at identifying the most important learning objectives and creating questions that accurately assess student understanding at multiple cognitive levels."
+
+def _rate_limited_error(error: Exception) -> RateLimitedError:
+    retry_after = None
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            retry_after = None
+    return RateLimitedError(f"GPT quiz generation failed: {error}", retry_after=retry_after)
 
 class Difficulty(Enum):
     EASY = "Easy"
@@ -25,7 +182,8 @@ class Difficulty(Enum):
 class MCQQuestion:
     question: str
     options: List[str]
-    correct_answer: str
+    # Index into ``options``
+    correct_answer: int
     difficulty: Difficulty
 
 @dataclass
@@ -39,228 +197,1098 @@ class OpenEndedQuestion:
     question: str
     difficulty: Difficulty
 
+def quiz_to_dict(quiz_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a quiz of dataclass questions into plain JSON-serializable data."""
+    return {
+        'mcq_questions': [
+            {
+                'question': mcq.question,
+                'options': mcq.options,
+                'correct_answer': mcq.correct_answer,
+                'difficulty': mcq.difficulty.value
+            } for mcq in quiz_data['mcq_questions']
+        ],
+        'true_false_questions': [
+            {
+                'statement': tf.statement,
+                'correct_answer': tf.correct_answer,
+                'difficulty': tf.difficulty.value
+            } for tf in quiz_data['true_false_questions']
+        ],
+        'open_ended_questions': [
+            {
+                'question': oq.question,
+                'difficulty': oq.difficulty.value
+            } for oq in quiz_data['open_ended_questions']
+        ],
+        'key_concepts': quiz_data.get('key_concepts', [])
+    }
+
+# Letter labels such as "B) ", "(b) " or "B. " in front of an option or answer
+OPTION_LABEL = re.compile(r'^\(?([A-Ha-h])[).:]\s*')
+
+def _required_text(item: Dict[str, Any], field: str) -> str:
+    value = item[field]
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{field}' must be a non-empty string")
+    return value.strip()
+
+def _difficulty(item: Dict[str, Any], default: str) -> Difficulty:
+    value = item.get('difficulty')
+    try:
+        return Difficulty(str(value).strip().capitalize()) if value else Difficulty(default)
+    except ValueError:
+        return Difficulty(default)
+
+def _strip_option_label(text: str) -> str:
+    match = OPTION_LABEL.match(text)
+    return text[match.end():] if match else text
+
+def correct_option_index(answer: Any, options: List[str]) -> int:
+    """Resolve an MCQ answer given as an index, a letter, "B) text" or the option text to an option index.
+    
+    Text matching an option as written wins, so an answer such as "A. Lincoln"
+    is only read as the letter A when no option matches it.
+    """
+    if isinstance(answer, bool):
+        raise ValueError("'correct_answer' must identify an option")
+    if isinstance(answer, int):
+        index = answer
+    elif isinstance(answer, str):
+        answer = answer.strip()
+        texts = [option.strip().lower() for option in options]
+        bodies = [_strip_option_label(option.strip()).lower() for option in options]
+        body = _strip_option_label(answer).lower()
+        label = OPTION_LABEL.match(answer)
+        if answer.lower() in texts:
+            index = texts.index(answer.lower())
+        elif body and body in bodies:
+            index = bodies.index(body)
+        elif label or (len(answer) == 1 and answer.isalpha()):
+            index = ord((label.group(1) if label else answer).upper()) - ord('A')
+        else:
+            raise ValueError(f"'correct_answer' {answer!r} does not match any option")
+    else:
+        raise ValueError("'correct_answer' must identify an option")
+    
+    if not 0 <= index < len(options):
+        raise ValueError(f"'correct_answer' {answer!r} is out of range")
+    return index
+
+def _option_labels_in_order(options: List[str]) -> bool:
+    """True when the options start with the labels A, B, C, ... in order."""
+    for position, option in enumerate(options):
+        match = OPTION_LABEL.match(option)
+        if not match or match.group(1).upper() != chr(ord('A') + position) or not option[match.end():].strip():
+            return False
+    return True
+
+def mcq_from_dict(mcq: Dict[str, Any]) -> MCQQuestion:
+    """Build a validated MCQQuestion; raises ValueError, KeyError or TypeError for malformed items."""
+    options = mcq['options']
+    if not isinstance(options, list) or len(options) < 2:
+        raise ValueError("'options' must list at least two choices")
+    if not all(isinstance(option, str) and option.strip() for option in options):
+        raise ValueError("'options' must be non-empty strings")
+    options = [option.strip() for option in options]
+    correct_answer = correct_option_index(mcq['correct_answer'], options)
+    # Drop "A) " style labels the model sometimes adds; the interface adds its own.
+    # Text such as "E. coli" or "A. Lincoln" is only a label when the letters run A, B, C, ...
+    if _option_labels_in_order(options):
+        options = [_strip_option_label(option).strip() for option in options]
+    
+    return MCQQuestion(
+        question=_required_text(mcq, 'question'),
+        options=options,
+        correct_answer=correct_answer,
+        difficulty=_difficulty(mcq, 'Medium')
+    )
+
+def true_false_from_dict(tf: Dict[str, Any]) -> TrueFalseQuestion:
+    """Build a validated TrueFalseQuestion."""
+    answer = tf['correct_answer']
+    if isinstance(answer, str) and answer.strip().lower() in ('true', 'false'):
+        answer = answer.strip().lower() == 'true'
+    if not isinstance(answer, bool):
+        raise ValueError("'correct_answer' must be true or false")
+    
+    return TrueFalseQuestion(
+        statement=_required_text(tf, 'statement'),
+        correct_answer=answer,
+        difficulty=_difficulty(tf, 'Medium')
+    )
+
+def open_ended_from_dict(oq: Dict[str, Any]) -> OpenEndedQuestion:
+    """Build a validated OpenEndedQuestion."""
+    return OpenEndedQuestion(
+        question=_required_text(oq, 'question'),
+        difficulty=_difficulty(oq, 'Hard')
+    )
+
+# Builds the question dataclass for each section of the quiz JSON
+QUESTION_BUILDERS = {
+    'mcq_questions': mcq_from_dict,
+    'true_false_questions': true_false_from_dict,
+    'open_ended_questions': open_ended_from_dict
+}
+
+def build_questions(section: str, items: Any) -> List[Any]:
+    """Build the valid questions of one section, skipping malformed items."""
+    if not isinstance(items, list):
+        return []
+    questions = []
+    for item in items:
+        try:
+            questions.append(QUESTION_BUILDERS[section](item))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            metrics.inc('quiz_invalid_questions_total', help_text='Generated questions rejected by validation.')
+    return questions
+
+def quiz_from_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild a quiz of dataclass questions from plain data, skipping malformed questions."""
+    quiz = {section: build_questions(section, data.get(section)) for section in QUESTION_BUILDERS}
+    key_concepts = data.get('key_concepts')
+    quiz['key_concepts'] = [concept for concept in key_concepts if isinstance(concept, str)] if isinstance(key_concepts, list) else []
+    return quiz
+
+def split_text_into_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Split text into chunks of at most ``max_tokens`` (estimated), breaking on paragraphs."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_len = 0
+    
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        
+        # Paragraphs longer than a whole chunk are cut at sentence boundaries
+        pieces = [paragraph]
+        if len(paragraph) > max_chars:
+            pieces = []
+            piece = ""
+            for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+                while len(sentence) > max_chars:
+                    if piece:
+                        pieces.append(piece)
+                        piece = ""
+                    pieces.append(sentence[:max_chars])
+                    sentence = sentence[max_chars:]
+                if piece and len(piece) + len(sentence) + 1 > max_chars:
+                    pieces.append(piece)
+                    piece = ""
+                piece = f"{piece} {sentence}" if piece else sentence
+            if piece:
+                pieces.append(piece)
+        
+        for piece in pieces:
+            if current and current_len + len(piece) + 2 > max_chars:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_len = 0
+            current.append(piece)
+            current_len += len(piece) + 2
+    
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _import_optional(name: str):
+    """Import a heavy dependency on first use; None if it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+# Upper bound on PDF extraction processes, however many CPUs there are
+MAX_PDF_WORKERS = 8
+
+# One process pool shared by every extraction in this process, created on first use
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared PDF extraction pool, creating it with ``workers`` processes on first use."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            import multiprocessing
+            # Forking a process that runs server threads can copy held locks into the child
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            context = multiprocessing.get_context(method)
+            if method == 'forkserver':
+                # Workers only need the extraction code, not the application that started them
+                context.set_forkserver_preload(['pdf_pages'])
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=max(1, min(workers, MAX_PDF_WORKERS)),
+                mp_context=context
+            )
+            atexit.register(_shutdown_pdf_pool)
+        return _pdf_pool
+
+def _shutdown_pdf_pool() -> None:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=True, cancel_futures=True)
+            _pdf_pool = None
+
+def _open_binary(source: FileSource):
+    """Open a path, bytes or binary file-like object for reading without closing caller-owned streams."""
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if source.seekable():
+        source.seek(0)
+    return nullcontext(source)
+
+def _source_extension(source: FileSource, filename: Optional[str] = None) -> str:
+    """Return the lower-case extension of ``filename``, or of the source's own path or name."""
+    name = filename
+    if name is None and isinstance(source, (str, os.PathLike)):
+        name = os.fspath(source)
+    if name is None:
+        name = getattr(source, 'name', None)
+    if not isinstance(name, str):
+        raise Exception("Cannot determine file format without a filename")
+    return os.path.splitext(name)[1].lower()
+
+def _prompt_version(candidate: bool) -> str:
+    # Chunk candidates skip the section retry, so they are cached and coalesced apart from complete quizzes
+    return PROMPT_VERSION + "-chunk" if candidate else PROMPT_VERSION
+
+def merge_quizzes(quizzes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk quizzes into one quiz honoring QUESTION_TARGETS.
+
+    Near-duplicate questions are dropped and the remaining ones are taken
+    round-robin across chunks so the final quiz covers the whole document.
+    """
+    merged = {}
+    for section, (_, maximum) in QUESTION_TARGETS.items():
+        index = DuplicateIndex()
+        per_chunk = []
+        for quiz in quizzes:
+            questions = quiz.get(section, [])
+            accepted = index.add_all([question_text(question) for question in questions])
+            per_chunk.append([question for question, keep in zip(questions, accepted) if keep])
+        
+        selected = []
+        depth = 0
+        while len(selected) < maximum and any(depth < len(questions) for questions in per_chunk):
+            for questions in per_chunk:
+                if depth < len(questions) and len(selected) < maximum:
+                    selected.append(questions[depth])
+            depth += 1
+        merged[section] = selected
+    
+    concept_counts = Counter()
+    for quiz in quizzes:
+        for concept in quiz.get('key_concepts', []):
+            concept_counts[concept.strip()] += 1
+    merged['key_concepts'] = [concept for concept, _ in concept_counts.most_common(MAX_KEY_CONCEPTS)]
+    return merged
+
 class QuizGenerator:
-    def __init__(self, api_key: str = None):
-        """Initialize the QuizGenerator with GPT analysis only."""
+    def __init__(self, api_key: str = None, cache=None, chunk_concurrency: int = 4,
+                 max_chunks: Optional[int] = None, max_text_chars: Optional[int] = None,
+                 pdf_workers: Optional[int] = None, parallel_pdf_threshold: int = 50,
+                 text_cache=None, question_bank=None, prompt_token_budget: int = PROMPT_TOKEN_BUDGET,
+                 scheduler=None):
+        """Initialize the QuizGenerator with GPT analysis only.
+
+        ``cache`` is an optional ``QuizCache`` used to skip the GPT call for
+        text that has already been turned into a quiz. ``chunk_concurrency``
+        and ``max_chunks`` control chunked generation for long documents, and
+        ``max_text_chars`` caps how much text ``read_file`` extracts. PDFs with
+        at least ``parallel_pdf_threshold`` pages are extracted by a
+        process pool shared by all generators, of ``pdf_workers`` processes
+        (default: one per CPU, at most ``MAX_PDF_WORKERS``). ``text_cache`` is an
+        optional ``TextCache`` of extracted text keyed by the file's hash.
+        ``question_bank`` is an optional ``QuestionBank`` that ``draw_quiz``
+        serves repeat documents from. Each request's system message,
+        instructions and source text are fitted into ``prompt_token_budget``
+        tokens. ``scheduler`` is an optional ``RequestScheduler`` that every
+        OpenAI request waits on before it is sent. Deadlines and hedging
+        of OpenAI requests follow the ``RequestPolicy`` of the calling context
+        (see ``hedging.py``).
+        """
         if not api_key:
             raise ValueError("OpenAI API key is required. Set OPENAI_API_KEY environment variable.")
         
+        self.cache = cache
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self.max_chunks = max_chunks
+        self.max_text_chars = max_text_chars
+        self.pdf_workers = pdf_workers if pdf_workers is not None else (os.cpu_count() or 1)
+        self.parallel_pdf_threshold = parallel_pdf_threshold
+        self.text_cache = text_cache
+        self.question_bank = question_bank
+        self.prompt_token_budget = prompt_token_budget
+        self.scheduler = scheduler
+        # Recent OpenAI latencies, whose p95 decides when a request is hedged
+        self.latency = LatencyTracker()
+        # Generations currently running, so identical concurrent requests can share them.
+        # A deadline or rate limit hit by one request is not passed on to the others.
+        self.in_flight = SingleFlight(unshared_errors=(DeadlineExceeded, RateLimitedError))
+        
+        # The OpenAI clients (and the openai package) are only loaded on the first request
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+        self._client_lock = threading.Lock()
+
+    def _build_client(self, client_class: str):
+        import openai
         try:
-            self.client = openai.OpenAI(api_key=api_key)
+            return getattr(openai, client_class)(api_key=self.api_key)
         except Exception as e:
             raise Exception(f"Error initializing OpenAI client: {e}")
 
-    def read_pdf_file(self, file_path: str) -> str:
-        """Extract text from PDF file."""
+    @property
+    def client(self):
+        """Connection-pooled OpenAI client, built on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client('OpenAI')
+        return self._client
+
+    @property
+    def async_client(self):
+        """Async OpenAI client, built on first use."""
+        if self._async_client is None:
+            with self._client_lock:
+                if self._async_client is None:
+                    self._async_client = self._build_client('AsyncOpenAI')
+        return self._async_client
+
+    def iter_pdf_pages(self, source: FileSource) -> Iterator[str]:
+        """Lazily yield the text of each PDF page."""
+        PyPDF2 = _import_optional('PyPDF2')
         if not PyPDF2:
             raise Exception("PyPDF2 library not installed")
         
         try:
-            text = ""
-            with open(file_path, 'rb') as file:
+            with _open_binary(source) as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            return text.strip()
+                    yield page.extract_text() or ""
         except Exception as e:
             raise Exception(f"Error reading PDF file: {str(e)}")
     
-    def read_docx_file(self, file_path: str) -> str:
-        """Extract text from DOCX file."""
-        if not Document:
+    def iter_docx_paragraphs(self, source: FileSource) -> Iterator[str]:
+        """Lazily yield the text of each DOCX paragraph."""
+        docx = _import_optional('docx')
+        if not docx:
             raise Exception("python-docx library not installed")
         
         try:
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text.strip()
+            with _open_binary(source) as file:
+                doc = docx.Document(file)
+                for paragraph in doc.paragraphs:
+                    yield paragraph.text
         except Exception as e:
             raise Exception(f"Error reading DOCX file: {str(e)}")
     
-    def read_file(self, file_path: str) -> str:
-        """Read and extract text from various file formats."""
-        file_extension = os.path.splitext(file_path)[1].lower()
+    def iter_txt_lines(self, source: FileSource) -> Iterator[str]:
+        """Lazily yield the lines of UTF-8 text, decoding it incrementally in blocks."""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        partial = []
+        with _open_binary(source) as file:
+            while True:
+                block = file.read(TXT_READ_SIZE)
+                *lines, tail = decoder.decode(block, final=not block).split('\n')
+                if lines:
+                    lines[0] = "".join(partial) + lines[0]
+                    partial = []
+                    for line in lines:
+                        yield line.rstrip('\r')
+                partial.append(tail)
+                if not block:
+                    break
+        if any(partial):
+            yield "".join(partial).rstrip('\r')
+    
+    def iter_file_segments(self, source: FileSource, filename: Optional[str] = None) -> Iterator[str]:
+        """Lazily yield text segments (pages, paragraphs or lines) from a supported file.
+
+        ``source`` may be a path, raw bytes or a binary file-like object; for
+        the latter two ``filename`` supplies the file format.
+        """
+        file_extension = _source_extension(source, filename)
         
         if file_extension == '.pdf':
-            return self.read_pdf_file(file_path)
+            return self.iter_pdf_pages(source)
         elif file_extension == '.docx':
-            return self.read_docx_file(file_path)
+            return self.iter_docx_paragraphs(source)
         elif file_extension == '.txt':
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read().strip()
+            return self.iter_txt_lines(source)
         else:
             raise Exception(f"Unsupported file format: {file_extension}")
+    
+    def _join_segments(self, segments: Iterable[str], max_chars: Optional[int] = None) -> str:
+        """Join segments with newlines, stopping once ``max_chars`` characters are collected."""
+        parts = []
+        total = 0
+        for segment in segments:
+            parts.append(segment)
+            total += len(segment) + 1
+            if max_chars and total >= max_chars:
+                break
+        # Close the generator now so no further pages are parsed
+        if hasattr(segments, 'close'):
+            segments.close()
+        text = "\n".join(parts)
+        if max_chars:
+            text = text[:max_chars]
+        return text.strip()
+    
+    def read_pdf_file(self, source: FileSource, max_chars: Optional[int] = None) -> str:
+        """Extract text from PDF file.
+
+        Large PDFs are split into page ranges that are extracted in parallel
+        worker processes and reassembled in page order.
+        """
+        PyPDF2 = _import_optional('PyPDF2')
+        if not PyPDF2:
+            raise Exception("PyPDF2 library not installed")
+        
+        if self.pdf_workers > 1:
+            try:
+                with _open_binary(source) as file:
+                    page_count = len(PyPDF2.PdfReader(file).pages)
+                    spool_path = None
+                    # Workers open paths themselves; in-memory sources are written to a temporary file
+                    if page_count >= self.parallel_pdf_threshold and not isinstance(source, (str, os.PathLike)):
+                        file.seek(0)
+                        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as spool:
+                            spool_path = spool.name
+                            spool.write(file.read())
+            except Exception as e:
+                raise Exception(f"Error reading PDF file: {str(e)}")
+            
+            if page_count >= self.parallel_pdf_threshold:
+                pages = self._iter_pdf_pages_parallel(spool_path or os.fspath(source), page_count)
+                try:
+                    return self._join_segments(pages, max_chars)
+                finally:
+                    # Waits for ranges still being extracted before their file is removed
+                    pages.close()
+                    if spool_path:
+                        os.remove(spool_path)
+        
+        return self._join_segments(self.iter_pdf_pages(source), max_chars)
+    
+    def _iter_pdf_pages_parallel(self, path: str, page_count: int) -> Iterator[str]:
+        """Yield PDF page texts in order while page ranges are extracted by the shared process pool."""
+        pool = _get_pdf_pool(self.pdf_workers)
+        workers = max(1, min(self.pdf_workers, MAX_PDF_WORKERS))
+        # Several ranges per worker keeps the pool busy and lets a budget stop extraction early
+        range_size = max(1, -(-page_count // (workers * 4)))
+        extraction_id = uuid.uuid4().hex
+        futures = []
+        try:
+            for start in range(0, page_count, range_size):
+                futures.append(pool.submit(
+                    extract_pdf_page_range, path, extraction_id, start, min(start + range_size, page_count)
+                ))
+            for future in futures:
+                yield from future.result()
+        except Exception as e:
+            raise Exception(f"Error reading PDF file: {str(e)}")
+        finally:
+            # Ranges not yet started are dropped when the caller stops early; the rest still read the file
+            for future in futures:
+                future.cancel()
+            wait(futures)
+    
+    def read_docx_file(self, source: FileSource, max_chars: Optional[int] = None) -> str:
+        """Extract text from DOCX file."""
+        return self._join_segments(self.iter_docx_paragraphs(source), max_chars)
+    
+    def read_file(self, source: FileSource, max_chars: Optional[int] = None,
+                  filename: Optional[str] = None) -> str:
+        """Read and extract text from various file formats.
+
+        ``source`` may be a path, raw bytes or a binary file-like object such
+        as an upload stream, in which case ``filename`` gives the format.
+        Extraction stops as soon as ``max_chars`` characters (default: the
+        generator's ``max_text_chars``) have been collected, so pages beyond
+        the budget are never parsed. With a text cache configured, files whose
+        bytes were seen before are not parsed at all.
+        """
+        if max_chars is None:
+            max_chars = self.max_text_chars
+        
+        cache_key = None
+        if self.text_cache is not None:
+            # Identical bytes always extract to identical text, so skip the parsers entirely
+            with metrics.span('text_cache_lookup'):
+                cache_key = f"{hash_source(source)}-{max_chars or 0}"
+                cached = self.text_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        with metrics.span('text_extraction'):
+            if _source_extension(source, filename) == '.pdf':
+                text = self.read_pdf_file(source, max_chars)
+            else:
+                text = self._join_segments(self.iter_file_segments(source, filename), max_chars)
+        
+        if cache_key is not None:
+            self.text_cache.set(cache_key, text)
+        return text
+
+    def _cache_key(self, text: str, candidate: bool = False) -> str:
+        return self.cache.make_key(text, MODEL_NAME, _prompt_version(candidate), TEMPERATURE)
+
+    def _flight_key(self, text: str, candidate: bool = False) -> str:
+        """Key under which concurrent generations for the same text are coalesced."""
+        digest = hashlib.sha256()
+        for part in (MODEL_NAME, _prompt_version(candidate), text):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _generate_and_cache(self, text: str, cache_key: Optional[str], candidate: bool = False) -> Dict[str, Any]:
+        quiz_data = self._generate_quiz_with_gpt(text, complete=not candidate)
+        if cache_key is not None:
+            self.cache.set(cache_key, quiz_to_dict(quiz_data))
+        return quiz_data
+
+    async def _agenerate_and_cache(self, text: str, cache_key: Optional[str], candidate: bool = False) -> Dict[str, Any]:
+        quiz_data = await self._agenerate_quiz_with_gpt(text, complete=not candidate)
+        if cache_key is not None:
+            self.cache.set(cache_key, quiz_to_dict(quiz_data))
+        return quiz_data
+
+    def _lookup_cache(self, text: str, candidate: bool = False) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return the cache key for ``text`` and the cached quiz, if any."""
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(text, candidate)
+        with metrics.span('cache_lookup'):
+            cached = self.cache.get(cache_key)
+        return cache_key, quiz_from_dict(cached) if cached is not None else None
 
     def generate_complete_quiz_with_gpt(self, text: str) -> Dict[str, Any]:
-        """Generate a complete quiz using GPT analysis."""
+        """Generate a complete quiz using GPT analysis.
+
+        When a cache is configured, a quiz previously generated for identical
+        text (with the same model, prompt version and temperature) is returned
+        without calling the API. Concurrent calls for identical text share a
+        single API call and all receive its result or its error.
+        """
+        return self._generate_shared(text, candidate=False)
+
+    async def agenerate_complete_quiz_with_gpt(self, text: str) -> Dict[str, Any]:
+        """Async counterpart of ``generate_complete_quiz_with_gpt`` using the shared AsyncOpenAI client."""
+        return await self._agenerate_shared(text, candidate=False)
+
+    def generate_chunk_quiz_with_gpt(self, chunk: str) -> Dict[str, Any]:
+        """Generate a candidate quiz for one chunk of a longer document.
+
+        Cached and coalesced like ``generate_complete_quiz_with_gpt``, but
+        sections that come back short are not re-requested; that is done
+        once, on the merged quiz (see ``complete_sections``).
+        """
+        return self._generate_shared(chunk, candidate=True)
+
+    async def agenerate_chunk_quiz_with_gpt(self, chunk: str) -> Dict[str, Any]:
+        """Async counterpart of ``generate_chunk_quiz_with_gpt``."""
+        return await self._agenerate_shared(chunk, candidate=True)
+
+    def _generate_shared(self, text: str, candidate: bool) -> Dict[str, Any]:
+        cache_key, cached = self._lookup_cache(text, candidate)
+        if cached is not None:
+            return cached
+        
+        quiz_data = self.in_flight.do(self._flight_key(text, candidate),
+                                      lambda: self._generate_and_cache(text, cache_key, candidate))
+        # Waiters share one result; give each caller its own top-level dict
+        return dict(quiz_data)
+
+    async def _agenerate_shared(self, text: str, candidate: bool) -> Dict[str, Any]:
+        cache_key, cached = self._lookup_cache(text, candidate)
+        if cached is not None:
+            return cached
+        
+        quiz_data = await self.in_flight.ado(self._flight_key(text, candidate),
+                                             lambda: self._agenerate_and_cache(text, cache_key, candidate))
+        return dict(quiz_data)
+
+    def select_chunks(self, text: str) -> List[str]:
+        """Split text into the chunks that chunked generation sends to GPT."""
+        chunks = split_text_into_chunks(text)
+        if self.max_chunks and len(chunks) > self.max_chunks:
+            # Sample evenly spaced chunks so every part of the document is represented
+            step = len(chunks) / self.max_chunks
+            chunks = [chunks[int(i * step)] for i in range(self.max_chunks)]
+        return chunks
+
+    def generate_chunked_quiz_with_gpt(self, text: str) -> Dict[str, Any]:
+        """Generate a quiz covering the whole text, not just its beginning.
+
+        The text is split into token-budgeted chunks, a candidate quiz is
+        generated for each chunk concurrently, and the candidates are merged
+        and deduplicated into a single quiz. Sections the merged quiz is
+        still short of are re-requested once, for the whole text.
+        """
+        chunks = self.select_chunks(text)
+        if len(chunks) <= 1:
+            return self.generate_complete_quiz_with_gpt(text)
+        
+        quizzes = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(self.chunk_concurrency, len(chunks))) as executor:
+            # Run each chunk in a copy of the caller's context so its timings reach the request
+            futures = [
+                executor.submit(contextvars.copy_context().run, self.generate_chunk_quiz_with_gpt, chunk)
+                for chunk in chunks
+            ]
+            for future in futures:
+                try:
+                    quizzes.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        
+        if not quizzes:
+            raise errors[0]
+        return self.complete_sections(text, merge_quizzes(quizzes))
+
+    async def agenerate_chunked_quiz_with_gpt(self, text: str) -> Dict[str, Any]:
+        """Async counterpart of ``generate_chunked_quiz_with_gpt``."""
+        chunks = self.select_chunks(text)
+        if len(chunks) <= 1:
+            return await self.agenerate_complete_quiz_with_gpt(text)
+        
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        
+        async def generate_chunk(chunk: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.agenerate_chunk_quiz_with_gpt(chunk)
+        
+        results = await asyncio.gather(*(generate_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        quizzes = [result for result in results if not isinstance(result, BaseException)]
+        if not quizzes:
+            raise results[0]
+        return await self.acomplete_sections(text, merge_quizzes(quizzes))
+
+    def _bank_key(self, text: str) -> str:
+        return self.question_bank.make_key(text, MODEL_NAME, PROMPT_VERSION)
+
+    def _draw_from_bank(self, text: str) -> Optional[Dict[str, Any]]:
+        if self.question_bank is None:
+            return None
+        with metrics.span('bank_draw'):
+            return self.question_bank.draw(self._bank_key(text))
+
+    def _add_to_bank(self, text: str, quiz_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Bank a generated quiz and return this session's draw from the pool."""
+        if self.question_bank is None:
+            return quiz_data
+        key = self._bank_key(text)
+        self.question_bank.add(key, quiz_data)
+        return self.question_bank.draw(key) or quiz_data
+
+    def draw_quiz(self, text: str) -> Dict[str, Any]:
+        """Return a quiz for a new session on ``text``.
+
+        With a question bank, repeat documents get a fresh draw from the
+        pool of questions generated so far; the model is only called when
+        nothing is banked for the text yet. Call ``arefill_question_bank``
+        afterwards to top up the pool in the background.
+        """
+        quiz_data = self._draw_from_bank(text)
+        if quiz_data is not None:
+            return quiz_data
+        return self._add_to_bank(text, self.generate_chunked_quiz_with_gpt(text))
+
+    async def adraw_quiz(self, text: str) -> Dict[str, Any]:
+        """Async counterpart of ``draw_quiz``."""
+        quiz_data = self._draw_from_bank(text)
+        if quiz_data is not None:
+            return quiz_data
+        return self._add_to_bank(text, await self.agenerate_chunked_quiz_with_gpt(text))
+
+    async def arefill_question_bank(self, text: str) -> int:
+        """Generate more questions for ``text`` if its pool is running low; returns how many were added.
+
+        Refills bypass the quiz cache and pick a random chunk, so each one can
+        contribute questions the pool has not seen yet.
+        """
+        if self.question_bank is None:
+            return 0
+        key = self._bank_key(text)
+        if not self.question_bank.begin_refill(key):
+            return 0
+        added = None
         try:
-            prompt = f"""
-            You are an expert educational assessment designer. Analyze the following text and create a comprehensive, high-quality quiz that tests deep understanding of the content.
-
-            TEXT TO ANALYZE:
-            {text[:4000]}
-
-            INSTRUCTIONS:
-            Create a quiz that demonstrates mastery of the material through varied question types and cognitive levels.
-
-            MULTIPLE CHOICE QUESTIONS (5-8 questions):
-            - Focus on key facts, concepts, relationships, and applications
-            - Create plausible distractors that test common misconceptions
-            - Use clear, unambiguous language
-            - Avoid "all of the above" or "none of the above" options
-            - Test different cognitive levels: recall, comprehension, application, analysis
-
-            TRUE/FALSE QUESTIONS (3-5 questions):
-            - Focus on specific factual claims from the text
-            - Avoid absolute terms unless they appear in the source
-            - Test important details and relationships
-            - Make false statements plausible but clearly incorrect
-
-            OPEN-ENDED QUESTIONS (2-3 questions):
-            - Require synthesis, analysis, or evaluation
-            - Ask for explanations, comparisons, or applications
-            - Encourage critical thinking about the content
-            - Should not have simple yes/no answers
-
-            DIFFICULTY LEVELS:
-            - Easy: Direct recall of explicitly stated information
-            - Medium: Understanding relationships and making connections
-            - Hard: Analysis, synthesis, or application of concepts
-
-            QUALITY STANDARDS:
-            - Questions must be answerable from the provided text
-            - Avoid trivial details unless they're central to understanding
-            - Ensure cultural neutrality and accessibility
-            - Use precise, professional language
-            - Test the most educationally significant content
-
-            Respond ONLY with valid JSON in this exact format:
-            {{
-                "mcq_questions": [
-                    {{
-                        "question": "Clear, specific question text?",
-                        "options": ["Option A", "Option B", "Option C", "Option D"],
-                        "correct_answer": "A) Option A",
-                        "difficulty": "Easy"
-                    }}
-                ],
-                "true_false_questions": [
-                    {{
-                        "statement": "Specific, testable statement",
-                        "correct_answer": true,
-                        "difficulty": "Medium"
-                    }}
-                ],
-                "open_ended_questions": [
-                    {{
-                        "question": "Thought-provoking analytical question?",
-                        "difficulty": "Hard"
-                    }}
-                ],
-                "key_concepts": ["concept1", "concept2", "concept3", "concept4", "concept5"]
-            }}
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert educational assessment designer with 20+ years of experience creating high-quality, pedagogically sound quizzes. You excel at identifying the most important learning objectives and creating questions that accurately assess student understanding at multiple cognitive levels."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=3000,
-                temperature=0.3
-            )
-            
-            # Parse the JSON response with error handling
-            response_content = response.choices[0].message.content.strip()
-            
-            # Clean up response if it contains markdown code blocks
-            if response_content.startswith('```json'):
-                response_content = response_content[7:]
-            if response_content.endswith('```'):
-                response_content = response_content[:-3]
+            quiz_data = await self._agenerate_quiz_with_gpt(random.choice(self.select_chunks(text)))
+            added = self.question_bank.add(key, quiz_data)
+        except Exception:
+            metrics.inc('question_bank_refill_failures_total', help_text='Question bank refills that failed.')
+            return 0
+        finally:
+            self.question_bank.end_refill(key, added)
+        metrics.inc('question_bank_questions_added_total', added, help_text='Questions added to the bank by refills.')
+        return added
+
+    def stream_quiz_with_gpt(self, text: str) -> Iterator[Tuple[str, Any]]:
+        """Generate a quiz from a streamed GPT response, yielding questions as they complete.
+
+        Yields ``(section, question)`` as soon as the model closes each
+        question object, then ``('done', quiz_data)`` with the whole quiz.
+        Like ``generate_complete_quiz_with_gpt``, a single request is made,
+        with the text's most informative sentences fitted into the prompt
+        token budget. Banked or cached quizzes, and the result
+        of an identical generation already in flight, are replayed without
+        calling it.
+        """
+        quiz_data = self._draw_from_bank(text)
+        cache_key = None
+        if quiz_data is None:
+            cache_key, cached = self._lookup_cache(text)
+            if cached is not None:
+                quiz_data = self._add_to_bank(text, cached)
+        
+        if quiz_data is None:
+            flight_key = self._flight_key(text)
+            future, leader = self.in_flight.join(flight_key)
+            while not leader:
+                # An identical generation is already running; replay its quiz instead of calling the model
+                try:
+                    quiz_data = self._draw_from_bank(text) or dict(future.result())
+                    break
+                except CancelledError:
+                    future, leader = self.in_flight.join(flight_key)
             
+            if leader:
+                try:
+                    quiz_data = yield from self._stream_quiz_from_model(text, cache_key)
+                except Exception as e:
+                    self.in_flight.fail(flight_key, future, e)
+                    raise
+                except BaseException:
+                    # The client went away; let a waiting request take over
+                    self.in_flight.cancel(flight_key, future)
+                    raise
+                self.in_flight.finish(flight_key, future, quiz_data)
+                yield 'done', quiz_data
+                return
+        
+        for section in QUESTION_BUILDERS:
+            for question in quiz_data[section]:
+                yield section, question
+        yield 'done', quiz_data
+
+    def _stream_quiz_from_model(self, text: str, cache_key: Optional[str]) -> Iterator[Tuple[str, Any]]:
+        """Stream a quiz from the model, yielding questions as they complete; returns the whole quiz."""
+        parser = IncrementalQuizParser()
+        duplicates = DuplicateIndex()
+        parts = []
+        streamed = {section: [] for section in QUESTION_BUILDERS}
+        started = time.perf_counter()
+        first_token = True
+        try:
+            stream = self._create_completion(self._build_messages(text), self._max_tokens(FULL_QUIZ_COUNTS), stream=True)
+            for chunk in stream:
+                try:
+                    remaining_time()
+                except DeadlineExceeded:
+                    # Stop reading a response that can no longer arrive in time
+                    stream.response.close()
+                    raise
+                if getattr(chunk, 'usage', None):
+                    self._record_usage(chunk)
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if not content:
+                    continue
+                if first_token:
+                    metrics.observe('openai_first_token', time.perf_counter() - started)
+                    first_token = False
+                parts.append(content)
+                for section, item in parser.feed(content):
+                    # Malformed questions and near duplicates are skipped, not sent
+                    for question in build_questions(section, [item]):
+                        if duplicates.add_all([question_text(question)])[0]:
+                            streamed[section].append(question)
+                            yield section, question
+        except (DeadlineExceeded, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"GPT quiz generation failed: {e}")
+        metrics.observe('openai_request', time.perf_counter() - started)
+        
+        # The questions are the ones already sent; the full response adds the key concepts
+        with metrics.span('response_parsing'):
+            key_concepts = self._parse_quiz_response("".join(parts))['key_concepts']
+        quiz_data = self.complete_sections(text, dict(streamed, key_concepts=key_concepts))
+        sent = {id(question) for questions in streamed.values() for question in questions}
+        for section in QUESTION_BUILDERS:
+            for question in quiz_data[section]:
+                if id(question) not in sent:
+                    yield section, question
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, quiz_to_dict(quiz_data))
+        if self.question_bank is not None:
+            # The questions have been sent already, so only bank them
+            self.question_bank.add(self._bank_key(text), quiz_data, served=True)
+        return quiz_data
+
+    def _fit_prompt(self, template: str, text: str, **fields: str) -> List[Dict[str, str]]:
+        """Fill a prompt template with as much of the most informative source text as the budget allows."""
+        prompt = compact_whitespace(template)
+        instructions = prompt.format(text='', **fields)
+        budget = self.prompt_token_budget - count_tokens(SYSTEM_PROMPT) - count_tokens(instructions)
+        source = fit_text(text, max(budget, 0))
+        content = prompt.format(text=source, **fields)
+        
+        if metrics.enabled or metrics.request_counts() is not None:
+            # Against the prompt this request would have sent unfitted: the template as written and all of the text
+            saved = count_tokens(template.format(text=text, **fields)) - count_tokens(content)
+            if saved > 0:
+                metrics.inc('quiz_prompt_saved_tokens_total', saved,
+                            'Prompt tokens saved by compaction and fitting the source text.', label=MODEL_NAME)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": content}
+        ]
+
+    def _build_messages(self, text: str) -> List[Dict[str, str]]:
+        """Build the chat messages asking GPT for a quiz on ``text``."""
+        return self._fit_prompt(QUIZ_PROMPT, text, example=QUIZ_EXAMPLE)
+
+    def _build_retry_messages(self, text: str, shortfall: Dict[str, int]) -> List[Dict[str, str]]:
+        """Build the chat messages asking GPT for more questions in only the ``shortfall`` sections."""
+        wanted = ", ".join(f"{count} {SECTION_NAMES[section]}" for section, count in shortfall.items())
+        example = json.dumps({section: [SECTION_EXAMPLES[section]] for section in shortfall})
+        return self._fit_prompt(RETRY_PROMPT, text, wanted=wanted, example=example)
+
+    def _max_tokens(self, counts: Dict[str, int]) -> int:
+        """Completion tokens to reserve for a response with ``counts`` questions per section."""
+        expected = COMPLETION_OVERHEAD_TOKENS + sum(
+            COMPLETION_TOKENS_PER_QUESTION[section] * count for section, count in counts.items()
+        )
+        return math.ceil(expected * COMPLETION_MARGIN)
+
+    def _parse_quiz_response(self, response_content: str) -> Dict[str, Any]:
+        """Parse GPT's JSON response into a quiz of dataclass questions.
+
+        Malformed questions are skipped. If the document itself is not valid
+        JSON (for example because the response was cut off), every complete
+        question object in it is still recovered.
+        """
+        response_content = response_content.strip()
+        
+        # Clean up response if it contains markdown code blocks
+        fenced = re.match(r'^```(?:json)?\s*(.*?)\s*(?:```)?$', response_content, re.DOTALL)
+        if fenced:
+            response_content = fenced.group(1)
+        
+        try:
             quiz_data = json.loads(response_content)
-            
-            # Convert to our dataclass format
-            mcq_questions = []
-            for mcq in quiz_data.get('mcq_questions', []):
-                difficulty = Difficulty(mcq.get('difficulty', 'Medium'))
-                mcq_questions.append(MCQQuestion(
-                    question=mcq['question'],
-                    options=mcq['options'],
-                    correct_answer=mcq['correct_answer'],
-                    difficulty=difficulty
-                ))
-            
-            tf_questions = []
-            for tf in quiz_data.get('true_false_questions', []):
-                difficulty = Difficulty(tf.get('difficulty', 'Medium'))
-                tf_questions.append(TrueFalseQuestion(
-                    statement=tf['statement'],
-                    correct_answer=tf['correct_answer'],
-                    difficulty=difficulty
-                ))
-            
-            open_questions = []
-            for oq in quiz_data.get('open_ended_questions', []):
-                difficulty = Difficulty(oq.get('difficulty', 'Hard'))
-                open_questions.append(OpenEndedQuestion(
-                    question=oq['question'],
-                    difficulty=difficulty
-                ))
-            
-            return {
-                'mcq_questions': mcq_questions,
-                'true_false_questions': tf_questions,
-                'open_ended_questions': open_questions,
-                'key_concepts': quiz_data.get('key_concepts', [])
-            }
-            
+            if not isinstance(quiz_data, dict):
+                raise ValueError("response is not a JSON object")
+        except ValueError:
+            metrics.inc('quiz_salvaged_responses_total', help_text='Responses that were not valid JSON and were salvaged.')
+            quiz_data = {section: [] for section in QUESTION_BUILDERS}
+            for section, item in IncrementalQuizParser().feed(response_content):
+                quiz_data[section].append(item)
+        
+        # Convert to our dataclass format, most relevant questions first and near duplicates dropped
+        return rank_quiz(quiz_from_dict(quiz_data), QUESTION_BUILDERS)
+
+    def _shortfall(self, quiz_data: Dict[str, Any]) -> Dict[str, int]:
+        """Number of questions each section is missing to reach its minimum."""
+        return {
+            section: minimum - len(quiz_data[section])
+            for section, (minimum, _) in QUESTION_TARGETS.items()
+            if len(quiz_data[section]) < minimum
+        }
+
+    def _fill_sections(self, quiz_data: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the questions of a retry response to the sections that came back short."""
+        filled = dict(quiz_data)
+        for section in self._shortfall(quiz_data):
+            # Questions already in the quiz come first so they survive deduplication
+            questions = quiz_data[section] + rank_quiz(extra, [section])[section]
+            accepted = DuplicateIndex().add_all([question_text(question) for question in questions])
+            unique = [question for question, keep in zip(questions, accepted) if keep]
+            filled[section] = unique[:QUESTION_TARGETS[section][1]]
+        return filled
+
+    def _check_quiz(self, quiz_data: Dict[str, Any]) -> Dict[str, Any]:
+        if not any(quiz_data[section] for section in QUESTION_BUILDERS):
+            raise Exception("GPT returned no valid questions")
+        return quiz_data
+
+    def _record_usage(self, response) -> None:
+        """Count the prompt and completion tokens reported by the API."""
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        if isinstance(usage, dict):
+            # Stream chunks of this client version keep usage as an untyped extra field
+            prompt_tokens, completion_tokens = usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+        else:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        metrics.inc('quiz_prompt_tokens_total', prompt_tokens,
+                    'Prompt tokens sent to the OpenAI API.', label=MODEL_NAME)
+        metrics.inc('quiz_completion_tokens_total', completion_tokens,
+                    'Completion tokens returned by the OpenAI API.', label=MODEL_NAME)
+
+    def _record_max_tokens_savings(self, max_tokens: int) -> None:
+        saved = UNFITTED_MAX_TOKENS - max_tokens
+        if saved > 0:
+            metrics.inc('quiz_max_tokens_saved_total', saved,
+                        'Completion tokens no longer reserved since max_tokens is sized to the questions asked for.',
+                        label=MODEL_NAME)
+
+    def _request_tokens(self, messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Tokens a request counts against the tokens-per-minute budget: its prompt plus ``max_tokens``."""
+        # A few tokens of chat formatting per message
+        return sum(count_tokens(message['content']) + 4 for message in messages) + max_tokens
+
+    def _create_completion(self, messages: List[Dict[str, str]], max_tokens: int, stream: bool = False):
+        """Send a chat completion request within the current request's deadline.
+
+        Requests wait for the scheduler to admit them if there is one, and
+        non-streamed requests are hedged as the current ``RequestPolicy`` says.
+        """
+        import openai
+        tokens = self._request_tokens(messages, max_tokens)
+        self._record_max_tokens_savings(max_tokens)
+        
+        def create(model: str):
+            timeout = remaining_time()
+            # The deadline bounds the whole call, so the client must not retry on its own
+            client = self.client if timeout is None else self.client.with_options(max_retries=0)
+            try:
+                # A stream's request time is measured by the caller as it is read
+                with nullcontext() if stream else metrics.span('openai_request'):
+                    return client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=TEMPERATURE,
+                        response_format=RESPONSE_FORMAT,
+                        stream=stream,
+                        # The last chunk of a stream then reports token usage
+                        extra_body={'stream_options': {'include_usage': True}} if stream else None,
+                        **({} if timeout is None else {'timeout': timeout})
+                    )
+            except openai.RateLimitError as e:
+                raise _rate_limited_error(e)
+        
+        def send(model: str):
+            if self.scheduler is None:
+                return create(model)
+            return self.scheduler.call(lambda: create(model), tokens)
+        
+        if stream:
+            return send(MODEL_NAME)
+        return hedged_call(send, MODEL_NAME, self.latency)
+
+    async def _acreate_completion(self, messages: List[Dict[str, str]], max_tokens: int):
+        """Async counterpart of ``_create_completion``."""
+        import openai
+        tokens = self._request_tokens(messages, max_tokens)
+        self._record_max_tokens_savings(max_tokens)
+        
+        async def create(model: str):
+            timeout = remaining_time()
+            client = self.async_client if timeout is None else self.async_client.with_options(max_retries=0)
+            try:
+                with metrics.span('openai_request'):
+                    return await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=TEMPERATURE,
+                        response_format=RESPONSE_FORMAT,
+                        **({} if timeout is None else {'timeout': timeout})
+                    )
+            except openai.RateLimitError as e:
+                raise _rate_limited_error(e)
+        
+        async def send(model: str):
+            if self.scheduler is None:
+                return await create(model)
+            return await self.scheduler.acall(lambda: create(model), tokens)
+        
+        return await ahedged_call(send, MODEL_NAME, self.latency)
+
+    def _request_quiz(self, messages: List[Dict[str, str]], max_tokens: int) -> Dict[str, Any]:
+        """Send one chat completion request and parse the response into a quiz."""
+        try:
+            response = self._create_completion(messages, max_tokens)
+            self._record_usage(response)
+            with metrics.span('response_parsing'):
+                return self._parse_quiz_response(response.choices[0].message.content)
+        except (DeadlineExceeded, RateLimitedError):
+            raise
+        except Exception as e:
+            raise Exception(f"GPT quiz generation failed: {e}")
+
+    async def _arequest_quiz(self, messages: List[Dict[str, str]], max_tokens: int) -> Dict[str, Any]:
+        """Async counterpart of ``_request_quiz``."""
+        try:
+            response = await self._acreate_completion(messages, max_tokens)
+            self._record_usage(response)
+            with metrics.span('response_parsing'):
+                return self._parse_quiz_response(response.choices[0].message.content)
+        except (DeadlineExceeded, RateLimitedError):
+            raise
         except Exception as e:
             raise Exception(f"GPT quiz generation failed: {e}")
 
+    def complete_sections(self, text: str, quiz_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-request only the sections that came back short; a failed retry keeps what we have."""
+        for _ in range(MAX_SECTION_RETRIES):
+            shortfall = self._shortfall(quiz_data)
+            if not shortfall:
+                break
+            metrics.inc('quiz_section_retries_total', help_text='Follow-up requests for short or invalid quiz sections.')
+            try:
+                extra = self._request_quiz(self._build_retry_messages(text, shortfall), self._max_tokens(shortfall))
+            except Exception:
+                break
+            quiz_data = self._fill_sections(quiz_data, extra)
+        return self._check_quiz(quiz_data)
+
+    async def acomplete_sections(self, text: str, quiz_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Async counterpart of ``complete_sections``."""
+        for _ in range(MAX_SECTION_RETRIES):
+            shortfall = self._shortfall(quiz_data)
+            if not shortfall:
+                break
+            metrics.inc('quiz_section_retries_total', help_text='Follow-up requests for short or invalid quiz sections.')
+            try:
+                extra = await self._arequest_quiz(self._build_retry_messages(text, shortfall), self._max_tokens(shortfall))
+            except Exception:
+                break
+            quiz_data = self._fill_sections(quiz_data, extra)
+        return self._check_quiz(quiz_data)
+
+    def _generate_quiz_with_gpt(self, text: str, complete: bool = True) -> Dict[str, Any]:
+        """Call GPT and parse its response into a quiz, re-requesting sections that came back short if ``complete``."""
+        quiz_data = self._request_quiz(self._build_messages(text), self._max_tokens(FULL_QUIZ_COUNTS))
+        return self.complete_sections(text, quiz_data) if complete else self._check_quiz(quiz_data)
+
+    async def _agenerate_quiz_with_gpt(self, text: str, complete: bool = True) -> Dict[str, Any]:
+        """Call GPT asynchronously and parse its response into a quiz."""
+        quiz_data = await self._arequest_quiz(self._build_messages(text), self._max_tokens(FULL_QUIZ_COUNTS))
+        return await self.acomplete_sections(text, quiz_data) if complete else self._check_quiz(quiz_data)
+
     def format_quiz_output(self, quiz_data: Dict) -> str:
-        """Format the quiz in a readable format."""
-        output = []
-        output.append("=" * 60)
-        output.append("AI-GENERATED QUIZ")
-        output.append("=" * 60)
-        output.append(f"\nKey Concepts: {', '.join(quiz_data['key_concepts'][:5])}")
-        
-        # MCQ Questions
-        output.append("\n" + "=" * 40)
-        output.append("MULTIPLE CHOICE QUESTIONS")
-        output.append("=" * 40)
-        
-        for i, mcq in enumerate(quiz_data['mcq_questions'], 1):
-            output.append(f"\n{i}. {mcq.question} ({mcq.difficulty.value})")
-            for j, option in enumerate(mcq.options):
-                output.append(f"   {chr(65 + j)}) {option}")
-            output.append(f"   Correct Answer: {mcq.correct_answer}")
-        
-        # True/False Questions
-        output.append("\n\n" + "=" * 40)
-        output.append("TRUE/FALSE QUESTIONS")
-        output.append("=" * 40)
-        
-        for i, tf in enumerate(quiz_data['true_false_questions'], 1):
-            output.append(f"\n{i}. {tf.statement} ({tf.difficulty.value})")
-            output.append(f"   Correct Answer: {tf.correct_answer}")
-        
-        # Open-ended Questions
-        output.append("\n\n" + "=" * 40)
-        output.append("OPEN-ENDED QUESTIONS")
-        output.append("=" * 40)
-        
-        for i, open_q in enumerate(quiz_data['open_ended_questions'], 1):
-            output.append(f"\n{i}. {open_q.question} ({open_q.difficulty.value})")
-        
-        return "\n".join(output)
-
-# Module loaded successfully
+        """Format the quiz in a readable format (see ``quiz_export`` for other formats)."""
+        return "".join(iter_text(quiz_data))
+
 if __name__ == "__main__":
-    print("GPT-only QuizGenerator module loaded successfully.")
-    print("Requires OpenAI API key to function.")
+    # python -m quiz_generator <directory>: batch-generate quizzes for a folder
+    from batch import main
+    main()
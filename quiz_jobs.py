@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+import uuid
+from typing import Any, Coroutine, Dict, Optional
+
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class JobManager:
+    """Runs quiz generation coroutines on a background event loop.
+
+    Each submitted coroutine gets a job id whose status and result can be
+    polled while the web worker thread that submitted it moves on. Finished
+    jobs are forgotten after ``ttl_seconds``.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # Started on first use, so importing the app (e.g. in a worker process) starts no threads
+        self._loop = None
+        self._thread = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The background event loop, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='quiz-jobs', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro: Coroutine) -> str:
+        """Schedule ``coro`` on the background loop and return its job id."""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._expire_finished()
+            self._jobs[job_id] = {
+                'status': PENDING,
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'finished_at': None
+            }
+        asyncio.run_coroutine_threadsafe(self._run(job_id, coro), self.loop)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of the job's status, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] in (PENDING, RUNNING))
+
+    async def _run(self, job_id: str, coro: Coroutine) -> None:
+        self._update(job_id, status=RUNNING)
+        try:
+            result = await coro
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        else:
+            self._update(job_id, status=COMPLETED, result=result, finished_at=time.time())
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _expire_finished(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['finished_at'] is not None and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,83 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Top-level arrays whose elements are emitted one by one as they complete
+QUESTION_SECTIONS = ('mcq_questions', 'true_false_questions', 'open_ended_questions')
+
+
+class IncrementalQuizParser:
+    """Incremental parser for the quiz JSON returned by the model.
+
+    Feed it text as it streams in; every question object inside one of the
+    ``QUESTION_SECTIONS`` arrays is returned as soon as its closing brace
+    arrives, without waiting for the rest of the document. Text outside the
+    root object (such as Markdown code fences) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_key = None
+        self._section = None
+        self._item_start = None
+
+    def feed(self, text: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Consume more model output and return the ``(section, question)`` pairs it completed."""
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # A string directly inside the root object; remember it as a possible key
+                        self._last_key = buffer[self._string_start + 1:pos]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2 and char == '[':
+                    self._section = self._last_key if self._last_key in QUESTION_SECTIONS else None
+                elif self._depth == 3 and char == '{' and self._section:
+                    self._item_start = pos
+            elif char in '}]':
+                if self._depth == 3 and char == '}' and self._item_start is not None:
+                    item = self._decode(buffer[self._item_start:pos + 1])
+                    if item is not None:
+                        completed.append((self._section, item))
+                    self._item_start = None
+                self._depth = max(0, self._depth - 1)
+                if self._depth < 2:
+                    self._section = None
+            pos += 1
+
+        # Drop text that can no longer be part of an unfinished question
+        keep_from = self._item_start if self._item_start is not None else (
+            self._string_start if self._in_string else pos)
+        self._buffer = buffer[keep_from:]
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        if self._in_string:
+            self._string_start -= keep_from
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(fragment)
+        except ValueError:
+            return None
+        return item if isinstance(item, dict) else None
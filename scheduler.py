@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from hedging import deadline_error, remaining_time
+from metrics import metrics
+
+# Tenant whose queue an OpenAI request joins; set per web request (see app.py)
+current_tenant: contextvars.ContextVar = contextvars.ContextVar('quiz_tenant', default='default')
+
+
+class RateLimitedError(Exception):
+    """Raised when the OpenAI API rejects a request because of rate limits."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class _Waiter:
+    tokens: int
+    tenant: str
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class RequestScheduler:
+    """Admits OpenAI requests within requests-per-minute and tokens-per-minute budgets.
+
+    Both budgets are token buckets refilled continuously; a request costs one
+    request and its estimated prompt plus completion tokens. Waiting requests
+    are queued per tenant and admitted round-robin across tenants, so one busy
+    tenant cannot starve the others. Rate-limited calls are retried with
+    jittered exponential backoff. A request that is still queued when the
+    calling context's deadline passes (see ``hedging.py``) leaves the queue
+    without using any budget and raises ``DeadlineExceeded``.
+    """
+
+    def __init__(self, requests_per_minute: float = 3500, tokens_per_minute: float = 90000,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.admitted = 0
+        self.retries = 0
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._queues: Dict[str, Deque[_Waiter]] = OrderedDict()
+        self._depth = 0
+        self._cond = threading.Condition()
+        # The dispatcher is started by the first request, so an unused scheduler runs no thread
+        self._thread = None
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return self._depth
+
+    def _enqueue(self, tokens: int) -> _Waiter:
+        waiter = _Waiter(tokens=tokens, tenant=current_tenant.get())
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='openai-scheduler', daemon=True)
+                self._thread.start()
+            self._queues.setdefault(waiter.tenant, deque()).append(waiter)
+            self._depth += 1
+            self._cond.notify()
+        return waiter
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Take a waiter out of its queue; False if it has been admitted already."""
+        with self._cond:
+            if not waiter.future.cancel():
+                return False
+            queue = self._queues.get(waiter.tenant)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                self._depth -= 1
+                if not queue:
+                    del self._queues[waiter.tenant]
+            # The dispatcher may have been waiting for budget for this waiter
+            self._cond.notify()
+            return True
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _dispatch(self) -> None:
+        with self._cond:
+            while True:
+                if not self._queues:
+                    self._cond.wait()
+                    continue
+                tenant, queue = next(iter(self._queues.items()))
+                waiter = queue[0]
+                if waiter.future.cancelled():
+                    self._pop(tenant, queue, rotate=False)
+                    continue
+
+                self._refill()
+                # A request larger than the whole budget is admitted once the bucket is full
+                cost = min(waiter.tokens, self.tokens_per_minute)
+                if self._requests >= 1 and self._tokens >= cost:
+                    self._requests -= 1
+                    self._tokens -= cost
+                    self.admitted += 1
+                    self._pop(tenant, queue, rotate=True)
+                    waiter.future.set_result(time.monotonic() - waiter.enqueued_at)
+                    continue
+
+                delay = max(
+                    (1 - self._requests) * 60 / self.requests_per_minute,
+                    (cost - self._tokens) * 60 / self.tokens_per_minute
+                )
+                self._cond.wait(delay)
+
+    def _pop(self, tenant: str, queue: Deque[_Waiter], rotate: bool) -> None:
+        queue.popleft()
+        self._depth -= 1
+        if not queue:
+            del self._queues[tenant]
+        elif rotate:
+            # Round-robin: the tenant that was just served goes to the back
+            self._queues.move_to_end(tenant)
+
+    def acquire(self, tokens: int) -> float:
+        """Block until a request costing ``tokens`` may be sent; returns the seconds waited.
+
+        Raises ``DeadlineExceeded`` if the current deadline passes first.
+        """
+        timeout = remaining_time()
+        waiter = self._enqueue(tokens)
+        done, _ = wait([waiter.future], timeout=timeout)
+        if not done and self._withdraw(waiter):
+            raise deadline_error()
+        waited = waiter.future.result()
+        metrics.observe('scheduler_wait', waited)
+        return waited
+
+    async def aacquire(self, tokens: int) -> float:
+        """Async counterpart of ``acquire``."""
+        timeout = remaining_time()
+        waiter = self._enqueue(tokens)
+        admitted = asyncio.wrap_future(waiter.future)
+        try:
+            done, _ = await asyncio.wait({admitted}, timeout=timeout)
+        except asyncio.CancelledError:
+            # E.g. the losing attempt of a hedged call
+            self._withdraw(waiter)
+            raise
+        if not done and self._withdraw(waiter):
+            raise deadline_error()
+        waited = await admitted
+        metrics.observe('scheduler_wait', waited)
+        return waited
+
+    def _backoff(self, attempt: int, error: RateLimitedError) -> float:
+        delay = error.retry_after or min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay *= random.uniform(1.0, 1.5)
+        remaining = remaining_time()
+        if remaining is not None and delay >= remaining:
+            # The retry could not be sent before the deadline
+            raise deadline_error()
+        self.retries += 1
+        metrics.inc('openai_rate_limit_retries_total', help_text='OpenAI requests retried after a rate limit error.')
+        return delay
+
+    def call(self, make_call: Callable[[], Any], tokens: int) -> Any:
+        """Run ``make_call()`` once admitted, retrying with backoff while it raises RateLimitedError."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens)
+            try:
+                return make_call()
+            except RateLimitedError as e:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt, e))
+
+    async def acall(self, make_call: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Async counterpart of ``call``; ``make_call`` returns the awaitable to run."""
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(tokens)
+            try:
+                return await make_call()
+            except RateLimitedError as e:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'queue_depth': self._depth,
+                'tenants_waiting': len(self._queues),
+                'admitted': self.admitted,
+                'retries': self.retries,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute
+            }
@@ -0,0 +1,239 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+def _encode(data: Dict[str, Any]) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+
+class SessionStore(ABC):
+    """Interface for quiz session storage.
+
+    Sessions are plain JSON-serializable dicts. ``get`` returns a copy, so
+    callers must ``save`` a session again after changing it, or change it
+    through ``update`` when other requests may change it at the same time.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def update(self, session_id: str, change: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Apply ``change`` to the stored session and save it, atomically; return what ``change`` returns.
+
+        Raises KeyError if the session does not exist. If ``change`` raises,
+        the session is left as it was.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionStore(SessionStore):
+    """In-process session store with LRU, TTL and memory-size eviction.
+
+    Sessions are kept as compact JSON strings so their size can be accounted
+    for against ``max_bytes``. Like the SQLite store, reading a session
+    renews its TTL, so sessions are ordered by last use and both kinds of
+    eviction only look at the front of the queue.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 24 * 3600,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            payload, used_at = entry
+            now = time.time()
+            if self.ttl_seconds and now - used_at > self.ttl_seconds:
+                self._remove(session_id)
+                return None
+            self._sessions[session_id] = (payload, now)
+            self._sessions.move_to_end(session_id)
+        return json.loads(payload)
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        payload = _encode(data)
+        with self._lock:
+            self._store(session_id, payload)
+
+    def update(self, session_id: str, change: Callable[[Dict[str, Any]], Any]) -> Any:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds):
+                raise KeyError(session_id)
+            data = json.loads(entry[0])
+            result = change(data)
+            self._store(session_id, _encode(data))
+        return result
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _remove(self, session_id: str) -> None:
+        payload, _ = self._sessions.pop(session_id)
+        self._bytes -= len(payload)
+
+    def _store(self, session_id: str, payload: str) -> None:
+        if session_id in self._sessions:
+            self._remove(session_id)
+        self._sessions[session_id] = (payload, time.time())
+        self._bytes += len(payload)
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.ttl_seconds:
+            # Sessions are in order of last use, so the expired ones are all at the front
+            cutoff = time.time() - self.ttl_seconds
+            while self._sessions:
+                session_id, (_, used_at) = next(iter(self._sessions.items()))
+                if used_at >= cutoff:
+                    break
+                self._remove(session_id)
+        # Least recently used sessions are at the front; always keep the newest one
+        while len(self._sessions) > 1 and (
+                len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._sessions)))
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path: str, max_sessions: int = 100000, ttl_seconds: float = 24 * 3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared with forked worker processes
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS quiz_sessions ('
+                    'session_id TEXT PRIMARY KEY, '
+                    'payload TEXT NOT NULL, '
+                    'accessed_at REAL NOT NULL)'
+                )
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS quiz_sessions_accessed_at ON quiz_sessions (accessed_at)'
+                )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            row = conn.execute(
+                'SELECT payload, accessed_at FROM quiz_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute('DELETE FROM quiz_sessions WHERE session_id = ?', (session_id,))
+                return None
+            conn.execute(
+                'UPDATE quiz_sessions SET accessed_at = ? WHERE session_id = ?', (now, session_id)
+            )
+        return json.loads(row[0])
+
+    def save(self, session_id: str, data: Dict[str, Any]) -> None:
+        now = time.time()
+        payload = _encode(data)
+        with self._lock, self._connection() as conn:
+            inserted = conn.execute(
+                'INSERT OR IGNORE INTO quiz_sessions (session_id, payload, accessed_at) VALUES (?, ?, ?)',
+                (session_id, payload, now)
+            ).rowcount
+            if not inserted:
+                conn.execute(
+                    'UPDATE quiz_sessions SET payload = ?, accessed_at = ? WHERE session_id = ?',
+                    (payload, now, session_id)
+                )
+                return
+            # Only new sessions can push the store over its limits
+            if self.ttl_seconds:
+                conn.execute('DELETE FROM quiz_sessions WHERE accessed_at < ?', (now - self.ttl_seconds,))
+            conn.execute(
+                'DELETE FROM quiz_sessions WHERE session_id IN ('
+                'SELECT session_id FROM quiz_sessions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_sessions,)
+            )
+
+    def update(self, session_id: str, change: Callable[[Dict[str, Any]], Any]) -> Any:
+        now = time.time()
+        with self._lock, self._connection() as conn:
+            # Take the write lock before reading so other processes can't interleave
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT payload, accessed_at FROM quiz_sessions WHERE session_id = ?', (session_id,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                raise KeyError(session_id)
+            data = json.loads(row[0])
+            result = change(data)
+            conn.execute(
+                'UPDATE quiz_sessions SET payload = ?, accessed_at = ? WHERE session_id = ?',
+                (_encode(data), now, session_id)
+            )
+        return result
+
+    def delete(self, session_id: str) -> None:
+        with self._lock, self._connection() as conn:
+            conn.execute('DELETE FROM quiz_sessions WHERE session_id = ?', (session_id,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute('SELECT COUNT(*) FROM quiz_sessions').fetchone()[0]
+
+
+def create_session_store(url: str, max_sessions: int, ttl_seconds: float, max_bytes: int) -> SessionStore:
+    """Build a session store from a URL: ``memory`` or ``sqlite:///path/to/file``."""
+    if url == 'memory':
+        return MemorySessionStore(max_sessions=max_sessions, ttl_seconds=ttl_seconds, max_bytes=max_bytes)
+    if url.startswith('sqlite:///'):
+        return SQLiteSessionStore(url[len('sqlite:///'):], max_sessions=max_sessions, ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unsupported session store: {url}")
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller for a key (the leader) runs the call; callers arriving
+    while it is in flight wait for and share its result, or its exception.
+    Sync and async callers share one table, so a request thread and the job
+    loop can coalesce with each other. If a leader gives up (``cancel``), a
+    waiting caller takes over and runs the call itself. The same happens
+    when the leader fails with one of ``unshared_errors``: errors such as a
+    passed deadline belong to the leader's request, so a waiter retries
+    under its own instead of inheriting them.
+    """
+
+    def __init__(self, unshared_errors: Tuple[Type[BaseException], ...] = ()):
+        self.unshared_errors = unshared_errors
+        self.coalesced = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-flight future for ``key`` and whether the caller is its leader."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def finish(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Publish the leader's result (or error) to every waiter."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def fail(self, key: str, future: Future, error: BaseException) -> None:
+        """Publish the leader's error to every waiter, or hand the call to a waiter if the error is unshared."""
+        if isinstance(error, self.unshared_errors):
+            self.cancel(key, future)
+        else:
+            self.finish(key, future, error=error)
+
+    def cancel(self, key: str, future: Future) -> None:
+        """Give up leadership without a result; a waiter will run the call instead."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        future.cancel()
+
+    def do(self, key: str, call: Callable[[], Any]) -> Any:
+        """Run ``call()`` unless an identical call is in flight, in which case wait for its result."""
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except CancelledError:
+                continue
+
+        try:
+            result = call()
+        except Exception as e:
+            self.fail(key, future, e)
+            raise
+        except BaseException:
+            # Cancelled or interrupted rather than failed; let a waiter retry
+            self.cancel(key, future)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Async counterpart of ``do``; ``call`` returns the awaitable to run."""
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                break
+            try:
+                # Shielded: cancelling this caller must not cancel the future every waiter shares
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # This caller was cancelled, not the leader
+                    raise
+
+        try:
+            result = await call()
+        except Exception as e:
+            self.fail(key, future, e)
+            raise
+        except BaseException:
+            # Cancelled or interrupted rather than failed; let a waiter retry
+            self.cancel(key, future)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
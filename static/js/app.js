@@ -33,6 +33,14 @@ let currentQuestionIndex = 0;
 let allQuestions = [];
 let selectedAnswer = null;
 
+// Whether all questions of the current quiz have arrived, and whether the
+// quiz is waiting on screen for the next streamed question
+let quizStreamComplete = true;
+let waitingForQuestion = false;
+
+// How often to poll for an upload job's result
+const JOB_POLL_INTERVAL_MS = 1000;
+
 
 // Event Listeners
 
@@ -103,34 +111,166 @@ async function handleFileUpload(file) {
     formData.append('file', file);
 
     try {
-        const response = await fetch('/upload_file', {
-            method: 'POST',
-            body: formData
-        });
+        if (window.ReadableStream && window.TextDecoder) {
+            await uploadWithStream(formData);
+        } else {
+            await uploadWithJob(formData);
+        }
+    } catch (err) {
+        quizStreamComplete = true;
+        showFileStatus('error', `Error: ${err.message}`);
+    }
+}
+
+// Stream questions from the server and start the quiz as soon as the first one arrives
+async function uploadWithStream(formData) {
+    const response = await fetch('/upload_file_stream', {
+        method: 'POST',
+        body: formData
+    });
 
+    if (!response.ok) {
         const data = await response.json();
+        throw new Error(data.error || 'Failed to process file');
+    }
 
-        if (!response.ok) {
-            throw new Error(data.error || 'Failed to process file');
+    let sessionInfo = null;
+    let started = false;
+    quizStreamComplete = false;
+
+    try {
+        await readServerSentEvents(response, (event, data) => {
+            if (event === 'session') {
+                sessionInfo = data;
+                if (data.warning) {
+                    setTimeout(() => {
+                        alert(data.warning);
+                    }, 1000);
+                }
+            } else if (event === 'question') {
+                if (!started) {
+                    started = true;
+                    showFileStatus('processing', `First question ready from ${sessionInfo.filename}, generating the rest...`);
+                    initializeQuiz({ session_id: sessionInfo.session_id, mcq_questions: [data], tf_questions: [] });
+                } else {
+                    addStreamedQuestion(data);
+                }
+            } else if (event === 'error') {
+                throw new Error(data.error);
+            }
+        });
+    } finally {
+        // Also when the stream fails part way, so the quiz isn't left waiting for questions that won't come
+        quizStreamComplete = true;
+        if (started) {
+            updateProgress();
+            if (waitingForQuestion) {
+                waitingForQuestion = false;
+                showCurrentQuestion();
+            }
         }
+    }
+
+    if (!started) {
+        throw new Error('No questions could be generated from this file');
+    }
+
+    showFileStatus('success', `✅ Quiz generated from ${sessionInfo.filename} using ${sessionInfo.analysis_method} analysis!`);
+}
 
-        // Success - quiz is already generated by the server
-        showFileStatus('success', `✅ Quiz generated from ${data.filename} using ${data.analysis_method} analysis!`);
-        
-        // Show warning if in demo mode
-        if (data.warning) {
-            setTimeout(() => {
-                alert(data.warning);
-            }, 1000);
+async function readServerSentEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
         }
-        
-        // Initialize and start quiz
+    }
+}
+
+function addStreamedQuestion(question) {
+    allQuestions.push(question);
+    if (waitingForQuestion) {
+        waitingForQuestion = false;
+        showCurrentQuestion();
+    } else {
+        updateProgress();
+    }
+}
+
+// Fallback for browsers without streaming fetch: start a job and poll for the finished quiz
+async function uploadWithJob(formData) {
+    const response = await fetch('/upload_file_async', {
+        method: 'POST',
+        body: formData
+    });
+
+    let data = await response.json();
+
+    if (!response.ok) {
+        throw new Error(data.error || 'Failed to process file');
+    }
+
+    // The server answers immediately with a job id; wait for the quiz
+    if (data.job_id) {
+        data = await waitForJob(data.status_url);
+    }
+
+    // Success - quiz is already generated by the server
+    showFileStatus('success', `✅ Quiz generated from ${data.filename} using ${data.analysis_method} analysis!`);
+    
+    // Show warning if in demo mode
+    if (data.warning) {
         setTimeout(() => {
-            initializeQuiz(data);
-        }, 1500);
+            alert(data.warning);
+        }, 1000);
+    }
+    
+    // Initialize and start quiz
+    setTimeout(() => {
+        initializeQuiz(data);
+    }, 1500);
+}
 
-    } catch (err) {
-        showFileStatus('error', `Error: ${err.message}`);
+async function waitForJob(statusUrl) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+
+        if (!response.ok) {
+            throw new Error(job.error || 'Failed to get quiz status');
+        }
+        if (job.status === 'completed') {
+            return job.result;
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Failed to process file');
+        }
     }
 }
 
@@ -165,6 +305,16 @@ function initializeQuiz(quizData) {
 
 function showCurrentQuestion() {
     if (currentQuestionIndex >= allQuestions.length) {
+        if (!quizStreamComplete) {
+            // The next question is still being generated; addStreamedQuestion will show it
+            waitingForQuestion = true;
+            currentQuestion.innerHTML = '<div class="question-text">⏳ Generating the next question...</div>';
+            answerFeedback.style.display = 'none';
+            submitAnswerBtn.style.display = 'none';
+            nextQuestionBtn.style.display = 'none';
+            finishQuizBtn.style.display = 'none';
+            return;
+        }
         showResults();
         return;
     }
@@ -172,10 +322,7 @@ function showCurrentQuestion() {
     const question = allQuestions[currentQuestionIndex];
     selectedAnswer = null;
 
-    // Update progress
-    questionCounter.textContent = `Question ${currentQuestionIndex + 1} of ${allQuestions.length}`;
-    const progress = ((currentQuestionIndex + 1) / allQuestions.length) * 100;
-    progressFill.style.width = `${progress}%`;
+    updateProgress();
 
     // Clear previous content
     currentQuestion.innerHTML = '';
@@ -192,6 +339,15 @@ function showCurrentQuestion() {
     }
 }
 
+function updateProgress() {
+    // A trailing "+" means more questions are still streaming in
+    const total = `${allQuestions.length}${quizStreamComplete ? '' : '+'}`;
+    const shown = Math.min(currentQuestionIndex + 1, allQuestions.length);
+    questionCounter.textContent = `Question ${shown} of ${total}`;
+    const progress = (shown / allQuestions.length) * 100;
+    progressFill.style.width = `${progress}%`;
+}
+
 function showMCQQuestion(question) {
     const html = `
         <div class="question-text">
@@ -326,7 +482,7 @@ function showAnswerFeedback(isCorrect, correctAnswer, question) {
 
     // Show next/finish button
     submitAnswerBtn.style.display = 'none';
-    if (currentQuestionIndex < allQuestions.length - 1) {
+    if (currentQuestionIndex < allQuestions.length - 1 || !quizStreamComplete) {
         nextQuestionBtn.style.display = 'inline-block';
     } else {
         finishQuizBtn.style.display = 'inline-block';
@@ -390,9 +546,19 @@ function displayResults(results) {
         </div>
         <h3>${scoreText}</h3>
         <p>You answered <strong>${results.correct_answers}</strong> out of <strong>${results.total_questions}</strong> questions correctly.</p>
+        ${renderDifficultyBreakdown(results.difficulty_breakdown || {})}
     `;
 }
 
+function renderDifficultyBreakdown(breakdown) {
+    return Object.entries(breakdown).map(([difficulty, stats]) => `
+        <p>
+            <span class="difficulty-badge difficulty-${difficulty.toLowerCase()}">${difficulty}</span>
+            ${stats.correct} / ${stats.total} correct (${stats.score_percentage}%)
+        </p>
+    `).join('');
+}
+
 function restartQuiz() {
     currentQuestionIndex = 0;
     selectedAnswer = null;
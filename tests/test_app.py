@@ -0,0 +1,130 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def quiz_app(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('app')
+    os.environ.update(
+        QUIZ_CACHE_PATH=str(directory / 'quiz_cache.sqlite3'),
+        QUIZ_TEXT_CACHE_DIR=str(directory / 'text'),
+        QUIZ_COMPRESS_MIN_BYTES='64'
+    )
+    import app
+    app.app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(quiz_app):
+    return quiz_app.app.test_client()
+
+
+@pytest.fixture
+def session_id(quiz_app):
+    session_data = quiz_app.new_session([
+        {'id': 'q1', 'question': 'Which one?', 'options': ['a', 'b'], 'correct_answer': 1,
+         'difficulty': 'Easy', 'type': 'mcq'},
+        {'id': 'q2', 'statement': 'Water is wet.', 'correct_answer': True, 'difficulty': 'Easy',
+         'type': 'true_false'},
+    ], [])
+    quiz_app.quiz_sessions.save('session', session_data)
+    yield 'session'
+    quiz_app.quiz_sessions.delete('session')
+
+
+def test_get_results_does_not_complete_the_quiz(quiz_app, client, session_id):
+    client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q1', 'answer': 1})
+
+    response = client.get(f'/get_results?session_id={session_id}')
+    assert response.status_code == 200
+    assert response.json['score_percentage'] == 50.0
+    assert response.json['completed'] is False
+    stored = quiz_app.quiz_sessions.get(session_id)
+    assert stored['completed'] is False
+    assert stored['score'] == 0
+
+
+def test_post_results_completes_the_quiz(quiz_app, client, session_id):
+    client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q2', 'answer': 'true'})
+
+    response = client.post('/get_results', json={'session_id': session_id})
+    assert response.json['completed'] is True
+    stored = quiz_app.quiz_sessions.get(session_id)
+    assert stored['completed'] is True
+    assert stored['score'] == 50.0
+
+
+def test_get_results_revalidates_with_an_etag(client, session_id):
+    first = client.get(f'/get_results?session_id={session_id}')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    unchanged = client.get(f'/get_results?session_id={session_id}', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+
+    client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q1', 'answer': 0})
+    changed = client.get(f'/get_results?session_id={session_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+
+
+def test_get_results_of_an_unknown_session(client):
+    assert client.get('/get_results?session_id=missing').status_code == 400
+    assert client.post('/get_results', json={'session_id': 'missing'}).status_code == 400
+
+
+def test_answers_update_the_running_counters(quiz_app, client, session_id):
+    wrong = client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q1', 'answer': 0})
+    assert wrong.json == {'is_correct': False, 'correct_answer': 1}
+    client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q2', 'answer': 'TRUE'})
+
+    results = client.get(f'/get_results?session_id={session_id}').json
+    assert (results['answered_questions'], results['correct_answers']) == (2, 1)
+    assert results['difficulty_breakdown']['Easy'] == {
+        'total': 2, 'answered': 2, 'correct': 1, 'score_percentage': 50.0
+    }
+
+
+def test_resubmitting_an_answer_replaces_the_previous_one(quiz_app, client, session_id):
+    for answer in (1, 0, 1, 1):
+        client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q1', 'answer': answer})
+
+    stored = quiz_app.quiz_sessions.get(session_id)
+    assert (stored['answered_count'], stored['correct_count']) == (1, 1)
+    assert stored['difficulty_stats']['Easy'] == {'total': 2, 'answered': 1, 'correct': 1}
+    assert stored['user_answers']['q1'] == {'answer': 1, 'is_correct': True}
+
+
+def test_unknown_questions_are_rejected(quiz_app, client, session_id):
+    response = client.post('/submit_answer', json={'session_id': session_id, 'question_id': 'q9', 'answer': 0})
+    assert response.status_code == 400
+    assert quiz_app.quiz_sessions.get(session_id)['answered_count'] == 0
+    missing = client.post('/submit_answer', json={'session_id': 'missing', 'question_id': 'q1', 'answer': 0})
+    assert missing.status_code == 400
+
+
+def test_exports_are_downloaded_and_revalidated(client, session_id):
+    response = client.get(f'/export_quiz/{session_id}?format=csv')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=quiz.csv'
+    assert 'Which one?' in response.get_data(as_text=True)
+
+    unchanged = client.get(f'/export_quiz/{session_id}?format=csv', headers={'If-None-Match': response.headers['ETag']})
+    assert unchanged.status_code == 304
+    assert client.get(f'/export_quiz/{session_id}?format=pdf').status_code == 400
+
+
+def test_importing_the_app_starts_nothing(tmp_path):
+    # PDF worker processes import the script that started the server, so its import must stay cheap
+    script = (
+        'import threading, app\n'
+        'print(threading.active_count(), app.quiz_sessions._conn is None, app.quiz_cache._conn is None)'
+    )
+    env = dict(os.environ, QUIZ_SESSION_STORE=f'sqlite:///{tmp_path}/sessions.sqlite3',
+               QUIZ_CACHE_PATH=str(tmp_path / 'quiz_cache.sqlite3'), QUIZ_TEXT_CACHE_DIR=str(tmp_path / 'text'))
+    output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True).stdout
+    assert output.split() == ['1', 'True', 'True']
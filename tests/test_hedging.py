@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from hedging import (DeadlineExceeded, LatencyTracker, RequestPolicy, ahedged_call, apply_policy, hedged_call,
+                     remaining_time)
+
+
+def with_policy(policy, function, *args):
+    def run():
+        apply_policy(policy)
+        return function(*args)
+    return contextvars.Context().run(run)
+
+
+def test_without_a_deadline_there_is_no_remaining_time():
+    assert with_policy(RequestPolicy(), remaining_time) is None
+
+
+def test_slow_attempt_is_hedged():
+    calls = []
+    lock = threading.Lock()
+
+    def make_call(model):
+        with lock:
+            calls.append(model)
+            first = len(calls) == 1
+        time.sleep(2 if first else 0.01)
+        return model
+
+    policy = RequestPolicy(deadline=5, hedge=True, hedge_model='backup', hedge_delay=0.05)
+    started = time.monotonic()
+    assert with_policy(policy, hedged_call, make_call, 'primary', LatencyTracker()) == 'backup'
+    assert time.monotonic() - started < 1
+    assert calls == ['primary', 'backup']
+
+
+def test_fast_attempt_is_not_hedged():
+    calls = []
+
+    def make_call(model):
+        calls.append(model)
+        return model
+
+    policy = RequestPolicy(hedge=True, hedge_delay=1)
+    assert with_policy(policy, hedged_call, make_call, 'primary', LatencyTracker()) == 'primary'
+    assert calls == ['primary']
+
+
+def test_hedge_delay_follows_recent_latencies():
+    tracker = LatencyTracker()
+    assert tracker.hedge_delay(5.0) == 5.0
+    for i in range(100):
+        tracker.record(i / 100)
+    assert tracker.hedge_delay(5.0) == pytest.approx(0.95)
+
+
+def test_async_call_is_abandoned_at_the_deadline():
+    async def make_call(model):
+        await asyncio.sleep(5)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        with_policy(RequestPolicy(deadline=0.1), asyncio.run, ahedged_call(make_call, 'primary', LatencyTracker()))
+    assert time.monotonic() - started < 1
+
+
+def test_async_hedge_cancels_the_loser():
+    cancelled = []
+
+    async def make_call(model):
+        try:
+            await asyncio.sleep(2 if model == 'primary' else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return model
+
+    async def run():
+        result = await ahedged_call(make_call, 'primary', LatencyTracker())
+        await asyncio.sleep(0)
+        return result
+
+    policy = RequestPolicy(deadline=5, hedge=True, hedge_model='backup', hedge_delay=0.05)
+    assert with_policy(policy, asyncio.run, run()) == 'backup'
+    assert cancelled == ['primary']
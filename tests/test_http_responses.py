@@ -0,0 +1,112 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from http_responses import FastJSONProvider, ResponseCompressor, StaticFingerprints, add_conditional_etag
+
+BODY = {'questions': [f'Question number {index}?' for index in range(100)]}
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / 'app.js').write_text('console.log("quiz");\n' * 200)
+    app = Flask(__name__, static_folder=str(tmp_path), static_url_path='/static')
+    app.json = FastJSONProvider(app)
+    compressor = ResponseCompressor(min_bytes=256)
+    fingerprints = StaticFingerprints(app.static_folder)
+
+    @app.route('/quiz', methods=['GET', 'POST'])
+    def quiz():
+        return jsonify(BODY)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/events')
+    def events():
+        return Response((f'data: {index}\n\n' * 50 for index in range(3)), mimetype='text/plain')
+
+    @app.route('/missing')
+    def missing():
+        return jsonify(BODY), 404
+
+    @app.after_request
+    def cache_headers(response):
+        if request.endpoint == 'static':
+            response = fingerprints.cache_control(request, response)
+        else:
+            response = add_conditional_etag(request, response)
+        return compressor(request, response)
+
+    app.fingerprints = fingerprints
+    return app.test_client()
+
+
+def test_json_is_compressed_when_accepted(client):
+    response = client.get('/quiz', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == client.get('/quiz').data
+    # The compressed body carries the weak form of the tag
+    assert response.headers['ETag'].startswith('W/')
+
+
+@pytest.mark.parametrize('path, headers', [
+    ('/quiz', {}),
+    ('/small', {'Accept-Encoding': 'gzip'}),
+    ('/events', {'Accept-Encoding': 'gzip'}),
+    ('/missing', {'Accept-Encoding': 'gzip'}),
+])
+def test_responses_left_uncompressed(client, path, headers):
+    assert 'Content-Encoding' not in client.get(path, headers=headers).headers
+
+
+def test_unchanged_json_is_revalidated(client):
+    etag = client.get('/quiz', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    response = client.get('/quiz', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_post_responses_get_no_etag(client):
+    response = client.post('/quiz')
+    assert 'ETag' not in response.headers
+    assert response.status_code == 200
+
+
+def test_static_files_are_compressed_once(client):
+    first = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/static/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Ranges' not in first.headers
+    assert gzip.decompress(second.data) == ('console.log("quiz");\n' * 200).encode()
+    assert second.data == first.data
+
+
+def test_fingerprinted_static_urls_are_immutable(client):
+    fingerprint = client.application.fingerprints.get('app.js')
+    assert len(fingerprint) == 12
+
+    current = client.get(f'/static/app.js?v={fingerprint}')
+    assert 'immutable' in current.headers['Cache-Control']
+    stale = client.get('/static/app.js?v=000000000000')
+    assert 'immutable' not in stale.headers.get('Cache-Control', '')
+
+
+def test_fingerprint_changes_with_the_file(client, tmp_path):
+    fingerprints = client.application.fingerprints
+    before = fingerprints.get('app.js')
+    (tmp_path / 'app.js').write_text('console.log("changed");\n')
+    os.utime(tmp_path / 'app.js', (0, 1))
+    assert fingerprints.get('app.js') != before
+    assert fingerprints.get('missing.js') is None
+
+
+def test_fast_json_matches_the_default_provider(client):
+    provider = client.application.json
+    data = {'b': [1, 2.5, None, True], 'a': 'é', 3: 'non-string key'}
+    assert provider.loads(provider.dumps(data)) == {'a': 'é', 'b': [1, 2.5, None, True], '3': 'non-string key'}
+    assert list(provider.loads(provider.dumps(data))) == ['3', 'a', 'b']
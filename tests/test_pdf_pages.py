@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+import pytest
+
+import quiz_generator
+from quiz_generator import QuizGenerator
+
+
+def make_pdf(page_count: int) -> bytes:
+    """A minimal PDF whose page ``i`` shows the text ``Page i``."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        ('<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            ' '.join(f'{4 + 2 * i} 0 R' for i in range(page_count)), page_count)).encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    for i in range(page_count):
+        content = f'BT /F1 12 Tf 72 720 Td (Page {i}) Tj ET'.encode()
+        objects.append(('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                        '/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (5 + 2 * i)).encode())
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content))
+
+    data = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(data)
+    data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    data += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    data += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return data
+
+
+@pytest.fixture(scope='module')
+def pdf_bytes():
+    return make_pdf(12)
+
+
+def temp_pdfs():
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.endswith('.pdf')}
+
+
+def test_parallel_extraction_matches_serial(pdf_bytes):
+    serial = QuizGenerator(api_key='test-key', pdf_workers=2, parallel_pdf_threshold=1000)
+    parallel = QuizGenerator(api_key='test-key', pdf_workers=2, parallel_pdf_threshold=4)
+    before = temp_pdfs()
+
+    expected = serial.read_pdf_file(pdf_bytes)
+    assert expected.splitlines()[:2] == ['Page 0', 'Page 1']
+    assert parallel.read_pdf_file(pdf_bytes) == expected
+    # In-memory uploads are spooled for the workers and removed afterwards
+    assert temp_pdfs() == before
+
+
+def test_character_budget_stops_parallel_extraction_early(pdf_bytes):
+    serial = QuizGenerator(api_key='test-key', pdf_workers=2, parallel_pdf_threshold=1000)
+    parallel = QuizGenerator(api_key='test-key', pdf_workers=2, parallel_pdf_threshold=4)
+    before = temp_pdfs()
+    assert parallel.read_pdf_file(pdf_bytes, max_chars=10) == serial.read_pdf_file(pdf_bytes, max_chars=10) == 'Page 0\nPag'
+    assert temp_pdfs() == before
+
+
+def test_workers_do_not_import_the_application(pdf_bytes):
+    QuizGenerator(api_key='test-key', pdf_workers=2, parallel_pdf_threshold=4).read_pdf_file(pdf_bytes)
+    pool = quiz_generator._get_pdf_pool(2)
+    # eval is a builtin, so the check can be sent to a worker without importing this test module there
+    loaded = pool.submit(eval, "[name for name in ('app', 'quiz_generator', 'openai') if name in __import__('sys').modules]")
+    assert loaded.result(timeout=60) == []
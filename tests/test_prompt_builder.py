@@ -0,0 +1,44 @@
+import hashlib
+
+from prompt_builder import compact_whitespace, count_tokens, fit_text
+
+
+def unique_word(*seed) -> str:
+    return ''.join(chr(ord('a') + byte % 26) for byte in hashlib.sha256(repr(seed).encode()).digest()[:8])
+
+
+def test_compaction_strips_indentation_and_blank_runs():
+    text = '''
+        First   line\t with  gaps
+            indented more
+
+
+        after two blank lines   
+    '''
+    assert compact_whitespace(text) == 'First line with gaps\nindented more\n\nafter two blank lines'
+
+
+def test_text_within_the_budget_is_kept_whole():
+    text = 'One sentence here. Another one there.'
+    assert fit_text(text, 100) == text
+
+
+def test_long_text_keeps_its_most_informative_sentences_in_order():
+    # Filler sentences share no words, so each scores low
+    filler = ' '.join(' '.join(unique_word(index, part) for part in range(3)) + '.' for index in range(60))
+    text = (f'Photosynthesis converts light into chemical energy. {filler} '
+            'Chlorophyll absorbs light for photosynthesis in chloroplasts. '
+            'Photosynthesis in chloroplasts releases oxygen from chlorophyll reactions.')
+    budget = 120
+    fitted = fit_text(text, budget)
+
+    assert count_tokens(fitted) <= budget
+    assert 'Chlorophyll absorbs light' in fitted
+    # Kept sentences stay in document order
+    assert fitted.index('Photosynthesis converts') < fitted.index('Chlorophyll absorbs') < fitted.index('releases oxygen')
+
+
+def test_text_without_sentences_that_fit_is_cut():
+    text = 'word ' * 1000
+    fitted = fit_text(text, 10)
+    assert 0 < count_tokens(fitted) <= 12
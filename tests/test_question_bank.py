@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+from question_bank import QuestionBank
+from quiz_generator import QUESTION_TARGETS, QuizGenerator, quiz_from_dict
+
+KEY = 'document'
+
+
+def unique_text(seed) -> str:
+    digest = hashlib.sha256(str(seed).encode()).hexdigest()
+    return ' '.join(digest[i:i + 8] for i in range(0, 40, 8)) + '?'
+
+
+def make_quiz(seed: int = 0, difficulty: str = 'Medium'):
+    """A full-size quiz whose questions share no wording with other seeds'."""
+    counts = {section: maximum for section, (_, maximum) in QUESTION_TARGETS.items()}
+    return quiz_from_dict({
+        'mcq_questions': [{'question': unique_text((seed, 'mcq', i)), 'options': ['a', 'b'], 'correct_answer': 0,
+                           'difficulty': difficulty} for i in range(counts['mcq_questions'])],
+        'true_false_questions': [{'statement': unique_text((seed, 'tf', i)), 'correct_answer': True,
+                                  'difficulty': difficulty} for i in range(counts['true_false_questions'])],
+        'open_ended_questions': [{'question': unique_text((seed, 'open', i)), 'difficulty': difficulty}
+                                 for i in range(counts['open_ended_questions'])],
+        'key_concepts': [f'concept {seed}'],
+    })
+
+
+def question_id(question) -> str:
+    return getattr(question, 'question', None) or question.statement
+
+
+def test_draws_stay_within_the_section_targets():
+    bank = QuestionBank(rng=random.Random(1))
+    bank.add(KEY, make_quiz(0))
+    bank.add(KEY, make_quiz(1, 'Hard'))
+
+    for _ in range(10):
+        quiz = bank.draw(KEY)
+        for section, (minimum, maximum) in QUESTION_TARGETS.items():
+            assert minimum <= len(quiz[section]) <= maximum
+            assert len({question_id(question) for question in quiz[section]}) == len(quiz[section])
+
+
+def test_least_served_questions_come_first():
+    bank = QuestionBank(rng=random.Random(2))
+    bank.add(KEY, make_quiz(0), served=True)
+    bank.add(KEY, make_quiz(1))
+
+    fresh = {question_id(question) for section in QUESTION_TARGETS for question in make_quiz(1)[section]}
+    quiz = bank.draw(KEY)
+    drawn = [question_id(question) for section in QUESTION_TARGETS for question in quiz[section]]
+    assert set(drawn) <= fresh
+
+
+def test_near_duplicates_are_not_banked_twice():
+    bank = QuestionBank()
+    first = bank.add(KEY, make_quiz(0))
+    assert first == sum(maximum for _, maximum in QUESTION_TARGETS.values())
+    assert bank.add(KEY, make_quiz(0)) == 0
+
+
+def test_no_refill_until_the_document_comes_back():
+    bank = QuestionBank()
+    bank.add(KEY, make_quiz(0), served=True)
+    assert not bank.begin_refill(KEY)
+
+    bank.draw(KEY)
+    assert bank.begin_refill(KEY)
+    # Only one refill runs at a time
+    assert not bank.begin_refill(KEY)
+
+
+def test_only_an_empty_refill_exhausts_the_pool():
+    bank = QuestionBank()
+    bank.add(KEY, make_quiz(0), served=True)
+    bank.draw(KEY)
+
+    # Re-adding the same quiz, as coalesced requests do, does not stop refills
+    assert bank.add(KEY, make_quiz(0)) == 0
+    assert bank.begin_refill(KEY)
+    bank.end_refill(KEY, None)
+    assert bank.begin_refill(KEY)
+    bank.end_refill(KEY, 0)
+    assert not bank.begin_refill(KEY)
+
+
+def test_least_recently_used_documents_are_dropped():
+    bank = QuestionBank(max_documents=2)
+    bank.add('a', make_quiz(0))
+    bank.add('b', make_quiz(1))
+    bank.draw('a')
+    bank.add('c', make_quiz(2))
+
+    assert bank.draw('b') is None
+    assert bank.draw('a') is not None
+    assert len(bank) == 2
+
+
+def test_coalesced_uploads_leave_the_pool_refillable():
+    bank = QuestionBank()
+    generator = QuizGenerator(api_key='test-key', question_bank=bank)
+    calls = []
+
+    def request_quiz(messages, max_tokens):
+        calls.append(max_tokens)
+        time.sleep(0.2)
+        return make_quiz(len(calls))
+
+    async def arequest_quiz(messages, max_tokens):
+        return request_quiz(messages, max_tokens)
+
+    generator._request_quiz = request_quiz
+    generator._arequest_quiz = arequest_quiz
+    text = 'A short document that five students upload at once.'
+    threads = [threading.Thread(target=generator.draw_quiz, args=(text,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+
+    # The classroom's next sessions get new questions instead of replays
+    assert asyncio.run(generator.arefill_question_bank(text)) > 0
+    assert len(calls) == 2
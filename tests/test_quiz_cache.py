@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import pytest
+
+from quiz_cache import QuizCache
+
+QUIZ = {'mcq_questions': [{'question': 'Which one?', 'options': ['a', 'b'], 'correct_answer': 1}]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QuizCache(str(tmp_path / 'cache' / 'quizzes.sqlite3'), max_entries=3)
+
+
+def test_keys_depend_on_text_and_settings():
+    key = QuizCache.make_key('text', 'model', '1', 0.3)
+    assert key == QuizCache.make_key('text', 'model', '1', 0.3)
+    assert key != QuizCache.make_key('text ', 'model', '1', 0.3)
+    assert key != QuizCache.make_key('text', 'model', '2', 0.3)
+    assert key != QuizCache.make_key('text', 'model', '1', 0.5)
+
+
+def test_hits_and_misses(cache):
+    assert cache.get('key') is None
+    cache.set('key', QUIZ)
+    assert cache.get('key') == QUIZ
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_entries_persist_across_instances(cache):
+    cache.set('key', QUIZ)
+    assert QuizCache(cache.path).get('key') == QUIZ
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = QuizCache(str(tmp_path / 'quizzes.sqlite3'), ttl_seconds=0.05)
+    cache.set('key', QUIZ)
+    time.sleep(0.1)
+    assert cache.get('key') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set(key, QUIZ)
+        time.sleep(0.01)
+    cache.get('a')
+    cache.set('d', QUIZ)
+
+    assert cache.get('b') is None
+    assert all(cache.get(key) == QUIZ for key in ('a', 'c', 'd'))
+
+
+def test_concurrent_threads_share_the_cache(cache):
+    errors = []
+
+    def worker(index):
+        try:
+            for round_ in range(20):
+                cache.set(f'{index}-{round_ % 2}', QUIZ)
+                cache.get(f'{index}-{round_ % 2}')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert errors == []
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_process_opens_its_own_connection(cache):
+    cache.set('key', QUIZ)
+    parent_connection = cache._connection()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Child: report whether it got a fresh, working connection
+        try:
+            ok = cache._connection() is not parent_connection and cache.get('key') == QUIZ
+        except Exception:
+            ok = False
+        os.write(write, b'1' if ok else b'0')
+        os._exit(0)
+    os.close(write)
+    result = os.read(read, 1)
+    os.waitpid(pid, 0)
+    os.close(read)
+
+    assert result == b'1'
+    # The parent's connection still works
+    assert cache._connection() is parent_connection
+    assert cache.get('key') == QUIZ
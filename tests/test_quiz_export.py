@@ -0,0 +1,95 @@
+import csv
+import io
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+from quiz_export import EXPORT_FORMATS, ExportCache, export_key, iter_export
+from quiz_generator import quiz_from_dict
+
+QUIZ = {
+    'mcq_questions': [
+        {'question': 'Which symbol {ends} a GIFT question?', 'options': ['=1+1', '}', 'A & B', '<tag>'],
+         'correct_answer': 1, 'difficulty': 'Easy'}
+    ],
+    'true_false_questions': [{'statement': 'Water boils at 100°C at sea level.', 'correct_answer': True,
+                              'difficulty': 'Medium'}],
+    'open_ended_questions': [{'question': 'Explain   osmosis.', 'difficulty': 'Hard'}],
+    'key_concepts': ['osmosis', 'boiling']
+}
+
+
+def render(export_format, quiz=QUIZ):
+    return ''.join(iter_export(quiz_from_dict(quiz), export_format))
+
+
+@pytest.mark.parametrize('export_format', list(EXPORT_FORMATS))
+def test_every_format_renders_every_question(export_format):
+    output = render(export_format)
+    assert 'boils at 100°C' in output
+    assert 'osmosis' in output
+
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        iter_export(quiz_from_dict(QUIZ), 'pdf')
+
+
+def test_csv_has_one_row_per_question_and_no_formulas():
+    rows = list(csv.reader(io.StringIO(render('csv'))))
+    assert rows[0] == ['type', 'difficulty', 'question', 'option_a', 'option_b', 'option_c', 'option_d', 'answer']
+    assert [row[0] for row in rows[1:]] == ['multiple_choice', 'true_false', 'open_ended']
+    assert rows[1][3] == "'=1+1"
+    assert rows[1][-1] == 'B'
+    assert rows[2][-1] == 'True'
+
+
+def test_gift_escapes_special_characters():
+    output = render('gift')
+    assert 'Which symbol \\{ends\\} a GIFT question? {' in output
+    assert '\t=\\}' in output and '\t~\\=1+1' in output
+    assert '{TRUE}' in output
+    assert 'Explain osmosis. {}' in output
+
+
+def test_qti_is_well_formed_xml():
+    namespace = '{http://www.imsglobal.org/xsd/ims_qtiasiv1p2}'
+    root = ElementTree.fromstring(render('qti').encode('utf-8'))
+    items = root.findall(f'.//{namespace}item')
+    assert [item.get('ident') for item in items] == ['mcq_1', 'tf_1', 'open_1']
+    texts = [element.text for element in root.iter(f'{namespace}mattext')]
+    assert 'A & B' in texts and '<tag>' in texts
+    assert root.find(f'.//{namespace}varequal').text == 'B'
+
+
+def test_export_keys_depend_on_quiz_and_format():
+    key = export_key(QUIZ, 'csv')
+    assert key == export_key(dict(QUIZ), 'csv')
+    assert key != export_key(QUIZ, 'gift')
+    assert key != export_key(dict(QUIZ, key_concepts=[]), 'csv')
+
+
+def test_streamed_exports_are_cached_once_complete():
+    cache = ExportCache()
+    stream = cache.stream('key', iter(['first ', 'second']))
+    assert next(stream) == b'first '
+    assert cache.get('key') is None
+    assert list(stream) == [b'second']
+    assert cache.get('key') == b'first second'
+
+
+def test_exports_over_the_limit_are_streamed_but_not_cached():
+    cache = ExportCache(max_bytes=10)
+    assert b''.join(cache.stream('key', iter(['0123456789', 'abc']))) == b'0123456789abc'
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_exports_are_evicted():
+    cache = ExportCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    cache.get('a')
+    cache.put('c', b'cccc')
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (b'aaaa', b'cccc')
+    assert cache.stats()['bytes'] == 8
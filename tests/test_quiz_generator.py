@@ -0,0 +1,202 @@
+import contextvars
+import hashlib
+import json
+
+import pytest
+
+from metrics import metrics
+from prompt_builder import count_tokens
+from quiz_generator import (FULL_QUIZ_COUNTS, UNFITTED_MAX_TOKENS, Difficulty, QuizGenerator, correct_option_index,
+                            mcq_from_dict, quiz_from_dict, true_false_from_dict)
+
+
+def make_generator(**kwargs) -> QuizGenerator:
+    return QuizGenerator(api_key='test-key', **kwargs)
+
+
+def mcq(options, answer, **fields):
+    return dict({'question': 'Which one?', 'options': options, 'correct_answer': answer}, **fields)
+
+
+@pytest.mark.parametrize('answer, expected', [
+    (2, 2), ('C', 2), ('c', 2), ('C)', 2), ('(c)', 2), ('C. ', 2), ('Rome', 2), ('rome', 2), ('C) Rome', 2),
+])
+def test_answer_forms_resolve_to_an_option(answer, expected):
+    assert correct_option_index(answer, ['Paris', 'Berlin', 'Rome', 'Madrid']) == expected
+
+
+@pytest.mark.parametrize('options, answer, expected', [
+    (['G. Washington', 'A. Lincoln', 'T. Jefferson', 'J. Adams'], 'A. Lincoln', 1),
+    (['E. coli', 'S. aureus', 'B. subtilis', 'C. difficile'], 'B. subtilis', 2),
+    (['E. coli', 'S. aureus', 'B. subtilis', 'C. difficile'], 'C. difficile', 3),
+])
+def test_answer_matching_an_option_is_not_read_as_a_letter(options, answer, expected):
+    assert correct_option_index(answer, options) == expected
+
+
+def test_labelled_answer_matches_unlabelled_option():
+    assert correct_option_index('B) Berlin', ['Paris', 'Berlin']) == 1
+    assert correct_option_index('Berlin', ['A) Paris', 'B) Berlin']) == 1
+
+
+@pytest.mark.parametrize('answer', [True, None, 4, -1, 'E', 'E) Lisbon', 'Lisbon', 1.0])
+def test_unresolvable_answers_are_rejected(answer):
+    with pytest.raises(ValueError):
+        correct_option_index(answer, ['Paris', 'Berlin', 'Rome', 'Madrid'])
+
+
+def test_sequential_labels_are_stripped():
+    question = mcq(['A) Paris', 'B) Berlin', 'C) Rome', 'D) Madrid'], 'C')
+    built = mcq_from_dict(question)
+    assert built.options == ['Paris', 'Berlin', 'Rome', 'Madrid']
+    assert built.correct_answer == 2
+
+
+def test_initials_are_not_stripped_as_labels():
+    options = ['A. Lincoln', 'B. Obama', 'G. Washington', 'T. Jefferson']
+    built = mcq_from_dict(mcq(options, 'G. Washington'))
+    assert built.options == options
+    assert built.correct_answer == 2
+
+
+def test_labels_out_of_order_are_kept():
+    options = ['E. coli', 'S. aureus', 'B. subtilis', 'C. difficile']
+    built = mcq_from_dict(mcq(options, 'B. subtilis'))
+    assert built.options == options
+    assert built.correct_answer == 2
+
+
+@pytest.mark.parametrize('question', [
+    mcq(['only one'], 0),
+    mcq(['Paris', ''], 0),
+    mcq(['Paris', 3], 0),
+    mcq('Paris, Berlin', 0),
+    {'question': ' ', 'options': ['Paris', 'Berlin'], 'correct_answer': 0},
+    {'options': ['Paris', 'Berlin'], 'correct_answer': 0},
+])
+def test_malformed_mcqs_are_rejected(question):
+    with pytest.raises((KeyError, TypeError, ValueError)):
+        mcq_from_dict(question)
+
+
+def test_difficulty_is_normalized_with_a_default():
+    assert mcq_from_dict(mcq(['a', 'b'], 0, difficulty='hard')).difficulty is Difficulty.HARD
+    assert mcq_from_dict(mcq(['a', 'b'], 0, difficulty='extreme')).difficulty is Difficulty.MEDIUM
+
+
+@pytest.mark.parametrize('answer, expected', [(True, True), ('false', False), (' True ', True)])
+def test_true_false_answers(answer, expected):
+    assert true_false_from_dict({'statement': 'Water is wet.', 'correct_answer': answer}).correct_answer is expected
+
+
+def test_malformed_questions_are_skipped():
+    quiz = quiz_from_dict({
+        'mcq_questions': [mcq(['a', 'b'], 1), mcq(['a', 'b'], 'z'), 'not an object'],
+        'true_false_questions': [{'statement': 'Yes?', 'correct_answer': 'maybe'}],
+        'open_ended_questions': {'question': 'not a list'},
+        'key_concepts': ['kept', 3],
+    })
+    assert len(quiz['mcq_questions']) == 1
+    assert quiz['true_false_questions'] == []
+    assert quiz['open_ended_questions'] == []
+    assert quiz['key_concepts'] == ['kept']
+
+
+def test_fenced_response_is_parsed():
+    response = '```json\n' + json.dumps({'mcq_questions': [mcq(['a', 'b'], 'b')]}) + '\n```'
+    quiz = make_generator()._parse_quiz_response(response)
+    assert [question.correct_answer for question in quiz['mcq_questions']] == [1]
+
+
+def test_truncated_response_is_salvaged():
+    response = json.dumps({
+        'mcq_questions': [mcq(['a', 'b'], 0, question='First?'), mcq(['c', 'd'], 1, question='Second?')],
+        'true_false_questions': [{'statement': 'Cut off here', 'correct_answer': True}],
+    })
+    quiz = make_generator()._parse_quiz_response(response[:response.index('Cut off') + 3])
+    assert [question.question for question in quiz['mcq_questions']] == ['First?', 'Second?']
+    assert quiz['true_false_questions'] == []
+
+
+class FakeModel:
+    """Stands in for ``_request_quiz``, answering each request with unique questions."""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.requests = []
+
+    def __call__(self, messages, max_tokens):
+        self.requests.append(max_tokens)
+        data = {
+            'mcq_questions': [mcq(['a', 'b'], 0, question=self.text()) for _ in range(self.counts[0])],
+            'true_false_questions': [{'statement': self.text(), 'correct_answer': True} for _ in range(self.counts[1])],
+            'open_ended_questions': [{'question': self.text()} for _ in range(self.counts[2])],
+        }
+        return quiz_from_dict(data)
+
+    def text(self):
+        self.counter = getattr(self, 'counter', 0) + 1
+        digest = hashlib.sha256(str(self.counter).encode()).hexdigest()
+        return ' '.join(digest[i:i + 8] for i in range(0, 32, 8)) + '?'
+
+
+def long_document(chunks):
+    sentences = [f'Sentence {index} is about subject {index * 7 % 101} in some detail.' for index in range(250 * chunks)]
+    return ' '.join(sentences)
+
+
+def test_chunked_generation_retries_short_sections_once_after_merging():
+    generator = make_generator(max_chunks=3)
+    model = FakeModel((1, 1, 1))
+    generator._request_quiz = model
+    text = long_document(3)
+    assert len(generator.select_chunks(text)) == 3
+
+    quiz = generator.generate_chunked_quiz_with_gpt(text)
+
+    # One request per chunk plus a single retry for the merged quiz's short sections
+    assert len(model.requests) == 4
+    assert len(quiz['mcq_questions']) == 4
+
+
+def test_single_text_quiz_still_retries_short_sections():
+    generator = make_generator()
+    model = FakeModel((1, 3, 2))
+    generator._request_quiz = model
+
+    quiz = generator.generate_complete_quiz_with_gpt('A short document about one subject.')
+
+    assert len(model.requests) == 2
+    assert len(quiz['mcq_questions']) == 2
+
+
+def test_prompts_fit_the_token_budget():
+    generator = make_generator(prompt_token_budget=1000)
+    messages = generator._build_messages(long_document(2))
+    assert sum(count_tokens(message['content']) for message in messages) <= 1000
+
+    short = generator._build_messages('A short document.')
+    assert 'A short document.' in short[1]['content']
+
+
+def test_max_tokens_is_sized_to_the_questions_asked_for():
+    generator = make_generator()
+    full = generator._max_tokens(FULL_QUIZ_COUNTS)
+    assert generator._max_tokens({'open_ended_questions': 1}) < full < UNFITTED_MAX_TOKENS
+
+
+def test_savings_are_measured_per_request():
+    generator = make_generator(prompt_token_budget=1000)
+
+    def saved(text):
+        def run():
+            metrics.start_request()
+            generator._build_messages(text)
+            generator._record_max_tokens_savings(generator._max_tokens(FULL_QUIZ_COUNTS))
+            return metrics.request_counts()
+        return contextvars.Context().run(run)
+
+    short, long = saved('A short document.'), saved(long_document(2))
+    # Fitting a long text saves far more than compacting the template around a short one
+    assert 0 < short['quiz_prompt_saved_tokens_total'] < long['quiz_prompt_saved_tokens_total']
+    assert short['quiz_max_tokens_saved_total'] == UNFITTED_MAX_TOKENS - generator._max_tokens(FULL_QUIZ_COUNTS)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from quiz_stream import IncrementalQuizParser
+
+QUIZ = {
+    'mcq_questions': [
+        {'question': 'Which {brace} or [bracket] is "quoted"?', 'options': ['a}', '[b', 'c\\"', 'd'],
+         'correct_answer': 0, 'difficulty': 'easy'},
+        {'question': 'Escaped backslash at the end\\', 'options': ['}]', '{"', '\\\\', 'd'],
+         'correct_answer': 3, 'difficulty': 'hard', 'nested': {'deeper': [1, {'x': '}'}]}},
+    ],
+    'true_false_questions': [
+        {'statement': 'Unicode é and \\u escapes — work', 'correct_answer': True, 'difficulty': 'medium'},
+    ],
+    'open_ended_questions': [],
+    'key_concepts': ['concept {one}', 'concept "two"'],
+}
+EXPECTED = [(section, item) for section in ('mcq_questions', 'true_false_questions', 'open_ended_questions')
+            for item in QUIZ[section]]
+
+
+def parse(chunks):
+    parser = IncrementalQuizParser()
+    completed = []
+    for chunk in chunks:
+        completed.extend(parser.feed(chunk))
+    return completed
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_whole_document(indent):
+    assert parse([json.dumps(QUIZ, indent=indent)]) == EXPECTED
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+def test_split_into_chunks(size):
+    text = json.dumps(QUIZ, indent=2)
+    assert parse([text[i:i + size] for i in range(0, len(text), size)]) == EXPECTED
+
+
+def test_every_split_point():
+    text = json.dumps(QUIZ)
+    for i in range(len(text)):
+        assert parse([text[:i], text[i:]]) == EXPECTED, f'split at {i}: {text[i - 10:i + 10]!r}'
+
+
+def test_questions_are_returned_as_soon_as_they_close():
+    text = json.dumps(QUIZ)
+    first = json.dumps(QUIZ['mcq_questions'][0])
+    end_of_first = text.index(first) + len(first)
+    parser = IncrementalQuizParser()
+    assert parser.feed(text[:end_of_first - 1]) == []
+    assert parser.feed(text[end_of_first - 1:end_of_first]) == [('mcq_questions', QUIZ['mcq_questions'][0])]
+
+
+def test_code_fences_are_ignored():
+    text = '```json\n' + json.dumps(QUIZ) + '\n```'
+    assert parse([text]) == EXPECTED
+
+
+def test_other_arrays_are_not_questions():
+    text = json.dumps({'title': 'mcq_questions', 'key_concepts': [{'question': 'not a question'}]})
+    assert parse([text]) == []
+
+
+def test_malformed_question_is_skipped():
+    text = '{"mcq_questions": [{"question": "bad", "options": [1,]}, {"question": "good"}]}'
+    assert parse([text]) == [('mcq_questions', {'question': 'good'})]
+
+
+def test_truncated_stream_returns_only_complete_questions():
+    text = json.dumps(QUIZ)
+    cut = text.index('Escaped backslash')
+    assert parse([text[:cut]]) == EXPECTED[:1]
@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from hedging import DeadlineExceeded, RequestPolicy, apply_policy
+from scheduler import RateLimitedError, RequestScheduler, current_tenant
+
+
+def drained_scheduler(requests_per_minute: float = 1200, **kwargs) -> RequestScheduler:
+    """A scheduler whose request budget is used up, so new requests queue."""
+    scheduler = RequestScheduler(requests_per_minute=requests_per_minute, tokens_per_minute=1e9, **kwargs)
+    with scheduler._cond:
+        scheduler._requests = 0.0
+        scheduler._refilled_at = time.monotonic()
+    return scheduler
+
+
+def in_context(function, *args, tenant='default', policy=None):
+    """Run ``function`` in a fresh context for ``tenant`` and ``policy``."""
+    def run():
+        current_tenant.set(tenant)
+        apply_policy(policy or RequestPolicy())
+        return function(*args)
+    return contextvars.Context().run(run)
+
+
+def wait_for_depth(scheduler: RequestScheduler, depth: int) -> None:
+    deadline = time.monotonic() + 5
+    while scheduler.queue_depth() != depth:
+        assert time.monotonic() < deadline, f'queue depth stayed at {scheduler.queue_depth()}'
+        time.sleep(0.005)
+
+
+def test_tenants_are_served_round_robin():
+    scheduler = drained_scheduler(requests_per_minute=600)
+    admitted = []
+    lock = threading.Lock()
+
+    def request(name):
+        scheduler.acquire(1)
+        with lock:
+            admitted.append(name)
+
+    threads = []
+    for depth, (tenant, name) in enumerate([('a', 'a1'), ('a', 'a2'), ('a', 'a3'), ('b', 'b1')], start=1):
+        thread = threading.Thread(target=in_context, args=(request, name), kwargs={'tenant': tenant})
+        thread.start()
+        threads.append(thread)
+        wait_for_depth(scheduler, depth)
+    for thread in threads:
+        thread.join(5)
+
+    # Tenant b's single request is not stuck behind all of tenant a's
+    assert admitted == ['a1', 'b1', 'a2', 'a3']
+    assert scheduler.stats()['tenants_waiting'] == 0
+
+
+def test_deadline_expires_while_queued():
+    scheduler = drained_scheduler(requests_per_minute=6)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        in_context(scheduler.acquire, 1, policy=RequestPolicy(deadline=0.2))
+
+    assert time.monotonic() - started < 1
+    # The expired request left its queue and used no budget
+    assert scheduler.queue_depth() == 0
+    assert scheduler.stats()['tenants_waiting'] == 0
+    assert scheduler.admitted == 0
+
+
+def test_passed_deadline_fails_before_queueing():
+    scheduler = drained_scheduler()
+
+    def late():
+        apply_policy(RequestPolicy(deadline=0.01))
+        time.sleep(0.02)
+        return scheduler.acquire(1)
+
+    with pytest.raises(DeadlineExceeded):
+        contextvars.Context().run(late)
+    assert scheduler.queue_depth() == 0
+
+
+def test_expired_waiter_does_not_hold_up_the_next_tenant():
+    scheduler = drained_scheduler(requests_per_minute=600)
+    expired = threading.Thread(target=lambda: pytest.raises(DeadlineExceeded, in_context, scheduler.acquire, 1000,
+                                                            tenant='a', policy=RequestPolicy(deadline=0.05)))
+    expired.start()
+    wait_for_depth(scheduler, 1)
+    expired.join(5)
+
+    waited = in_context(scheduler.acquire, 1, tenant='b')
+    assert waited < 0.5
+    assert scheduler.admitted == 1
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    scheduler = drained_scheduler(requests_per_minute=6)
+
+    async def cancel_queued():
+        task = asyncio.ensure_future(scheduler.aacquire(1))
+        await asyncio.sleep(0.05)
+        assert scheduler.queue_depth() == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    in_context(asyncio.run, cancel_queued())
+    assert scheduler.queue_depth() == 0
+    assert scheduler.admitted == 0
+
+
+def test_async_deadline_expires_while_queued():
+    scheduler = drained_scheduler(requests_per_minute=6)
+    with pytest.raises(DeadlineExceeded):
+        in_context(asyncio.run, scheduler.aacquire(1), policy=RequestPolicy(deadline=0.1))
+    assert scheduler.queue_depth() == 0
+
+
+def test_rate_limited_calls_are_retried():
+    scheduler = RequestScheduler(max_retries=2)
+    attempts = []
+
+    def make_call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitedError('429', retry_after=0.01)
+        return 'ok'
+
+    assert scheduler.call(make_call, 10) == 'ok'
+    assert len(attempts) == 3
+    assert scheduler.retries == 2
+
+
+def test_rate_limit_retries_give_up_at_the_deadline():
+    scheduler = RequestScheduler(max_retries=5)
+
+    def make_call():
+        raise RateLimitedError('429', retry_after=10)
+
+    with pytest.raises(DeadlineExceeded):
+        in_context(scheduler.call, make_call, 10, policy=RequestPolicy(deadline=1))
+    assert scheduler.retries == 0
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from session_store import MemorySessionStore, SessionStore, SQLiteSessionStore, create_session_store
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySessionStore(max_sessions=100)
+    return SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'), max_sessions=100)
+
+
+def test_sessions_are_copies(store):
+    store.save('s', {'answers': []})
+    store.get('s')['answers'].append(1)
+    assert store.get('s') == {'answers': []}
+    assert 's' in store and 'missing' not in store
+    store.delete('s')
+    assert store.get('s') is None
+    assert len(store) == 0
+
+
+def test_update_changes_the_stored_session(store):
+    store.save('s', {'count': 1})
+    assert store.update('s', lambda data: data.update(count=data['count'] + 1) or 'result') == 'result'
+    assert store.get('s') == {'count': 2}
+
+
+def test_update_of_a_missing_session_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store.update('missing', lambda data: None)
+
+
+def test_failed_update_leaves_the_session_unchanged(store):
+    store.save('s', {'count': 1})
+
+    def change(data):
+        data['count'] = 99
+        raise ValueError('rejected')
+
+    with pytest.raises(ValueError):
+        store.update('s', change)
+    assert store.get('s') == {'count': 1}
+
+
+def test_concurrent_updates_are_not_lost(store):
+    store.save('s', {'count': 0})
+
+    def increment(data):
+        data['count'] += 1
+
+    def worker():
+        for _ in range(100):
+            store.update('s', increment)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert store.get('s') == {'count': 800}
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_expired_sessions_are_gone(kind, tmp_path):
+    if kind == 'memory':
+        store = MemorySessionStore(ttl_seconds=0.05)
+    else:
+        store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'), ttl_seconds=0.05)
+    store.save('s', {})
+    time.sleep(0.1)
+    assert store.get('s') is None
+    with pytest.raises(KeyError):
+        store.update('s', lambda data: None)
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_least_recently_used_sessions_are_evicted(kind, tmp_path):
+    if kind == 'memory':
+        store = MemorySessionStore(max_sessions=2)
+    else:
+        store = SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'), max_sessions=2)
+    store.save('a', {})
+    time.sleep(0.01)
+    store.save('b', {})
+    time.sleep(0.01)
+    store.get('a')
+    time.sleep(0.01)
+    store.save('c', {})
+
+    assert store.get('b') is None
+    assert store.get('a') == {} and store.get('c') == {}
+
+
+def test_memory_store_evicts_by_size():
+    store = MemorySessionStore(max_bytes=100)
+    store.save('a', {'text': 'x' * 60})
+    store.save('b', {'text': 'y' * 60})
+    assert store.get('a') is None
+    # The newest session is kept even if it alone is over the limit
+    store.save('c', {'text': 'z' * 200})
+    assert len(store) == 1 and store.get('c') is not None
+
+
+def test_incomplete_store_fails_when_created():
+    class Incomplete(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_stores_are_built_from_urls(tmp_path):
+    assert isinstance(create_session_store('memory', 10, 60, 1024), MemorySessionStore)
+    sqlite = create_session_store(f'sqlite:///{tmp_path}/sessions.sqlite3', 10, 60, 1024)
+    assert isinstance(sqlite, SQLiteSessionStore)
+    with pytest.raises(ValueError):
+        create_session_store('redis://localhost', 10, 60, 1024)
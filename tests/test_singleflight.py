@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return {'quiz': 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('doc', call))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flight.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{'quiz': 1}] * 5
+    assert len(flight) == 0
+
+
+def test_waiters_receive_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def call():
+        release.wait(5)
+        raise ValueError('model failed')
+
+    def run():
+        try:
+            flight.do('doc', call)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flight.coalesced < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ['model failed'] * 3
+    # A failed call is not remembered
+    assert flight.do('doc', lambda: 'retried') == 'retried'
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.coalesced == 0
+
+
+def test_waiter_takes_over_when_the_leader_cancels():
+    flight = SingleFlight()
+    future, leader = flight.join('doc')
+    assert leader
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(flight.do('doc', lambda: 'from waiter')))
+    waiter.start()
+    while flight.coalesced < 1:
+        time.sleep(0.01)
+    flight.cancel('doc', future)
+    waiter.join(5)
+
+    assert results == ['from waiter']
+
+
+def test_async_and_sync_callers_coalesce():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return 'quiz'
+
+    leader = threading.Thread(target=lambda: flight.do('doc', call))
+    leader.start()
+    while len(flight) == 0:
+        time.sleep(0.01)
+
+    async def wait_for_leader():
+        async def never():
+            raise AssertionError('the async caller must not run the call')
+        pending = asyncio.ensure_future(flight.ado('doc', never))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await pending
+
+    assert asyncio.run(wait_for_leader()) == 'quiz'
+    leader.join(5)
+    assert len(calls) == 1
+
+
+def test_cancelled_async_waiter_does_not_cancel_the_leader():
+    flight = SingleFlight()
+    future, _ = flight.join('doc')
+
+    async def cancel_waiter():
+        waiter = asyncio.ensure_future(flight.ado('doc', lambda: None))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(cancel_waiter())
+    assert not future.cancelled()
+    flight.finish('doc', future, 'quiz')
+    assert future.result() == 'quiz'
+
+
+def test_async_waiter_takes_over_when_the_leader_cancels():
+    flight = SingleFlight()
+    future, _ = flight.join('doc')
+
+    async def take_over():
+        async def call():
+            return 'from waiter'
+        waiter = asyncio.ensure_future(flight.ado('doc', call))
+        await asyncio.sleep(0.05)
+        flight.cancel('doc', future)
+        return await waiter
+
+    assert asyncio.run(take_over()) == 'from waiter'
+    assert len(flight) == 0
+
+
+class RequestError(Exception):
+    """Stands in for an error specific to the request that ran the call, such as its deadline passing."""
+
+
+def test_waiter_retries_after_an_unshared_leader_error():
+    flight = SingleFlight(unshared_errors=(RequestError,))
+    release = threading.Event()
+    calls = []
+    outcomes = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(5)
+            raise RequestError('leader deadline passed')
+        time.sleep(0.2)
+        return 'quiz'
+
+    def run():
+        try:
+            outcomes.append(flight.do('doc', call))
+        except RequestError as e:
+            outcomes.append(str(e))
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    while not calls:
+        time.sleep(0.01)
+    waiters = [threading.Thread(target=run) for _ in range(2)]
+    for thread in waiters:
+        thread.start()
+    while flight.coalesced < 2:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join(5)
+
+    # Only the leader sees its own error; one waiter reruns the call and shares it with the other
+    assert sorted(outcomes) == ['leader deadline passed', 'quiz', 'quiz']
+    assert len(calls) == 2
+
+
+def test_async_waiter_retries_after_an_unshared_leader_error():
+    flight = SingleFlight(unshared_errors=(RequestError,))
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if len(calls) == 1:
+            raise RequestError('rate limited')
+        return 'quiz'
+
+    async def main():
+        return await asyncio.gather(flight.ado('doc', call), flight.ado('doc', call), return_exceptions=True)
+
+    leader_outcome, waiter_outcome = asyncio.run(main())
+    assert isinstance(leader_outcome, RequestError)
+    assert waiter_outcome == 'quiz'
+    assert len(calls) == 2
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import os
+
+from quiz_generator import QuizGenerator
+from text_cache import HashingStream, TextCache, hash_source
+
+DATA = b'The mitochondria is the powerhouse of the cell.\n' * 100
+
+
+def test_hashing_stream_hashes_what_is_written():
+    stream = HashingStream(io.BytesIO())
+    stream.write(DATA[:10])
+    stream.write(DATA[10:])
+    assert stream.sha256 == hashlib.sha256(DATA).hexdigest()
+    assert stream.getvalue() == DATA
+    # The already computed digest is reused rather than reading the stream again
+    assert hash_source(stream) == stream.sha256
+
+
+def test_sources_hash_to_the_same_digest(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(DATA)
+    stream = io.BytesIO(DATA)
+    stream.seek(5)
+
+    expected = hashlib.sha256(DATA).hexdigest()
+    assert hash_source(DATA) == hash_source(str(path)) == hash_source(path) == hash_source(stream) == expected
+    assert stream.tell() == 0
+
+
+def test_hits_and_misses(tmp_path):
+    cache = TextCache(str(tmp_path))
+    assert cache.get('key') is None
+    cache.set('key', 'extracted text é')
+    assert cache.get('key') == 'extracted text é'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    # Entries are stored compressed
+    assert 0 < stats['size_bytes'] < len(DATA)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_corrupt_entries_are_misses(tmp_path):
+    cache = TextCache(str(tmp_path))
+    (tmp_path / ('key' + TextCache.SUFFIX)).write_bytes(b'not zlib')
+    assert cache.get('key') is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    texts = {key: os.urandom(600).hex() for key in ('a', 'b', 'c')}
+    cache = TextCache(str(tmp_path), max_bytes=2000)
+    for when, key in enumerate(('a', 'b')):
+        cache.set(key, texts[key])
+        os.utime(cache._path(key), (when, when))
+    cache.get('a')
+    cache.set('c', texts['c'])
+
+    assert cache.get('b') is None
+    assert cache.get('a') == texts['a'] and cache.get('c') == texts['c']
+    assert cache.stats()['size_bytes'] <= 2000
+
+
+def test_size_is_counted_from_existing_entries(tmp_path):
+    TextCache(str(tmp_path)).set('key', 'text')
+    assert TextCache(str(tmp_path)).stats()['size_bytes'] == os.path.getsize(tmp_path / ('key' + TextCache.SUFFIX))
+
+
+def test_identical_uploads_are_parsed_once(tmp_path, monkeypatch):
+    generator = QuizGenerator(api_key='test-key', text_cache=TextCache(str(tmp_path)))
+    parsed = []
+    original = generator.iter_txt_lines
+
+    def iter_txt_lines(source):
+        parsed.append(source)
+        return original(source)
+
+    monkeypatch.setattr(generator, 'iter_txt_lines', iter_txt_lines)
+    first = generator.read_file(io.BytesIO(DATA), filename='notes.txt')
+    second = generator.read_file(io.BytesIO(DATA), filename='copy.txt')
+
+    assert first == second
+    assert len(parsed) == 1
+    # A different character budget is a different entry
+    generator.read_file(io.BytesIO(DATA), max_chars=100, filename='notes.txt')
+    assert len(parsed) == 2
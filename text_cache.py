@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, Optional
+
+# Block size for hashing files and streams
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class HashingStream:
+    """Wraps a writable binary stream and hashes everything written to it.
+
+    Used as the upload stream so the SHA-256 of an uploaded file is known as
+    soon as it has been received, without reading it a second time.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        return self._stream.write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stream.close()
+
+
+def hash_source(source) -> str:
+    """Return the SHA-256 hex digest of a path, bytes or binary stream's contents."""
+    sha256 = getattr(source, 'sha256', None)
+    if isinstance(sha256, str):
+        return sha256
+
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """Directory of zlib-compressed extracted texts keyed by a hash of the raw file.
+
+    Least recently used entries (by file modification time) are evicted once
+    the directory grows beyond ``max_bytes``.
+    """
+
+    SUFFIX = '.txt.z'
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = self._disk_usage()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _disk_usage(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(self.SUFFIX)]
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for ``key``, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                text = zlib.decompress(file.read()).decode('utf-8')
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path)
+        except (OSError, zlib.error):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def set(self, key: str, text: str) -> None:
+        """Store compressed text for ``key`` and evict old entries beyond the size cap."""
+        data = zlib.compress(text.encode('utf-8'), 6)
+        if len(data) > self.max_bytes:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        path = self._path(key)
+        with self._lock:
+            try:
+                self._size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Other processes may share the directory, so recount from disk
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes
+            }